@@ -1,18 +1,36 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, url_for
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 from functools import wraps
+import asyncio
+import click
 import jwt
+import base64
+import csv
+import io
+import json
 import os
 import re
 import secrets
+import time
 import hashlib
 import hmac
 
+from cache import TTLCache
+from log_pipeline import BatchWriter
+from passwords import PasswordHasher, PasswordHasherBusy
+from payments import SUBSCRIPTION_PLANS, PaymentManager, get_latency_stats
+from payments_async import AsyncPaymentManager
+from payment_reconciler import PaymentReconciler
+from webhook_worker import WorkerPool
+import query_counter
+
 app = Flask(__name__)
 
 # Configuração de CORS mais restritiva
@@ -25,11 +43,18 @@ CORS(app, resources={
 })
 
 # Rate Limiting para prevenir ataques de força bruta
+# Em produção use um storage compartilhado entre os workers, ex.: redis://localhost:6379/0
+# ou redis+unix:///var/run/redis/redis.sock; memory:// é apenas para desenvolvimento
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
     default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
+    storage_uri=os.getenv('RATELIMIT_STORAGE_URI', 'memory://'),
+    strategy=os.getenv('RATELIMIT_STRATEGY', 'moving-window'),
+    key_prefix=os.getenv('RATELIMIT_KEY_PREFIX', 'procoachvirtual'),
+    # Se o storage compartilhado cair, os limites continuam valendo por worker
+    in_memory_fallback_enabled=True,
+    swallow_errors=True
 )
 
 # Configurações de Segurança
@@ -43,6 +68,75 @@ ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY', secrets.token_hex(32))
 
 db = SQLAlchemy(app)
 
+# Cabeçalho X-Query-Count com o número de consultas SQL por requisição (testes/diagnóstico)
+if os.getenv('QUERY_COUNT_HEADER', 'false').lower() == 'true':
+    query_counter.init_app(app)
+
+# Cache de status de assinatura por guild: guild_id -> (status, expires_at)
+subscription_cache = TTLCache(
+    maxsize=int(os.getenv('SUBSCRIPTION_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('SUBSCRIPTION_CACHE_TTL', 300))
+)
+
+# Cache de estado de usuário usado pela autenticação: user_id -> estado
+user_state_cache = TTLCache(
+    maxsize=int(os.getenv('USER_STATE_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('USER_STATE_CACHE_TTL', 30))
+)
+
+# Invalidações dos caches acima são gravadas no banco e lidas pelos demais workers
+# a cada CACHE_SYNC_INTERVAL segundos; o TTL só limita a espera se a leitura falhar
+CACHE_SYNC_INTERVAL = float(os.getenv('CACHE_SYNC_INTERVAL', 2))
+CACHE_INVALIDATION_RETENTION = timedelta(seconds=int(os.getenv('CACHE_INVALIDATION_RETENTION', 3600)))
+cache_sync_state = {'last_id': None, 'checked_at': 0.0}
+
+# Limite de guilds por consulta em lote do bot
+MAX_BATCH_GUILDS = int(os.getenv('MAX_BATCH_GUILDS', 1000))
+
+# Tamanho máximo de página nas listagens administrativas
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 200))
+
+# Hash de senhas: método/custo configuráveis e verificação fora da thread da requisição
+password_hasher = PasswordHasher(
+    method=os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256'),
+    cost=os.getenv('PASSWORD_HASH_COST') or None,
+    executor=os.getenv('PASSWORD_HASH_EXECUTOR', 'thread'),
+    workers=int(os.getenv('PASSWORD_HASH_WORKERS', 2)),
+    max_pending=int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16)),
+    wait_timeout=float(os.getenv('PASSWORD_HASH_WAIT_TIMEOUT', 2.0))
+)
+
+# Snapshot das estatísticas do painel e intervalo de reconciliação dos contadores
+stats_cache = TTLCache(maxsize=1, ttl=int(os.getenv('STATS_CACHE_TTL', 15)))
+STATS_RECONCILE_INTERVAL = timedelta(seconds=int(os.getenv('STATS_RECONCILE_INTERVAL', 3600)))
+
+# Catálogo de planos serializado; cada worker confere a versão no banco a cada PLAN_CATALOG_CHECK_INTERVAL
+plan_catalog_state = {'snapshot': None, 'checked_at': 0.0}
+PLAN_CATALOG_CHECK_INTERVAL = float(os.getenv('PLAN_CATALOG_CHECK_INTERVAL', 5))
+PLAN_CATALOG_MAX_AGE = int(os.getenv('PLAN_CATALOG_MAX_AGE', 60))
+
+# Webhooks de pagamento: segredos por provedor, período pago e reprocessamento
+WEBHOOK_SECRETS = {
+    'mercadopago': os.getenv('MERCADOPAGO_WEBHOOK_SECRET'),
+    'stripe': os.getenv('STRIPE_WEBHOOK_SECRET')
+}
+SUBSCRIPTION_PERIOD = timedelta(days=int(os.getenv('SUBSCRIPTION_PERIOD_DAYS', 30)))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', 5))
+WEBHOOK_CLAIM_TIMEOUT = timedelta(seconds=int(os.getenv('WEBHOOK_CLAIM_TIMEOUT', 300)))
+WEBHOOK_RETRY_BASE = float(os.getenv('WEBHOOK_RETRY_BASE', 30))
+WEBHOOK_RETRY_MAX = float(os.getenv('WEBHOOK_RETRY_MAX', 3600))
+
+# Cache dos QR codes Pix servidos por /api/payments/pix/<token>/qr.png: token -> artefato
+artifact_cache = TTLCache(
+    maxsize=int(os.getenv('PAYMENT_ARTIFACT_CACHE_SIZE', 500)),
+    ttl=int(os.getenv('PAYMENT_ARTIFACT_CACHE_TTL', 600))
+)
+# Validade do QR code quando o provedor não informa a expiração do Pix
+PIX_DEFAULT_EXPIRATION = timedelta(hours=24)
+
+# Linhas buscadas por vez do cursor do banco na exportação de usuários
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
 # Funções de Criptografia
 def encrypt_data(data):
     """Criptografa dados sensíveis usando HMAC-SHA256"""
@@ -107,16 +201,21 @@ class User(db.Model):
     failed_login_attempts = db.Column(db.Integer, default=0)
     locked_until = db.Column(db.DateTime, nullable=True)
     last_login = db.Column(db.DateTime, nullable=True)
+    token_version = db.Column(db.Integer, default=0, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def set_password(self, password):
-        """Define a senha com hashing bcrypt"""
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256', salt_length=16)
+        """Define a senha com o método de hash configurado"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """Verifica a senha"""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """Indica se o hash armazenado usa parâmetros desatualizados"""
+        return password_hasher.needs_rehash(self.password_hash)
     
     def is_locked(self):
         """Verifica se a conta está bloqueada"""
@@ -184,6 +283,10 @@ class AuditLog(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     user = db.relationship('User', backref='audit_logs')
+    
+    __table_args__ = (
+        db.Index('ix_audit_log_timestamp_id', 'timestamp', 'id'),
+    )
 
 class SecurityEvent(db.Model):
     """Registro de eventos de segurança"""
@@ -196,11 +299,204 @@ class SecurityEvent(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     user = db.relationship('User', backref='security_events')
+    
+    __table_args__ = (
+        db.Index('ix_security_event_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_security_event_severity_timestamp_id', 'severity', 'timestamp', 'id'),
+    )
+
+class StatCounter(db.Model):
+    """Contadores materializados do painel administrativo"""
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, default=0, nullable=False)
+    reconciled_at = db.Column(db.DateTime, nullable=True)
+
+class MetricRollup(db.Model):
+    """Métricas pré-agregadas por intervalo de tempo (hora/dia)"""
+    metric = db.Column(db.String(50), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    value = db.Column(db.Integer, default=0, nullable=False)
+
+class Payment(db.Model):
+    """Pagamento ou assinatura criado em um provedor, ligado a um usuário"""
+    id = db.Column(db.Integer, primary_key=True)
+    provider = db.Column(db.String(20), nullable=False)
+    provider_ref = db.Column(db.String(100), nullable=False)  # id do pagamento/assinatura no provedor
+    kind = db.Column(db.String(20), nullable=False)  # payment, subscription
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    status = db.Column(db.String(30), nullable=True)
+    amount = db.Column(db.Float, nullable=True)
+    plan = db.Column(db.String(30), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('provider', 'provider_ref', name='uq_payment_provider_ref'),
+        db.Index('ix_payment_status_id', 'status', 'id'),
+    )
+
+class PaymentArtifact(db.Model):
+    """Artefato de pagamento (QR code Pix) guardado até a expiração do pagamento"""
+    id = db.Column(db.Integer, primary_key=True)
+    payment_id = db.Column(db.Integer, db.ForeignKey('payment.id'), unique=True, nullable=False)
+    token = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    content_type = db.Column(db.String(50), nullable=False)
+    content = db.Column(db.LargeBinary, nullable=False)
+    etag = db.Column(db.String(64), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class WebhookEvent(db.Model):
+    """Evento bruto recebido de um provedor de pagamento, processado em segundo plano"""
+    id = db.Column(db.Integer, primary_key=True)
+    provider = db.Column(db.String(20), nullable=False)
+    event_key = db.Column(db.String(150), nullable=False)  # chave de idempotência do provedor
+    event_type = db.Column(db.String(100), nullable=True)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, processing, processed, ignored, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    claim_token = db.Column(db.String(32), nullable=True, index=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)  # backoff após falha do provedor
+    error = db.Column(db.Text, nullable=True)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('provider', 'event_key', name='uq_webhook_event_provider_key'),
+        db.Index('ix_webhook_event_status_id', 'status', 'id'),
+    )
+
+class SubscriptionPlan(db.Model):
+    """Plano de assinatura exibido na página de preços"""
+    id = db.Column(db.String(30), primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.String(255), nullable=True)
+    price = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(3), default='BRL', nullable=False)
+    interval = db.Column(db.String(10), default='month', nullable=False)  # month, year
+    interval_count = db.Column(db.Integer, default=1, nullable=False)
+    is_active = db.Column(db.Boolean, default=True)
+    sort_order = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Converte o plano para dicionário"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'price': self.price,
+            'currency': self.currency,
+            'interval': self.interval,
+            'interval_count': self.interval_count
+        }
+
+class PlanCatalog(db.Model):
+    """Versão do catálogo de planos, incrementada a cada edição"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, default=1, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CacheInvalidation(db.Model):
+    """Chave removida de um cache em memória, para os outros workers removerem também"""
+    id = db.Column(db.Integer, primary_key=True)
+    cache = db.Column(db.String(30), nullable=False)  # subscription, user_state
+    key = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class JobCheckpoint(db.Model):
+    """Progresso de jobs em lote, para retomar execuções interrompidas"""
+    name = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, default=0, nullable=False)
+    state = db.Column(db.Text, nullable=True)  # JSON com o resumo da execução
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Contadores Materializados
+STAT_COUNTERS = {
+    'users_total': lambda: User.query.count(),
+    'active_subscriptions': lambda: User.query.filter_by(subscription_status='active').count(),
+    'active_guilds': lambda: DiscordGuild.query.filter_by(is_active=True).count()
+}
+
+# Ações de auditoria agregadas em rollups: ação -> (métrica, granularidade)
+ROLLUP_ACTIONS = {
+    'user_registered': ('signups_per_day', 'day'),
+    'user_login': ('logins_per_hour', 'hour')
+}
+
+def increment_counter(name, delta=1):
+    """Atualiza um contador na transação corrente (commit fica a cargo do chamador)"""
+    db.session.execute(
+        db.update(StatCounter).where(StatCounter.name == name).values(value=StatCounter.value + delta)
+    )
+
+def reconcile_counters():
+    """Recalcula os contadores a partir das tabelas de origem"""
+    now = datetime.utcnow()
+    for name, count in STAT_COUNTERS.items():
+        counter = db.session.get(StatCounter, name)
+        if counter is None:
+            counter = StatCounter(name=name)
+            db.session.add(counter)
+        counter.value = count()
+        counter.reconciled_at = now
+    db.session.commit()
+
+def bucket_start(timestamp, granularity):
+    """Trunca o timestamp para o início da hora ou do dia"""
+    bucket = timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        bucket = bucket.replace(hour=0)
+    return bucket
+
+def increment_rollups(counts):
+    """Soma valores aos rollups {(métrica, início do intervalo): n} com upsert"""
+    dialect = db.engine.dialect.name
+    
+    for (metric, bucket), value in counts.items():
+        if dialect in ('postgresql', 'sqlite'):
+            insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+            stmt = insert(MetricRollup).values(metric=metric, bucket_start=bucket, value=value)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['metric', 'bucket_start'],
+                set_={'value': MetricRollup.value + value}
+            )
+            db.session.execute(stmt)
+            continue
+        
+        result = db.session.execute(
+            db.update(MetricRollup)
+            .where(MetricRollup.metric == metric, MetricRollup.bucket_start == bucket)
+            .values(value=MetricRollup.value + value)
+        )
+        if result.rowcount == 0:
+            db.session.add(MetricRollup(metric=metric, bucket_start=bucket, value=value))
 
 # Criar tabelas e usuário admin
 with app.app_context():
     db.create_all()
     
+    # Inicializa os contadores na primeira execução
+    if StatCounter.query.count() < len(STAT_COUNTERS):
+        try:
+            reconcile_counters()
+        except IntegrityError:
+            db.session.rollback()
+    
+    # Catálogo inicial a partir dos planos padrão
+    if db.session.get(PlanCatalog, 1) is None:
+        try:
+            for order, (plan_id, plan) in enumerate(SUBSCRIPTION_PLANS.items()):
+                if db.session.get(SubscriptionPlan, plan_id) is None:
+                    db.session.add(SubscriptionPlan(id=plan_id, sort_order=order, **plan))
+            db.session.add(PlanCatalog(id=1, version=1))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+    
     admin = User.query.filter_by(username='yurifrdf').first()
     if not admin:
         admin = User(
@@ -214,36 +510,237 @@ with app.app_context():
         )
         admin.set_password('Isacnoahjade@131312')
         db.session.add(admin)
+        increment_counter('users_total')
+        increment_counter('active_subscriptions')
         db.session.commit()
         print("✅ Conta de administrador criada com sucesso!")
 
 # Funções de Log
+def fit_to_columns(model, row):
+    """Corta textos ao tamanho das colunas String(n): no Postgres um valor longo derrubaria o lote"""
+    for column in model.__table__.columns:
+        length = getattr(column.type, 'length', None)
+        value = row.get(column.name)
+        if length and isinstance(value, str) and len(value) > length:
+            row[column.name] = value[:length]
+    return row
+
+def write_log_batch(records):
+    """Grava um lote de logs de auditoria e eventos de segurança em uma única transação"""
+    audit_rows = [fit_to_columns(AuditLog, row) for kind, row in records if kind == 'audit']
+    security_rows = [fit_to_columns(SecurityEvent, row) for kind, row in records if kind == 'security']
+    
+    # Agrega as ações monitoradas nos rollups no mesmo lote
+    rollups = {}
+    for row in audit_rows:
+        if row['action'] in ROLLUP_ACTIONS:
+            metric, granularity = ROLLUP_ACTIONS[row['action']]
+            key = (metric, bucket_start(row['timestamp'], granularity))
+            rollups[key] = rollups.get(key, 0) + 1
+    
+    with app.app_context():
+        try:
+            if audit_rows:
+                db.session.execute(db.insert(AuditLog), audit_rows)
+            if security_rows:
+                db.session.execute(db.insert(SecurityEvent), security_rows)
+            if rollups:
+                increment_rollups(rollups)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+log_writer = BatchWriter(
+    write_log_batch,
+    max_queue=int(os.getenv('LOG_QUEUE_SIZE', 10000)),
+    batch_size=int(os.getenv('LOG_BATCH_SIZE', 200)),
+    flush_interval=float(os.getenv('LOG_FLUSH_INTERVAL', 2.0)),
+    overflow=os.getenv('LOG_OVERFLOW_POLICY', 'drop_newest'),
+    asynchronous=os.getenv('LOG_ASYNC', 'true').lower() == 'true'
+)
+
 def log_audit(user_id, action, details=None):
     """Registra uma ação no log de auditoria"""
-    log = AuditLog(
-        user_id=user_id,
-        action=action,
-        details=details,
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent')
-    )
-    db.session.add(log)
-    db.session.commit()
+    log_writer.submit(('audit', {
+        'user_id': user_id,
+        'action': action,
+        'details': details,
+        'ip_address': request.remote_addr,
+        'user_agent': request.headers.get('User-Agent'),
+        'timestamp': datetime.utcnow()
+    }))
 
 def log_security_event(event_type, severity, description, user_id=None):
     """Registra um evento de segurança"""
-    event = SecurityEvent(
-        event_type=event_type,
-        severity=severity,
-        description=description,
-        ip_address=request.remote_addr,
-        user_id=user_id
-    )
-    db.session.add(event)
-    db.session.commit()
+    log_writer.submit(('security', {
+        'event_type': event_type,
+        'severity': severity,
+        'description': description,
+        'ip_address': request.remote_addr,
+        'user_id': user_id,
+        'timestamp': datetime.utcnow()
+    }))
+
+# Propagação de Invalidações entre Workers
+SHARED_CACHES = {
+    'subscription': (subscription_cache, str),
+    'user_state': (user_state_cache, int)
+}
+
+def publish_cache_invalidation(cache, keys):
+    """Agenda a gravação das chaves invalidadas para o fim da transação atual
+    
+    Gravar só depois do commit evita que outro worker recarregue o valor antigo
+    logo após ler a invalidação.
+    """
+    pending = db.session.info.setdefault('cache_invalidations', [])
+    pending.extend((cache, str(key)) for key in keys)
+    if not db.session().in_transaction():
+        flush_cache_invalidations(db.session)
+
+@event.listens_for(db.session, 'after_transaction_end')
+def flush_cache_invalidations(session, transaction=None):
+    """Grava as invalidações pendentes em uma conexão própria, fora da sessão"""
+    if transaction is not None and transaction.parent is not None:
+        return
+    pending = session.info.pop('cache_invalidations', None)
+    if not pending:
+        return
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(db.insert(CacheInvalidation), [
+                {'cache': cache, 'key': key, 'created_at': datetime.utcnow()} for cache, key in pending
+            ])
+            connection.execute(db.delete(CacheInvalidation).where(
+                CacheInvalidation.created_at < datetime.utcnow() - CACHE_INVALIDATION_RETENTION))
+    except Exception as e:
+        print(f"Erro ao publicar invalidação de cache: {e}")
+
+def sync_shared_caches():
+    """Aplica as invalidações feitas por outros workers desde a última leitura"""
+    now = time.monotonic()
+    if now - cache_sync_state['checked_at'] < CACHE_SYNC_INTERVAL:
+        return
+    cache_sync_state['checked_at'] = now
+    
+    last_id = cache_sync_state['last_id']
+    if last_id is None:
+        # Worker novo: os caches estão vazios, basta marcar a posição atual
+        cache_sync_state['last_id'] = db.session.scalar(db.select(db.func.max(CacheInvalidation.id))) or 0
+        return
+    
+    rows = db.session.execute(
+        db.select(CacheInvalidation.id, CacheInvalidation.cache, CacheInvalidation.key)
+        .where(CacheInvalidation.id > last_id).order_by(CacheInvalidation.id)
+    ).all()
+    for row_id, cache, key in rows:
+        if cache in SHARED_CACHES:
+            target, key_type = SHARED_CACHES[cache]
+            target.invalidate(key_type(key))
+        cache_sync_state['last_id'] = row_id
+
+# Cache de Assinaturas
+def load_guild_subscription(discord_guild_id):
+    """Consulta no banco o status base da assinatura de uma guild"""
+    guild = DiscordGuild.query.filter_by(guild_id=discord_guild_id, is_active=True).first()
+    
+    if not guild:
+        return 'inactive', None
+    
+    owner = User.query.get(guild.owner_user_id)
+    
+    if not owner or not owner.is_active or owner.subscription_status != 'active':
+        return 'inactive', None
+    
+    return 'active', owner.subscription_end_date
+
+def get_guild_subscription(discord_guild_id):
+    """Retorna (status, expires_at) da guild, consultando o cache antes do banco"""
+    sync_shared_caches()
+    cached = subscription_cache.get(discord_guild_id)
+    if cached is None:
+        cached = load_guild_subscription(discord_guild_id)
+        subscription_cache.set(discord_guild_id, cached)
+    return cached
+
+def resolve_subscription_status(status, expires_at):
+    """Aplica a data de expiração ao status em cache"""
+    if status == 'active' and expires_at and expires_at > datetime.utcnow():
+        return 'active'
+    return 'inactive'
+
+def invalidate_user_subscriptions(guild_ids):
+    """Remove do cache as guilds afetadas por uma mudança de usuário/assinatura, em todos os workers"""
+    subscription_cache.invalidate(*guild_ids)
+    publish_cache_invalidation('subscription', guild_ids)
+
+# Cache de Estado de Usuário
+def build_user_state(user):
+    """Monta o estado do usuário usado pela autenticação"""
+    return {
+        'id': user.id,
+        'is_active': user.is_active,
+        'is_admin': user.is_admin,
+        'subscription_status': user.subscription_status,
+        'subscription_end_date': user.subscription_end_date,
+        'token_version': user.token_version or 0,
+        'profile': user.to_dict(include_sensitive=True)
+    }
+
+def load_user_state(user_id):
+    """Retorna o estado do usuário, consultando o cache antes do banco"""
+    sync_shared_caches()
+    state = user_state_cache.get(user_id)
+    if state is None:
+        user = User.query.get(user_id)
+        if not user:
+            return None
+        state = build_user_state(user)
+        user_state_cache.set(user_id, state)
+    return state
+
+def invalidate_user_state(*user_ids):
+    """Remove usuários do cache de estado após alterações, em todos os workers"""
+    user_state_cache.invalidate(*user_ids)
+    publish_cache_invalidation('user_state', user_ids)
+
+class CurrentUser:
+    """Usuário autenticado da requisição
+    
+    Os campos de estado vêm do cache; os demais atributos carregam o modelo sob demanda.
+    """
+    STATE_FIELDS = ('id', 'is_active', 'is_admin', 'subscription_status',
+                    'subscription_end_date', 'token_version')
+    
+    def __init__(self, state):
+        object.__setattr__(self, '_state', state)
+        object.__setattr__(self, '_user', None)
+    
+    @property
+    def model(self):
+        """Carrega o modelo User na primeira vez que é necessário"""
+        if self._user is None:
+            object.__setattr__(self, '_user', User.query.get(self._state['id']))
+        return self._user
+    
+    def to_dict(self, include_sensitive=False):
+        """Converte o usuário para dicionário, usando o perfil em cache quando possível"""
+        if include_sensitive and self._user is None:
+            return dict(self._state['profile'])
+        return self.model.to_dict(include_sensitive=include_sensitive)
+    
+    def __getattr__(self, name):
+        if name in CurrentUser.STATE_FIELDS and self._user is None:
+            return self._state[name]
+        return getattr(self.model, name)
+    
+    def __setattr__(self, name, value):
+        setattr(self.model, name, value)
+        invalidate_user_state(self._state['id'])
 
 # Funções de Token JWT
-def generate_token(user_id, token_type='access'):
+def generate_token(user_id, token_type='access', token_version=None):
     """Gera um token JWT"""
     expiration = timedelta(hours=1) if token_type == 'access' else timedelta(days=30)
     payload = {
@@ -252,17 +749,92 @@ def generate_token(user_id, token_type='access'):
         'exp': datetime.utcnow() + expiration,
         'iat': datetime.utcnow()
     }
+    if token_version is not None:
+        payload['ver'] = token_version
     return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
 
 def verify_token(token):
-    """Verifica e decodifica um token JWT"""
+    """Verifica e decodifica um token JWT, retornando (user_id, tipo, versão)"""
     try:
         payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-        return payload['user_id'], payload.get('type', 'access')
+        return payload['user_id'], payload.get('type', 'access'), payload.get('ver')
     except jwt.ExpiredSignatureError:
-        return None, 'expired'
+        return None, 'expired', None
     except jwt.InvalidTokenError:
-        return None, 'invalid'
+        return None, 'invalid', None
+
+# Paginação
+def get_page_size(default=50):
+    """Lê per_page da requisição, limitado a MAX_PAGE_SIZE"""
+    per_page = request.args.get('per_page', default, type=int)
+    return max(1, min(per_page, MAX_PAGE_SIZE))
+
+def encode_cursor(timestamp, row_id):
+    """Codifica a posição (timestamp, id) de uma linha em um cursor opaco"""
+    raw = f'{timestamp.isoformat()}|{row_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor):
+    """Decodifica um cursor gerado por encode_cursor"""
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    timestamp, row_id = raw.rsplit('|', 1)
+    return datetime.fromisoformat(timestamp), int(row_id)
+
+def keyset_paginate(query, model, cursor, per_page, order_column=None):
+    """Pagina por (order_column, id) decrescente sem OFFSET"""
+    order_column = order_column if order_column is not None else model.timestamp
+    
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.filter(db.tuple_(order_column, model.id) < db.tuple_(timestamp, row_id))
+    
+    items = query.order_by(order_column.desc(), model.id.desc()).limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(getattr(items[-1], order_column.key), items[-1].id)
+    return items, next_cursor
+
+def count_rows(query, model, mode, filtered=False):
+    """Conta as linhas conforme o modo pedido: none, exact ou estimate"""
+    if mode == 'exact':
+        return query.order_by(None).count(), False
+    
+    # Estimativa das estatísticas do PostgreSQL, válida apenas sem filtros
+    if mode == 'estimate' and not filtered and db.engine.dialect.name == 'postgresql':
+        estimate = db.session.execute(
+            db.text('SELECT reltuples::bigint FROM pg_class WHERE relname = :table'),
+            {'table': model.__tablename__}
+        ).scalar()
+        return max(estimate or 0, 0), True
+    
+    return None, False
+
+def paginate_listing(query, model, filtered=False, order_column=None):
+    """Aplica paginação por cursor (ou por página, legado) e a contagem opcional"""
+    order_column = order_column if order_column is not None else model.timestamp
+    per_page = get_page_size()
+    cursor = request.args.get('cursor')
+    count_mode = request.args.get('count', 'none')
+    
+    total, is_estimate = count_rows(query, model, count_mode, filtered)
+    meta = {'per_page': per_page, 'total': total, 'total_is_estimate': is_estimate}
+    
+    if 'page' in request.args and not cursor:
+        page = request.args.get('page', 1, type=int)
+        result = query.order_by(order_column.desc(), model.id.desc()).paginate(
+            page=page, per_page=per_page, error_out=False, count=False
+        )
+        meta['current_page'] = result.page
+        if total is not None and not is_estimate:
+            meta['pages'] = -(-total // per_page)
+        return result.items, meta
+    
+    items, next_cursor = keyset_paginate(query, model, cursor, per_page, order_column)
+    meta['next_cursor'] = next_cursor
+    meta['has_more'] = next_cursor is not None
+    return items, meta
 
 # Decoradores de Autenticação
 def require_auth(f):
@@ -276,18 +848,23 @@ def require_auth(f):
         if token.startswith('Bearer '):
             token = token[7:]
         
-        user_id, token_type = verify_token(token)
+        user_id, token_type, token_version = verify_token(token)
         
         if not user_id:
             log_security_event('invalid_token', 'medium', f'Token inválido ou expirado: {token_type}')
             return jsonify({'error': 'Token inválido ou expirado'}), 401
         
-        user = User.query.get(user_id)
-        if not user or not user.is_active:
+        state = load_user_state(user_id)
+        if not state or not state['is_active']:
             log_security_event('inactive_user_access', 'high', f'Tentativa de acesso com usuário inativo: {user_id}')
             return jsonify({'error': 'Usuário não encontrado ou inativo'}), 404
         
-        request.current_user = user
+        # Tokens sem a claim de versão continuam válidos, mas não podem ser revogados
+        if token_version is not None and token_version != state['token_version']:
+            log_security_event('revoked_token', 'medium', f'Token revogado usado pelo usuário: {user_id}')
+            return jsonify({'error': 'Token inválido ou expirado'}), 401
+        
+        request.current_user = CurrentUser(state)
         return f(*args, **kwargs)
     
     return wrapper
@@ -344,13 +921,14 @@ def register():
     user.set_password(password)
     
     db.session.add(user)
+    increment_counter('users_total')
     db.session.commit()
     
     log_audit(user.id, 'user_registered', f'Novo usuário registrado: {username}')
     
     # Gerar tokens
-    access_token = generate_token(user.id, 'access')
-    refresh_token = generate_token(user.id, 'refresh')
+    access_token = generate_token(user.id, 'access', user.token_version)
+    refresh_token = generate_token(user.id, 'refresh', user.token_version)
     
     return jsonify({
         'message': 'Usuário registrado com sucesso',
@@ -390,13 +968,18 @@ def login():
         log_security_event('inactive_account_login', 'high', f'Tentativa de login em conta inativa: {user.id}')
         return jsonify({'error': 'Conta desativada. Entre em contato com o suporte.'}), 403
     
+    # Atualiza o hash para o método/custo atual (salvo junto com o reset abaixo)
+    if user.password_needs_rehash():
+        user.set_password(password)
+    
     # Login bem-sucedido
     user.reset_failed_login()
+    invalidate_user_state(user.id)
     log_audit(user.id, 'user_login', f'Login bem-sucedido: {username}')
     
     # Gerar tokens
-    access_token = generate_token(user.id, 'access')
-    refresh_token = generate_token(user.id, 'refresh')
+    access_token = generate_token(user.id, 'access', user.token_version)
+    refresh_token = generate_token(user.id, 'refresh', user.token_version)
     
     return jsonify({
         'message': 'Login realizado com sucesso',
@@ -415,7 +998,7 @@ def refresh_token():
     if not refresh_token:
         return jsonify({'error': 'Refresh token não fornecido'}), 401
     
-    user_id, token_type = verify_token(refresh_token)
+    user_id, token_type, token_version = verify_token(refresh_token)
     
     if not user_id or token_type != 'refresh':
         return jsonify({'error': 'Refresh token inválido'}), 401
@@ -424,8 +1007,11 @@ def refresh_token():
     if not user or not user.is_active:
         return jsonify({'error': 'Usuário não encontrado ou inativo'}), 404
     
+    if token_version is not None and token_version != user.token_version:
+        return jsonify({'error': 'Refresh token inválido'}), 401
+    
     # Gerar novo access token
-    new_access_token = generate_token(user.id, 'access')
+    new_access_token = generate_token(user.id, 'access', user.token_version)
     
     return jsonify({
         'access_token': new_access_token
@@ -467,7 +1053,7 @@ def link_discord():
 
 # Rotas do Bot Discord
 @app.route('/api/bot/check-subscription', methods=['GET'])
-@limiter.limit("100 per minute")
+@limiter.limit(os.getenv('BOT_CHECK_RATE_LIMIT', '100 per minute'))
 def check_subscription():
     """Verifica status de assinatura para o bot"""
     discord_guild_id = request.args.get('discord_guild_id')
@@ -475,22 +1061,86 @@ def check_subscription():
     if not discord_guild_id:
         return jsonify({'error': 'Guild ID não fornecido'}), 400
     
-    guild = DiscordGuild.query.filter_by(guild_id=discord_guild_id, is_active=True).first()
-    
-    if not guild:
-        return jsonify({'status': 'inactive'}), 200
-    
-    owner = User.query.get(guild.owner_user_id)
-    
-    if not owner or not owner.is_active:
-        return jsonify({'status': 'inactive'}), 200
-    
-    # Verificar assinatura
-    if owner.subscription_status == 'active':
-        if owner.subscription_end_date and owner.subscription_end_date > datetime.utcnow():
-            return jsonify({'status': 'active'}), 200
+    status, expires_at = get_guild_subscription(discord_guild_id)
     
-    return jsonify({'status': 'inactive'}), 200
+    return jsonify({'status': resolve_subscription_status(status, expires_at)}), 200
+
+@app.route('/api/bot/check-subscriptions', methods=['GET', 'POST'])
+@limiter.limit(os.getenv('BOT_BATCH_RATE_LIMIT', '30 per minute'))
+def check_subscriptions():
+    """Verifica o status de assinatura de várias guilds em uma única consulta"""
+    if request.method == 'POST':
+        data = request.json or {}
+        guild_ids = data.get('discord_guild_ids', [])
+        since = data.get('since')
+    else:
+        guild_ids = [g for g in request.args.get('discord_guild_ids', '').split(',') if g]
+        since = request.args.get('since')
+
+    if not isinstance(guild_ids, list) or not guild_ids:
+        return jsonify({'error': 'Lista de Guild IDs não fornecida'}), 400
+
+    if len(guild_ids) > MAX_BATCH_GUILDS:
+        return jsonify({'error': f'Máximo de {MAX_BATCH_GUILDS} guilds por requisição'}), 400
+
+    guild_ids = list(dict.fromkeys(str(g) for g in guild_ids))
+
+    if since:
+        try:
+            since = datetime.fromisoformat(since)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Parâmetro since inválido'}), 400
+
+    now = datetime.utcnow()
+    query = db.session.query(
+        DiscordGuild.guild_id,
+        User.is_active,
+        User.subscription_status,
+        User.subscription_end_date
+    ).join(User, DiscordGuild.owner_user_id == User.id).filter(
+        DiscordGuild.guild_id.in_(guild_ids),
+        DiscordGuild.is_active == True
+    )
+
+    # Modo incremental: apenas guilds alteradas ou expiradas desde a última sincronização
+    if since:
+        query = query.filter(db.or_(
+            User.updated_at > since,
+            DiscordGuild.registered_at > since,
+            db.and_(User.subscription_end_date > since, User.subscription_end_date <= now)
+        ))
+
+    found = {}
+    for guild_id, owner_active, subscription_status, subscription_end_date in query:
+        if owner_active and subscription_status == 'active':
+            found[guild_id] = ('active', subscription_end_date)
+        else:
+            found[guild_id] = ('inactive', None)
+
+    if not since:
+        for guild_id in guild_ids:
+            found.setdefault(guild_id, ('inactive', None))
+
+    statuses = {}
+    for guild_id, (status, expires_at) in found.items():
+        subscription_cache.set(guild_id, (status, expires_at))
+        statuses[guild_id] = {
+            'status': resolve_subscription_status(status, expires_at),
+            'expires_at': expires_at.isoformat() if expires_at else None
+        }
+
+    etag = hashlib.sha256(json.dumps(statuses, sort_keys=True).encode()).hexdigest()[:32]
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        response = jsonify({
+            'statuses': statuses,
+            'full': not since,
+            'server_time': now.isoformat()
+        })
+
+    response.set_etag(etag)
+    return response
 
 @app.route('/api/bot/register-guild', methods=['POST'])
 @limiter.limit("10 per hour")
@@ -521,20 +1171,717 @@ def register_guild():
     )
     
     db.session.add(guild)
+    increment_counter('active_guilds')
     db.session.commit()
     
+    invalidate_user_subscriptions([discord_guild_id])
+    
     log_audit(user.id, 'guild_registered', f'Guild registrada: {discord_guild_id}')
     
     return jsonify({'message': 'Servidor registrado com sucesso'}), 200
 
+# Pagamentos e Webhooks
+payment_managers = {}
+
+# Status do provedor que liberam ou revogam o acesso
+PAYMENT_APPROVED_STATUSES = {'approved', 'succeeded'}
+PAYMENT_REVOKED_STATUSES = {'refunded', 'charged_back'}
+# Status em que o provedor ainda pode mudar o resultado e que a reconciliação consulta
+PAYMENT_FINAL_STATUSES = PAYMENT_APPROVED_STATUSES | PAYMENT_REVOKED_STATUSES | {'rejected', 'cancelled', 'canceled'}
+SUBSCRIPTION_FINAL_STATUSES = {'cancelled', 'canceled', 'incomplete_expired'}
+SUBSCRIPTION_STATUS_MAP = {
+    'authorized': 'active',
+    'active': 'active',
+    'trialing': 'active',
+    'paused': 'inactive',
+    'cancelled': 'inactive',
+    'canceled': 'inactive',
+    'unpaid': 'inactive',
+    'incomplete_expired': 'inactive'
+}
+
+def payment_credentials(provider):
+    """Credenciais e opções HTTP do provedor, lidas do ambiente"""
+    if provider == 'mercadopago':
+        credentials = {'access_token': os.getenv('MERCADOPAGO_ACCESS_TOKEN')}
+        base_url = os.getenv('MERCADOPAGO_API_URL')
+    else:
+        credentials = {'secret_key': os.getenv('STRIPE_SECRET_KEY')}
+        base_url = os.getenv('STRIPE_API_URL')
+    credentials['http_options'] = {'base_url': base_url} if base_url else {}
+    return credentials
+
+def get_payment_manager(provider):
+    """Retorna o PaymentManager do provedor, criado uma vez por worker"""
+    if provider not in payment_managers:
+        payment_managers[provider] = PaymentManager(provider, **payment_credentials(provider))
+    return payment_managers[provider]
+
+def plan_period(plan_id):
+    """Período de acesso liberado por um pagamento do plano"""
+    plan = get_plan_catalog()['plans'].get(plan_id)
+    if not plan:
+        return SUBSCRIPTION_PERIOD
+    days = 365 if plan['interval'] == 'year' else 30
+    return timedelta(days=days * plan['interval_count'])
+
+def payment_reference(user_id):
+    """Referência externa enviada ao provedor para identificar o usuário"""
+    return f'user:{user_id}'
+
+def parse_payment_reference(reference):
+    """Extrai o user_id de uma referência externa; None se não for nossa"""
+    if reference and reference.startswith('user:') and reference[5:].isdigit():
+        return int(reference[5:])
+    return None
+
+def provider_ref(info):
+    """Id do pagamento ou assinatura no provedor, como gravado em Payment.provider_ref"""
+    return str(info.get('payment_id') or info.get('subscription_id'))
+
+def webhook_event_key(provider, event, request_id=None):
+    """Retorna (chave de idempotência, tipo) do evento recebido"""
+    if provider == 'stripe':
+        return event.get('id'), event.get('type')
+    
+    # Reentregas do Mercado Pago repetem o id da notificação
+    event_type = event.get('type') or event.get('topic')
+    if event.get('id'):
+        return str(event['id']), event_type
+    data_id = event.get('data', {}).get('id')
+    if data_id and request_id:
+        return f'{event_type}:{data_id}:{request_id}', event_type
+    return None, event_type
+
+def store_webhook_event(provider, event_key, event_type, payload):
+    """Grava o evento se ainda não existir; retorna False para entregas duplicadas"""
+    values = {'provider': provider, 'event_key': event_key, 'event_type': event_type, 'payload': payload}
+    dialect = db.engine.dialect.name
+    
+    # Uma inserção com ON CONFLICT: duplicatas custam uma consulta ao índice único
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(WebhookEvent).values(**values).on_conflict_do_nothing(
+            index_elements=['provider', 'event_key']
+        )
+        inserted = db.session.execute(stmt).rowcount == 1
+        db.session.commit()
+        return inserted
+    
+    try:
+        db.session.add(WebhookEvent(**values))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+def claim_webhook_events(limit):
+    """Reivindica até `limit` eventos pendentes (ou abandonados) para este worker"""
+    now = datetime.utcnow()
+    claimable = db.or_(
+        db.and_(WebhookEvent.status == 'pending',
+                db.or_(WebhookEvent.next_attempt_at.is_(None), WebhookEvent.next_attempt_at <= now)),
+        db.and_(WebhookEvent.status == 'processing', WebhookEvent.claimed_at < now - WEBHOOK_CLAIM_TIMEOUT)
+    )
+    ids = db.session.scalars(
+        db.select(WebhookEvent.id).where(claimable).order_by(WebhookEvent.id).limit(limit)
+    ).all()
+    if not ids:
+        return []
+    
+    # O token identifica as linhas que este worker conseguiu marcar, mesmo com workers concorrentes
+    token = secrets.token_hex(16)
+    db.session.execute(
+        db.update(WebhookEvent)
+        .where(WebhookEvent.id.in_(ids), claimable)
+        .values(status='processing', claim_token=token, claimed_at=now, attempts=WebhookEvent.attempts + 1)
+    )
+    db.session.commit()
+    return WebhookEvent.query.filter_by(claim_token=token).order_by(WebhookEvent.id).all()
+
+def webhook_retry_delay(attempts):
+    """Backoff exponencial entre tentativas de um evento cujo provedor falhou"""
+    return timedelta(seconds=min(WEBHOOK_RETRY_BASE * 2 ** max(attempts - 1, 0), WEBHOOK_RETRY_MAX))
+
+def requeue_failed_webhook_events():
+    """Devolve à fila os eventos que esgotaram as tentativas; retorna quantos"""
+    result = db.session.execute(
+        db.update(WebhookEvent)
+        .where(WebhookEvent.status == 'failed')
+        .values(status='pending', attempts=0, next_attempt_at=None, claim_token=None)
+    )
+    db.session.commit()
+    return result.rowcount
+
+def apply_payment_change(user, payment, kind, info, now):
+    """Atualiza a assinatura do usuário conforme o novo status do provedor; retorna o delta de assinaturas ativas"""
+    previous_status = payment.status
+    payment.status = info.get('status')
+    if kind == 'payment' and info.get('transaction_amount') is not None:
+        payment.amount = info['transaction_amount']
+    
+    new_status, new_end_date = None, None
+    if kind == 'payment':
+        # Só a transição de status altera a assinatura: reentregas não estendem o período de novo
+        if payment.status in PAYMENT_APPROVED_STATUSES and previous_status not in PAYMENT_APPROVED_STATUSES:
+            new_status = 'active'
+            new_end_date = max(user.subscription_end_date or now, now) + plan_period(payment.plan)
+        elif payment.status in PAYMENT_REVOKED_STATUSES and previous_status not in PAYMENT_REVOKED_STATUSES:
+            new_status = 'inactive'
+    else:
+        new_status = SUBSCRIPTION_STATUS_MAP.get(payment.status)
+        if new_status == 'active' and info.get('period_end'):
+            new_end_date = max(user.subscription_end_date or info['period_end'], info['period_end'])
+    
+    if new_end_date:
+        user.subscription_end_date = new_end_date
+    if not new_status or new_status == user.subscription_status:
+        return 0
+    
+    was_active = user.subscription_status == 'active'
+    user.subscription_status = new_status
+    return 1 if new_status == 'active' else (-1 if was_active else 0)
+
+def apply_provider_updates(updates):
+    """Aplica [(provedor, tipo, status do objeto)] aos pagamentos e assinaturas na sessão atual
+    
+    Retorna (lista indicando se cada item foi associado a um usuário, ids dos usuários alterados).
+    O commit e a invalidação dos caches ficam a cargo do chamador.
+    """
+    # Carrega pagamentos e usuários do lote inteiro em poucas consultas
+    refs_by_provider = {}
+    references = set()
+    for provider, kind, info in updates:
+        refs_by_provider.setdefault(provider, set()).add(provider_ref(info))
+        references.add(parse_payment_reference(info.get('external_reference')))
+    
+    payments = {}
+    for provider, refs in refs_by_provider.items():
+        for payment in Payment.query.filter(Payment.provider == provider, Payment.provider_ref.in_(refs)):
+            payments[(provider, payment.provider_ref)] = payment
+    
+    user_ids = {payment.user_id for payment in payments.values()} | references
+    user_ids.discard(None)
+    users = {user.id: user for user in User.query.filter(User.id.in_(user_ids))} if user_ids else {}
+    
+    now = datetime.utcnow()
+    active_delta = 0
+    applied = []
+    touched_users = set()
+    for provider, kind, info in updates:
+        ref = provider_ref(info)
+        payment = payments.get((provider, ref))
+        user = users.get(payment.user_id if payment else parse_payment_reference(info.get('external_reference')))
+        if not user:
+            applied.append(False)
+            continue
+        
+        if not payment:
+            payment = Payment(provider=provider, provider_ref=ref, kind=kind, user_id=user.id)
+            payments[(provider, ref)] = payment
+            db.session.add(payment)
+        
+        active_delta += apply_payment_change(user, payment, kind, info, now)
+        touched_users.add(user.id)
+        applied.append(True)
+    
+    if active_delta:
+        increment_counter('active_subscriptions', active_delta)
+    
+    return applied, touched_users
+
+def invalidate_payment_users(user_ids):
+    """Remove dos caches os usuários alterados por pagamentos e as guilds deles"""
+    if not user_ids:
+        return
+    guild_ids = [guild_id for guild_id, in db.session.query(DiscordGuild.guild_id).filter(
+        DiscordGuild.owner_user_id.in_(user_ids))]
+    invalidate_user_state(*user_ids)
+    invalidate_user_subscriptions(guild_ids)
+
+def process_webhook_batch(limit):
+    """Aplica um lote de eventos pendentes às assinaturas; retorna quantos foram resolvidos
+    
+    Eventos reagendados por falha do provedor não contam, para o pool não girar em falso.
+    """
+    with app.app_context():
+        events = claim_webhook_events(limit)
+        if not events:
+            return 0
+        
+        # Consulta os provedores fora da transação de escrita
+        now = datetime.utcnow()
+        resolved, updates = [], []
+        retried = 0
+        for event in events:
+            event.claim_token = None
+            try:
+                change = get_payment_manager(event.provider).resolve_webhook_event(json.loads(event.payload))
+            except Exception as e:
+                print(f"Erro ao interpretar webhook {event.id}: {e}")
+                change = ('error', None)
+            
+            if change is None:
+                event.status, event.processed_at = 'ignored', now
+            elif change[1] is None:
+                # Provedor indisponível: volta para a fila com backoff até o limite de tentativas
+                event.status = 'failed' if event.attempts >= WEBHOOK_MAX_ATTEMPTS else 'pending'
+                event.next_attempt_at = now + webhook_retry_delay(event.attempts)
+                event.error = 'Falha ao consultar o provedor'
+                retried += 1
+            else:
+                resolved.append(event)
+                updates.append((event.provider, *change))
+        
+        applied, touched_users = apply_provider_updates(updates)
+        for event, ok in zip(resolved, applied):
+            event.status, event.processed_at = ('processed' if ok else 'ignored'), now
+            event.error = None if ok else 'Usuário não identificado'
+        
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        invalidate_payment_users(touched_users)
+        return len(events) - retried
+
+webhook_workers = WorkerPool(
+    process_webhook_batch,
+    workers=int(os.getenv('WEBHOOK_WORKERS', 2)),
+    batch_size=int(os.getenv('WEBHOOK_BATCH_SIZE', 100)),
+    poll_interval=float(os.getenv('WEBHOOK_POLL_INTERVAL', 5.0))
+)
+
+# O pool só roda em processos que servem requisições: o gunicorn o inicia em cada worker
+# (gunicorn.conf.py) e a primeira requisição cobre outros servidores. Comandos da CLI
+# importam o app sem iniciar threads que reivindiquem eventos em segundo plano.
+@app.before_request
+def ensure_webhook_workers():
+    webhook_workers.start()
+
+@app.route('/api/payments/webhook/<provider>', methods=['POST'])
+@limiter.exempt
+def payment_webhook(provider):
+    """Recebe notificações dos provedores de pagamento e confirma imediatamente"""
+    if provider not in WEBHOOK_SECRETS:
+        return jsonify({'error': 'Provedor não suportado'}), 404
+    
+    secret = WEBHOOK_SECRETS[provider]
+    if not secret:
+        return jsonify({'error': 'Webhook não configurado'}), 503
+    
+    payload = request.get_data(as_text=True)
+    if provider == 'stripe':
+        signature, request_id = request.headers.get('Stripe-Signature'), None
+    else:
+        signature, request_id = request.headers.get('X-Signature'), request.headers.get('X-Request-Id')
+    
+    if not get_payment_manager(provider).verify_webhook(payload, signature, secret, request_id):
+        log_security_event('webhook_invalid_signature', 'high', f'Assinatura de webhook inválida: {provider}')
+        return jsonify({'error': 'Assinatura inválida'}), 401
+    
+    try:
+        event = json.loads(payload)
+    except ValueError:
+        return jsonify({'error': 'Payload inválido'}), 400
+    
+    event_key, event_type = webhook_event_key(provider, event, request_id)
+    if not event_key:
+        return jsonify({'error': 'Evento sem identificador'}), 400
+    
+    inserted = store_webhook_event(provider, event_key, event_type, payload)
+    if inserted:
+        webhook_workers.notify()
+    
+    return jsonify({'received': True, 'duplicate': not inserted}), 200
+
+# Reconciliação de Pagamentos
+RECONCILE_JOB = 'reconcile-payments'
+
+def reconcilable_payments_query():
+    """Pagamentos e assinaturas cujo status ainda não é definitivo"""
+    return Payment.query.filter(db.or_(
+        Payment.status.is_(None),
+        db.and_(Payment.kind == 'payment', Payment.status.notin_(PAYMENT_FINAL_STATUSES)),
+        db.and_(Payment.kind == 'subscription', Payment.status.notin_(SUBSCRIPTION_FINAL_STATUSES))
+    ))
+
+def load_reconcile_batch(after_id, limit):
+    """Próximo lote de itens a reconciliar, em ordem de id (keyset)"""
+    rows = reconcilable_payments_query().filter(Payment.id > after_id).order_by(Payment.id).limit(limit).with_entities(
+        Payment.id, Payment.provider, Payment.kind, Payment.provider_ref
+    )
+    return [tuple(row) for row in rows]
+
+def load_reconcile_items(ids):
+    """Itens de `ids` que ainda não têm status definitivo"""
+    rows = reconcilable_payments_query().filter(Payment.id.in_(ids)).order_by(Payment.id).with_entities(
+        Payment.id, Payment.provider, Payment.kind, Payment.provider_ref
+    )
+    return [tuple(row) for row in rows]
+
+def apply_reconcile_batch(results, last_id, summary):
+    """Grava os status consultados e o checkpoint na mesma transação"""
+    updates = [(provider, kind, info) for _, provider, kind, info in results if info]
+    _, touched_users = apply_provider_updates(updates) if updates else ([], set())
+    
+    checkpoint = db.session.get(JobCheckpoint, RECONCILE_JOB)
+    checkpoint.last_id = last_id
+    checkpoint.state = json.dumps(summary())
+    
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    invalidate_payment_users(touched_users)
+
+def report_reconcile_progress(summary):
+    """Imprime o progresso da reconciliação após cada lote"""
+    error_rates = ', '.join(
+        f"{provider} {stats['error_rate']:.1%}" for provider, stats in summary['providers'].items()
+    )
+    print(f"{summary['processed']} itens | {summary['payments_per_second']} pagamentos/s | erros: {error_rates}")
+
+async def run_payment_reconciliation(after_id, batch_size, rate, concurrency, retry_ids=()):
+    """Executa a varredura com um AsyncPaymentManager por provedor configurado"""
+    managers = {}
+    for provider in ('mercadopago', 'stripe'):
+        credentials = payment_credentials(provider)
+        if credentials.get('access_token') or credentials.get('secret_key'):
+            credentials['http_options']['max_concurrency'] = concurrency
+            managers[provider] = AsyncPaymentManager(provider, **credentials)
+    
+    reconciler = PaymentReconciler(
+        managers,
+        load_reconcile_batch,
+        lambda results, last_id: apply_reconcile_batch(results, last_id, lambda: reconciler.summary(last_id)),
+        batch_size=batch_size,
+        rate=rate,
+        report_fn=report_reconcile_progress,
+        load_items=load_reconcile_items
+    )
+    try:
+        return await reconciler.run(after_id, retry_ids)
+    finally:
+        for manager in managers.values():
+            await manager.aclose()
+
+@app.cli.command('reconcile-payments')
+@click.option('--batch-size', default=200, show_default=True, help='Itens por lote/checkpoint')
+@click.option('--rate', default=10.0, show_default=True, help='Requisições por segundo por provedor')
+@click.option('--concurrency', default=10, show_default=True, help='Requisições simultâneas por provedor')
+@click.option('--restart', is_flag=True, help='Ignora o checkpoint e recomeça do início')
+def reconcile_payments_command(batch_size, rate, concurrency, restart):
+    """Consulta nos provedores os pagamentos e assinaturas pendentes e atualiza o estado local"""
+    checkpoint = db.session.get(JobCheckpoint, RECONCILE_JOB)
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(name=RECONCILE_JOB)
+        db.session.add(checkpoint)
+    
+    # Execução anterior interrompida: retoma do último lote gravado e repete as consultas que falharam
+    retry_ids = []
+    if restart or checkpoint.finished_at is not None or checkpoint.started_at is None:
+        checkpoint.last_id = 0
+        checkpoint.started_at = datetime.utcnow()
+        checkpoint.finished_at = None
+    else:
+        retry_ids = json.loads(checkpoint.state or '{}').get('failed_ids', [])
+        print(f"Retomando a partir do id {checkpoint.last_id} ({len(retry_ids)} consultas a repetir)")
+    db.session.commit()
+    
+    summary = asyncio.run(run_payment_reconciliation(checkpoint.last_id, batch_size, rate, concurrency, retry_ids))
+    
+    checkpoint = db.session.get(JobCheckpoint, RECONCILE_JOB)
+    checkpoint.finished_at = datetime.utcnow()
+    checkpoint.state = json.dumps(summary)
+    db.session.commit()
+    print(json.dumps(summary, indent=2))
+
+@app.cli.command('process-webhooks')
+@click.option('--retry-failed', is_flag=True, help='Devolve à fila os eventos que esgotaram as tentativas')
+def process_webhooks_command(retry_failed):
+    """Processa na hora todos os eventos de webhook pendentes"""
+    if retry_failed:
+        print(f"{requeue_failed_webhook_events()} eventos com falha devolvidos à fila")
+    print(f"{webhook_workers.drain()} eventos processados")
+
+# Catálogo de Planos
+def build_plan_catalog():
+    """Serializa o catálogo uma vez por versão: corpo JSON pronto e ETag"""
+    catalog = db.session.get(PlanCatalog, 1)
+    version = catalog.version if catalog else 0
+    plans = [plan.to_dict() for plan in SubscriptionPlan.query.filter_by(is_active=True).order_by(
+        SubscriptionPlan.sort_order, SubscriptionPlan.id)]
+    
+    body = json.dumps({'version': version, 'plans': plans}, separators=(',', ':')).encode()
+    return {
+        'version': version,
+        'plans': {plan['id']: plan for plan in plans},
+        'body': body,
+        'etag': f'plans-v{version}-{hashlib.sha256(body).hexdigest()[:16]}'
+    }
+
+def get_plan_catalog():
+    """Retorna o catálogo em cache, reconstruindo apenas quando a versão no banco mudou"""
+    snapshot = plan_catalog_state['snapshot']
+    if snapshot and time.monotonic() - plan_catalog_state['checked_at'] < PLAN_CATALOG_CHECK_INTERVAL:
+        return snapshot
+    
+    # Uma consulta por chave primária a cada intervalo propaga edições feitas em outros workers
+    version = db.session.scalar(db.select(PlanCatalog.version).where(PlanCatalog.id == 1)) or 0
+    if not snapshot or snapshot['version'] != version:
+        snapshot = build_plan_catalog()
+    
+    plan_catalog_state.update(snapshot=snapshot, checked_at=time.monotonic())
+    return snapshot
+
+@app.route('/api/plans', methods=['GET'])
+@limiter.exempt
+def get_plans():
+    """Catálogo público de planos, servido a partir do corpo pré-serializado"""
+    catalog = get_plan_catalog()
+    
+    response = app.response_class(catalog['body'], mimetype='application/json')
+    response.set_etag(catalog['etag'])
+    response.cache_control.public = True
+    response.cache_control.max_age = PLAN_CATALOG_MAX_AGE
+    response.headers['X-Catalog-Version'] = str(catalog['version'])
+    return response.make_conditional(request)
+
+# Pagamentos Pix
+def cache_artifact(artifact):
+    """Guarda o artefato no cache do worker até, no máximo, a expiração do pagamento"""
+    cached = (artifact.content, artifact.content_type, artifact.etag, artifact.expires_at)
+    remaining = (artifact.expires_at - datetime.utcnow()).total_seconds()
+    if remaining > 0:
+        artifact_cache.set(artifact.token, cached, ttl=min(remaining, artifact_cache.ttl))
+    return cached
+
+def serialize_payment(payment, artifact=None):
+    """Resposta enxuta de status; o QR code é servido à parte por URL própria"""
+    data = {
+        'payment_id': payment.id,
+        'provider': payment.provider,
+        'plan': payment.plan,
+        'amount': payment.amount,
+        'status': payment.status,
+        'created_at': payment.created_at.isoformat()
+    }
+    if artifact and payment.status not in PAYMENT_FINAL_STATUSES and artifact.expires_at > datetime.utcnow():
+        data['qr_code_url'] = url_for('get_pix_qr_code', token=artifact.token)
+        data['expires_at'] = artifact.expires_at.isoformat()
+    return data
+
+@app.route('/api/payments/pix', methods=['POST'])
+@limiter.limit("10 per minute")
+@require_auth
+def create_pix_payment():
+    """Cria um pagamento Pix para um plano de assinatura"""
+    data = request.json or {}
+    plan_id = data.get('plan', 'monthly')
+    plan = get_plan_catalog()['plans'].get(plan_id)
+    
+    if not plan:
+        return jsonify({'error': 'Plano inválido'}), 400
+    
+    user = request.current_user
+    result = get_payment_manager('mercadopago').create_pix_payment(plan['price'], plan['name'], {
+        'email': user.email,
+        'doc_type': data.get('doc_type', 'CPF'),
+        'doc_number': sanitize_input(data.get('doc_number', '')),
+        'external_reference': payment_reference(user.id)
+    })
+    
+    if not result:
+        return jsonify({'error': 'Não foi possível criar o pagamento. Tente novamente.'}), 502
+    
+    payment = Payment(
+        provider='mercadopago',
+        provider_ref=str(result['payment_id']),
+        kind='payment',
+        user_id=user.id,
+        status=result['status'],
+        amount=plan['price'],
+        plan=plan_id
+    )
+    db.session.add(payment)
+    db.session.flush()
+    
+    # O QR code é gravado uma única vez; as consultas de status não o repetem
+    artifact = None
+    if result.get('qr_code_base64'):
+        content = base64.b64decode(result['qr_code_base64'])
+        artifact = PaymentArtifact(
+            payment_id=payment.id,
+            token=secrets.token_urlsafe(32),
+            content_type='image/png',
+            content=content,
+            etag=hashlib.sha256(content).hexdigest()[:32],
+            expires_at=result.get('expires_at') or datetime.utcnow() + PIX_DEFAULT_EXPIRATION
+        )
+        db.session.add(artifact)
+    
+    db.session.commit()
+    
+    if artifact:
+        cache_artifact(artifact)
+    
+    log_audit(user.id, 'pix_payment_created', f'Pagamento Pix {payment.id} criado ({plan_id})')
+    
+    response = serialize_payment(payment, artifact)
+    response['qr_code'] = result.get('qr_code')
+    response['ticket_url'] = result.get('ticket_url')
+    return jsonify(response), 201
+
+@app.route('/api/payments/<int:payment_id>', methods=['GET'])
+@limiter.limit(os.getenv('PAYMENT_STATUS_RATE_LIMIT', '120 per minute'))
+@require_auth
+def get_payment(payment_id):
+    """Status de um pagamento do usuário, para polling do frontend"""
+    payment = db.session.get(Payment, payment_id)
+    
+    if not payment or (payment.user_id != request.current_user.id and not request.current_user.is_admin):
+        return jsonify({'error': 'Pagamento não encontrado'}), 404
+    
+    artifact = PaymentArtifact.query.filter_by(payment_id=payment.id).options(
+        db.load_only(PaymentArtifact.token, PaymentArtifact.expires_at)
+    ).first()
+    
+    return jsonify(serialize_payment(payment, artifact)), 200
+
+@app.route('/api/payments/pix/<token>/qr.png', methods=['GET'])
+@limiter.limit("60 per minute")
+def get_pix_qr_code(token):
+    """Imagem do QR code Pix; o token imprevisível na URL dispensa o cabeçalho de autenticação"""
+    cached = artifact_cache.get(token)
+    if cached is None:
+        artifact = PaymentArtifact.query.filter_by(token=token).first()
+        if not artifact:
+            return jsonify({'error': 'QR code não encontrado'}), 404
+        cached = cache_artifact(artifact)
+    
+    content, content_type, etag, expires_at = cached
+    remaining = int((expires_at - datetime.utcnow()).total_seconds())
+    if remaining <= 0:
+        artifact_cache.invalidate(token)
+        return jsonify({'error': 'QR code expirado'}), 410
+    
+    # O conteúdo nunca muda: o navegador pode reutilizá-lo até o Pix expirar
+    response = app.response_class(content, mimetype=content_type)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = remaining
+    response.cache_control.immutable = True
+    response.expires = expires_at
+    return response.make_conditional(request)
+
+@app.cli.command('purge-payment-artifacts')
+def purge_payment_artifacts_command():
+    """Remove os QR codes de pagamentos Pix já expirados"""
+    result = db.session.execute(
+        db.delete(PaymentArtifact).where(PaymentArtifact.expires_at <= datetime.utcnow())
+    )
+    db.session.commit()
+    print(f"{result.rowcount} artefatos removidos")
+
 # Rotas de Administração
+def filter_users_query():
+    """Monta a consulta de usuários a partir dos filtros da requisição"""
+    query = User.query
+    filtered = False
+    
+    subscription_status = request.args.get('subscription_status')
+    if subscription_status:
+        query = query.filter(User.subscription_status == subscription_status)
+        filtered = True
+    
+    is_active = request.args.get('is_active')
+    if is_active is not None:
+        if is_active.lower() not in ('true', 'false'):
+            raise ValueError('Parâmetro is_active inválido')
+        query = query.filter(User.is_active == (is_active.lower() == 'true'))
+        filtered = True
+    
+    created_from = request.args.get('created_from')
+    if created_from:
+        query = query.filter(User.created_at >= datetime.fromisoformat(created_from))
+        filtered = True
+    
+    created_to = request.args.get('created_to')
+    if created_to:
+        query = query.filter(User.created_at < datetime.fromisoformat(created_to))
+        filtered = True
+    
+    return query, filtered
+
 @app.route('/api/admin/users', methods=['GET'])
 @require_auth
 @require_admin
 def get_all_users():
-    """Lista todos os usuários"""
-    users = User.query.all()
-    return jsonify({'users': [user.to_dict(include_sensitive=True) for user in users]}), 200
+    """Lista usuários com filtros e paginação por cursor"""
+    try:
+        query, filtered = filter_users_query()
+        users, meta = paginate_listing(query, User, filtered, order_column=User.created_at)
+    except (ValueError, UnicodeDecodeError):
+        return jsonify({'error': 'Filtro ou cursor inválido'}), 400
+    
+    return jsonify({
+        'users': [user.to_dict(include_sensitive=True) for user in users],
+        **meta
+    }), 200
+
+@app.route('/api/admin/users/export', methods=['GET'])
+@require_auth
+@require_admin
+def export_users():
+    """Exporta usuários em NDJSON ou CSV via streaming, com memória constante"""
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'Formato inválido. Use ndjson ou csv'}), 400
+    
+    try:
+        query, _ = filter_users_query()
+    except ValueError:
+        return jsonify({'error': 'Filtro inválido'}), 400
+    
+    log_audit(request.current_user.id, 'users_exported', f'Exportação de usuários em {export_format}')
+    
+    # yield_per usa cursor no servidor e materializa apenas um lote por vez
+    rows = query.order_by(User.id).yield_per(EXPORT_BATCH_SIZE)
+    
+    def generate_ndjson():
+        for user in rows:
+            yield json.dumps(user.to_dict(include_sensitive=True), ensure_ascii=False) + '\n'
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = None
+        for user in rows:
+            data = user.to_dict(include_sensitive=True)
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(data.keys()))
+                writer.writeheader()
+            writer.writerow(data)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    
+    if export_format == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(), 'application/x-ndjson'
+    
+    filename = f'users-{datetime.utcnow():%Y%m%d%H%M%S}.{export_format}'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
 
 @app.route('/api/admin/users/<int:user_id>', methods=['PUT'])
 @require_auth
@@ -549,19 +1896,33 @@ def update_user(user_id):
     data = request.json
     
     if 'subscription_status' in data:
+        was_active = user.subscription_status == 'active'
         user.subscription_status = data['subscription_status']
+        if was_active != (user.subscription_status == 'active'):
+            increment_counter('active_subscriptions', -1 if was_active else 1)
     
     if 'subscription_end_date' in data:
         user.subscription_end_date = datetime.fromisoformat(data['subscription_end_date'])
     
+    # Revogar tokens emitidos ao desativar, remover privilégios ou a pedido do admin
+    revoke_tokens = bool(data.get('revoke_tokens'))
+    
     if 'is_admin' in data:
+        revoke_tokens = revoke_tokens or (user.is_admin and not data['is_admin'])
         user.is_admin = data['is_admin']
     
     if 'is_active' in data:
+        revoke_tokens = revoke_tokens or (user.is_active and not data['is_active'])
         user.is_active = data['is_active']
     
+    if revoke_tokens:
+        user.token_version = (user.token_version or 0) + 1
+    
     db.session.commit()
     
+    invalidate_user_subscriptions([guild.guild_id for guild in user.guilds])
+    invalidate_user_state(user.id)
+    
     log_audit(request.current_user.id, 'user_updated', f'Usuário {user_id} atualizado')
     
     return jsonify({
@@ -582,9 +1943,17 @@ def delete_user(user_id):
     if user.is_admin and User.query.filter_by(is_admin=True).count() == 1:
         return jsonify({'error': 'Não é possível deletar o único administrador'}), 400
     
+    guild_ids = [guild.guild_id for guild in user.guilds]
+    
     db.session.delete(user)
+    increment_counter('users_total', -1)
+    if user.subscription_status == 'active':
+        increment_counter('active_subscriptions', -1)
     db.session.commit()
     
+    invalidate_user_subscriptions(guild_ids)
+    invalidate_user_state(user_id)
+    
     log_audit(request.current_user.id, 'user_deleted', f'Usuário {user_id} deletado')
     log_security_event('user_deleted', 'high', f'Usuário {user_id} deletado por admin {request.current_user.id}')
     
@@ -642,28 +2011,167 @@ def update_payment_config():
     
     return jsonify({'message': 'Configuração de pagamento atualizada com sucesso'}), 200
 
+@app.route('/api/admin/plans', methods=['GET'])
+@require_auth
+@require_admin
+def get_admin_plans():
+    """Retorna todos os planos, incluindo os inativos, e a versão do catálogo"""
+    plans = SubscriptionPlan.query.order_by(SubscriptionPlan.sort_order, SubscriptionPlan.id).all()
+    version = db.session.scalar(db.select(PlanCatalog.version).where(PlanCatalog.id == 1)) or 0
+    
+    return jsonify({
+        'version': version,
+        'plans': [{**plan.to_dict(), 'is_active': plan.is_active, 'sort_order': plan.sort_order} for plan in plans]
+    }), 200
+
+@app.route('/api/admin/plans/<plan_id>', methods=['PUT'])
+@require_auth
+@require_admin
+def update_plan(plan_id):
+    """Cria ou atualiza um plano; exige a versão atual do catálogo (controle otimista)"""
+    data = request.json or {}
+    
+    if not isinstance(data.get('version'), int):
+        return jsonify({'error': 'Versão do catálogo não fornecida'}), 400
+    
+    plan = db.session.get(SubscriptionPlan, plan_id)
+    if not plan:
+        if not re.match(r'^[a-z0-9_-]{1,30}$', plan_id) or not data.get('name') or 'price' not in data:
+            return jsonify({'error': 'Novo plano exige id válido, nome e preço'}), 400
+        plan = SubscriptionPlan(id=plan_id)
+        db.session.add(plan)
+    
+    try:
+        if 'name' in data:
+            plan.name = sanitize_input(data['name'])
+        if 'description' in data:
+            plan.description = sanitize_input(data['description'] or '')
+        if 'price' in data:
+            plan.price = round(float(data['price']), 2)
+            if plan.price <= 0:
+                raise ValueError('price')
+        if 'interval' in data:
+            if data['interval'] not in ('month', 'year'):
+                raise ValueError('interval')
+            plan.interval = data['interval']
+        if 'interval_count' in data:
+            plan.interval_count = int(data['interval_count'])
+            if plan.interval_count < 1:
+                raise ValueError('interval_count')
+        if 'is_active' in data:
+            plan.is_active = bool(data['is_active'])
+        if 'sort_order' in data:
+            plan.sort_order = int(data['sort_order'])
+    except (TypeError, ValueError):
+        db.session.rollback()
+        return jsonify({'error': 'Dados do plano inválidos'}), 400
+    
+    # A versão só avança se ninguém editou o catálogo desde a leitura, na mesma transação da edição
+    result = db.session.execute(
+        db.update(PlanCatalog)
+        .where(PlanCatalog.id == 1, PlanCatalog.version == data['version'])
+        .values(version=PlanCatalog.version + 1, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        db.session.rollback()
+        current = db.session.scalar(db.select(PlanCatalog.version).where(PlanCatalog.id == 1))
+        return jsonify({'error': 'O catálogo foi alterado por outra pessoa. Recarregue e tente novamente.',
+                        'version': current}), 409
+    
+    db.session.commit()
+    
+    # Este worker vê a nova versão imediatamente; os demais na próxima verificação
+    plan_catalog_state['checked_at'] = 0.0
+    
+    log_audit(request.current_user.id, 'plan_updated', f'Plano {plan_id} atualizado (catálogo v{data["version"] + 1})')
+    
+    return jsonify({
+        'message': 'Plano atualizado com sucesso',
+        'version': data['version'] + 1,
+        'plan': plan.to_dict()
+    }), 200
+
 @app.route('/api/admin/stats', methods=['GET'])
 @require_auth
 @require_admin
 def get_stats():
     """Retorna estatísticas do sistema"""
-    total_users = User.query.count()
-    active_subscriptions = User.query.filter_by(subscription_status='active').count()
-    total_guilds = DiscordGuild.query.filter_by(is_active=True).count()
+    snapshot = stats_cache.get('stats')
+    if snapshot is None:
+        snapshot = build_stats_snapshot()
+        stats_cache.set('stats', snapshot)
+    return jsonify(snapshot), 200
+
+def build_stats_snapshot():
+    """Monta as estatísticas a partir dos contadores e rollups materializados"""
+    counters = StatCounter.query.all()
+    oldest = min((c.reconciled_at for c in counters if c.reconciled_at), default=None)
+    
+    # Reconciliação periódica para corrigir desvios dos contadores incrementais
+    if len(counters) < len(STAT_COUNTERS) or not oldest or datetime.utcnow() - oldest > STATS_RECONCILE_INTERVAL:
+        reconcile_counters()
+        counters = StatCounter.query.all()
+    
+    values = {c.name: c.value for c in counters}
+    
     recent_security_events = SecurityEvent.query.filter(
         SecurityEvent.severity.in_(['high', 'critical'])
     ).order_by(SecurityEvent.timestamp.desc()).limit(10).all()
     
-    return jsonify({
-        'total_users': total_users,
-        'active_subscriptions': active_subscriptions,
-        'total_guilds': total_guilds,
+    now = datetime.utcnow()
+    rollups = MetricRollup.query.filter(db.or_(
+        db.and_(MetricRollup.metric == 'signups_per_day',
+                MetricRollup.bucket_start >= bucket_start(now, 'day') - timedelta(days=30)),
+        db.and_(MetricRollup.metric == 'logins_per_hour',
+                MetricRollup.bucket_start >= bucket_start(now, 'hour') - timedelta(hours=48))
+    )).order_by(MetricRollup.bucket_start).all()
+    
+    series = {'signups_per_day': [], 'logins_per_hour': []}
+    for rollup in rollups:
+        series[rollup.metric].append({'bucket': rollup.bucket_start.isoformat(), 'count': rollup.value})
+    
+    return {
+        'total_users': values.get('users_total', 0),
+        'active_subscriptions': values.get('active_subscriptions', 0),
+        'total_guilds': values.get('active_guilds', 0),
+        'counters_reconciled_at': oldest.isoformat() if oldest else None,
+        'signups_per_day': series['signups_per_day'],
+        'logins_per_hour': series['logins_per_hour'],
+        'generated_at': now.isoformat(),
         'recent_security_events': [{
             'type': event.event_type,
             'severity': event.severity,
             'description': event.description,
             'timestamp': event.timestamp.isoformat()
         } for event in recent_security_events]
+    }
+
+@app.cli.command('reconcile-stats')
+def reconcile_stats_command():
+    """Recalcula os contadores materializados do painel"""
+    reconcile_counters()
+    print({c.name: c.value for c in StatCounter.query.all()})
+
+@app.route('/api/admin/cache-stats', methods=['GET'])
+@require_auth
+@require_admin
+def get_cache_stats():
+    """Retorna contadores dos caches em memória deste worker"""
+    return jsonify({
+        'subscription_cache': subscription_cache.stats(),
+        'user_state_cache': user_state_cache.stats(),
+        'log_writer': log_writer.stats()
+    }), 200
+
+@app.route('/api/admin/payment-metrics', methods=['GET'])
+@require_auth
+@require_admin
+def get_payment_metrics():
+    """Retorna histogramas de latência e o estado da fila de webhooks"""
+    webhook_events = dict(db.session.query(WebhookEvent.status, db.func.count()).group_by(WebhookEvent.status))
+    return jsonify({
+        'latency': get_latency_stats(),
+        'webhooks': {'events': webhook_events, 'workers': webhook_workers.stats()}
     }), 200
 
 @app.route('/api/admin/audit-logs', methods=['GET'])
@@ -671,12 +2179,12 @@ def get_stats():
 @require_admin
 def get_audit_logs():
     """Retorna logs de auditoria"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 50, type=int)
-    
-    logs = AuditLog.query.order_by(AuditLog.timestamp.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    try:
+        # Carrega o autor junto com o log para evitar uma consulta por linha
+        query = AuditLog.query.options(db.joinedload(AuditLog.user).load_only(User.username))
+        logs, meta = paginate_listing(query, AuditLog)
+    except (ValueError, UnicodeDecodeError):
+        return jsonify({'error': 'Cursor inválido'}), 400
     
     return jsonify({
         'logs': [{
@@ -687,10 +2195,8 @@ def get_audit_logs():
             'details': log.details,
             'ip_address': log.ip_address,
             'timestamp': log.timestamp.isoformat()
-        } for log in logs.items],
-        'total': logs.total,
-        'pages': logs.pages,
-        'current_page': logs.page
+        } for log in logs],
+        **meta
     }), 200
 
 @app.route('/api/admin/security-events', methods=['GET'])
@@ -698,8 +2204,6 @@ def get_audit_logs():
 @require_admin
 def get_security_events():
     """Retorna eventos de segurança"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 50, type=int)
     severity = request.args.get('severity', None)
     
     query = SecurityEvent.query
@@ -707,9 +2211,10 @@ def get_security_events():
     if severity:
         query = query.filter_by(severity=severity)
     
-    events = query.order_by(SecurityEvent.timestamp.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    try:
+        events, meta = paginate_listing(query, SecurityEvent, filtered=bool(severity))
+    except (ValueError, UnicodeDecodeError):
+        return jsonify({'error': 'Cursor inválido'}), 400
     
     return jsonify({
         'events': [{
@@ -720,13 +2225,17 @@ def get_security_events():
             'ip_address': event.ip_address,
             'user_id': event.user_id,
             'timestamp': event.timestamp.isoformat()
-        } for event in events.items],
-        'total': events.total,
-        'pages': events.pages,
-        'current_page': events.page
+        } for event in events],
+        **meta
     }), 200
 
 # Tratamento de Erros
+@app.errorhandler(PasswordHasherBusy)
+def password_hasher_busy_handler(e):
+    """Pool de verificação de senhas saturado"""
+    log_security_event('password_hasher_busy', 'medium', f'Pool de hash de senhas saturado: {request.path}')
+    return jsonify({'error': 'Servidor ocupado. Por favor, tente novamente em instantes.'}), 503
+
 @app.errorhandler(429)
 def ratelimit_handler(e):
     """Tratamento de erro de rate limit"""
@@ -0,0 +1,92 @@
+"""
+Benchmark do Rate Limiter
+Mede o custo por requisição da verificação de limite em diferentes storages
+
+Uso:
+    python bench_limiter.py --storage memory:// --iterations 50000
+    python bench_limiter.py --storage redis://localhost:6379/0 --strategy moving-window
+"""
+
+import argparse
+import time
+
+from flask import Flask
+from flask_limiter import Limiter
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+
+
+def bench_storage(storage_uri, strategy, iterations, keys):
+    """Mede o custo puro de `hit` no storage, sem Flask"""
+    storage = storage_from_string(storage_uri)
+    limiter = STRATEGIES[strategy](storage)
+    item = parse("1000000 per minute")
+
+    started = time.perf_counter()
+    for i in range(iterations):
+        limiter.hit(item, f"bench-{i % keys}")
+    elapsed = time.perf_counter() - started
+
+    storage.reset()
+    return elapsed
+
+
+def bench_flask(storage_uri, strategy, iterations, keys):
+    """Mede o custo de uma requisição Flask com e sem o limiter"""
+    results = {}
+
+    for enabled in (False, True):
+        app = Flask(__name__)
+        limiter = Limiter(
+            app=app,
+            key_func=lambda: f"bench-{app.config['BENCH_COUNTER'] % keys}",
+            storage_uri=storage_uri,
+            strategy=strategy,
+            enabled=enabled
+        )
+
+        @app.route('/ping')
+        @limiter.limit("1000000 per minute")
+        def ping():
+            return 'ok'
+
+        client = app.test_client()
+        app.config['BENCH_COUNTER'] = 0
+
+        started = time.perf_counter()
+        for i in range(iterations):
+            app.config['BENCH_COUNTER'] = i
+            client.get('/ping')
+        results[enabled] = time.perf_counter() - started
+
+        if enabled:
+            limiter.reset()
+
+    return results[False], results[True]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do rate limiter')
+    parser.add_argument('--storage', default='memory://')
+    parser.add_argument('--strategy', default='moving-window', choices=sorted(STRATEGIES))
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--keys', type=int, default=1000, help='Número de IPs distintos simulados')
+    args = parser.parse_args()
+
+    print(f"Storage: {args.storage} | Estratégia: {args.strategy} | "
+          f"Iterações: {args.iterations} | Chaves: {args.keys}")
+
+    elapsed = bench_storage(args.storage, args.strategy, args.iterations, args.keys)
+    print(f"hit() direto:        {elapsed / args.iterations * 1e6:8.1f} µs/req  "
+          f"({args.iterations / elapsed:,.0f} req/s)")
+
+    baseline, limited = bench_flask(args.storage, args.strategy, args.iterations, args.keys)
+    overhead = (limited - baseline) / args.iterations * 1e6
+    print(f"Flask sem limiter:   {baseline / args.iterations * 1e6:8.1f} µs/req")
+    print(f"Flask com limiter:   {limited / args.iterations * 1e6:8.1f} µs/req")
+    print(f"Overhead do limiter: {overhead:8.1f} µs/req")
+
+
+if __name__ == '__main__':
+    main()
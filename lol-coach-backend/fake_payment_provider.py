@@ -0,0 +1,233 @@
+"""
+Provedor de Pagamentos Falso
+Servidor HTTP local que imita os endpoints usados do Mercado Pago e do Stripe,
+para testes dos clientes síncronos e assíncronos sem acesso à rede
+
+Uso:
+    python fake_payment_provider.py --port 8089 --latency 0.05 --failure-rate 0.1
+
+    MercadoPagoProcessor(token, base_url='http://127.0.0.1:8089/mercadopago')
+    StripeProcessor(key, base_url='http://127.0.0.1:8089/stripe/v1')
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+# 1x1 PNG transparente usado como QR code de teste
+FAKE_QR_PNG_BASE64 = (
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class FakePaymentProvider:
+    """Servidor falso com estado em memória, latência e falhas configuráveis"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, failure_rate=0.0,
+                 payment_status='pending'):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.payment_status = payment_status
+        self.payments = {}
+        self.subscriptions = {}
+        self.requests = []
+        self._ids = itertools.count(1000)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """Inicia o servidor em uma thread de fundo"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Para o servidor"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def set_payment_status(self, payment_id, status):
+        """Altera o status de um pagamento, simulando a aprovação pelo provedor"""
+        self.payments[str(payment_id)]['status'] = status
+
+    def _next_id(self, prefix=''):
+        with self._lock:
+            return f'{prefix}{next(self._ids)}'
+
+    # Rotas: (método, regex) -> função(match, body) -> (status, resposta)
+    def _routes(self):
+        return [
+            ('POST', r'/mercadopago/v1/payments', self._mp_create_payment),
+            ('GET', r'/mercadopago/v1/payments/(?P<id>[^/]+)', self._get_payment),
+            ('POST', r'/mercadopago/v1/customers', self._create_customer),
+            ('POST', r'/mercadopago/v1/customers/(?P<id>[^/]+)/cards', self._create_card),
+            ('POST', r'/mercadopago/preapproval', self._create_subscription),
+            ('GET', r'/mercadopago/preapproval/(?P<id>[^/]+)', self._get_subscription),
+            ('PUT', r'/mercadopago/preapproval/(?P<id>[^/]+)', self._update_subscription),
+            ('POST', r'/stripe/v1/payment_intents', self._stripe_create_payment),
+            ('GET', r'/stripe/v1/payment_intents/(?P<id>[^/]+)', self._get_payment),
+            ('POST', r'/stripe/v1/customers', self._create_customer),
+            ('POST', r'/stripe/v1/subscriptions', self._create_subscription),
+            ('GET', r'/stripe/v1/subscriptions/(?P<id>[^/]+)', self._get_subscription),
+            ('DELETE', r'/stripe/v1/subscriptions/(?P<id>[^/]+)', self._cancel_subscription),
+        ]
+
+    def _mp_create_payment(self, match, body):
+        payment_id = self._next_id()
+        payment = {
+            'id': payment_id,
+            'status': self.payment_status if body.get('payment_method_id') == 'pix' else 'approved',
+            'status_detail': 'pending_waiting_transfer',
+            'transaction_amount': body.get('transaction_amount'),
+            'payment_method_id': body.get('payment_method_id'),
+            'installments': body.get('installments', 1),
+            'external_reference': body.get('external_reference'),
+            'date_of_expiration': (datetime.utcnow() + timedelta(minutes=30)).isoformat() + 'Z',
+        }
+        if body.get('payment_method_id') == 'pix':
+            payment['point_of_interaction'] = {'transaction_data': {
+                'qr_code': f'00020126-fake-pix-{payment_id}',
+                'qr_code_base64': FAKE_QR_PNG_BASE64,
+                'ticket_url': f'{self.url}/pix/{payment_id}'
+            }}
+        self.payments[payment_id] = payment
+        return 201, payment
+
+    def _stripe_create_payment(self, match, body):
+        payment_id = self._next_id('pi_')
+        payment = {
+            'id': payment_id,
+            'status': 'succeeded',
+            'amount': int(body.get('amount', 0)),
+            'client_secret': f'{payment_id}_secret',
+            'metadata': {k[9:-1]: v for k, v in body.items() if k.startswith('metadata[')},
+        }
+        self.payments[payment_id] = payment
+        return 200, payment
+
+    def _get_payment(self, match, body):
+        payment = self.payments.get(match['id'])
+        return (200, payment) if payment else (404, {'message': 'not found'})
+
+    def _create_customer(self, match, body):
+        return 201, {'id': self._next_id('cus_'), 'email': body.get('email')}
+
+    def _create_card(self, match, body):
+        return 201, {'id': self._next_id('card_'), 'customer_id': match['id']}
+
+    def _create_subscription(self, match, body):
+        subscription_id = self._next_id('sub_')
+        subscription = {
+            'id': subscription_id,
+            'status': 'authorized' if 'payer_email' in body else 'active',
+            'init_point': f'{self.url}/checkout/{subscription_id}',
+            'external_reference': body.get('external_reference'),
+            'latest_invoice': {'payment_intent': {'client_secret': f'{subscription_id}_secret'}},
+        }
+        self.subscriptions[subscription_id] = subscription
+        return 201, subscription
+
+    def _get_subscription(self, match, body):
+        subscription = self.subscriptions.get(match['id'])
+        return (200, subscription) if subscription else (404, {'message': 'not found'})
+
+    def _update_subscription(self, match, body):
+        subscription = self.subscriptions.get(match['id'])
+        if not subscription:
+            return 404, {'message': 'not found'}
+        subscription.update(body)
+        return 200, subscription
+
+    def _cancel_subscription(self, match, body):
+        return self._update_subscription(match, {'status': 'canceled'})
+
+    def _handler_class(self):
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Mantém as conexões abertas, como os provedores reais
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _dispatch(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length).decode() if length else ''
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    body = json.loads(raw) if raw else {}
+                else:
+                    body = dict(parse_qsl(raw))
+
+                provider.requests.append((self.command, self.path))
+
+                if provider.latency:
+                    time.sleep(provider.latency)
+
+                if provider.failure_rate and random.random() < provider.failure_rate:
+                    status, payload = random.choice([(503, {'message': 'unavailable'}),
+                                                     (429, {'message': 'too many requests'})])
+                else:
+                    status, payload = 404, {'message': 'route not found'}
+                    for method, pattern, handler in provider._routes():
+                        match = re.fullmatch(pattern, self.path.split('?')[0])
+                        if method == self.command and match:
+                            status, payload = handler(match, body)
+                            break
+
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                if status == 429:
+                    self.send_header('Retry-After', '0')
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _dispatch
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Provedor de pagamentos falso para testes')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.0, help='Latência artificial em segundos')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fração de respostas 429/503')
+    args = parser.parse_args()
+
+    provider = FakePaymentProvider(args.host, args.port, args.latency, args.failure_rate)
+    print(f"Provedor falso em {provider.url} (Mercado Pago: /mercadopago, Stripe: /stripe/v1)")
+    try:
+        provider._server.serve_forever()
+    except KeyboardInterrupt:
+        provider.stop()
+
+
+if __name__ == '__main__':
+    main()
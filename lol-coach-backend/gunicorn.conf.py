@@ -0,0 +1,10 @@
+"""
+Configuração do Gunicorn
+Lida automaticamente por `gunicorn app:app` a partir do diretório do backend
+"""
+
+
+def post_worker_init(worker):
+    # Cada worker retoma os webhooks pendentes logo no boot, sem esperar a primeira requisição
+    from app import webhook_workers
+    webhook_workers.start()
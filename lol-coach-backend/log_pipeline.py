@@ -0,0 +1,155 @@
+"""
+Módulo de Pipeline de Logs
+Grava registros de auditoria/segurança em lote a partir de uma fila limitada
+"""
+
+import atexit
+import os
+import queue
+import threading
+
+
+OVERFLOW_POLICIES = ('drop_newest', 'drop_oldest', 'block')
+
+
+class BatchWriter:
+    """Fila limitada consumida por uma thread que grava registros em lote"""
+
+    def __init__(self, flush_fn, max_queue=10000, batch_size=200, flush_interval=2.0,
+                 overflow='drop_newest', block_timeout=0.05, asynchronous=True):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Política de overflow não suportada: {overflow}")
+
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.asynchronous = asynchronous
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        atexit.register(self.stop)
+
+    def submit(self, record):
+        """Enfileira um registro; retorna False se ele foi descartado"""
+        self.submitted += 1
+
+        if not self.asynchronous:
+            self._write([record])
+            return True
+
+        self._ensure_started()
+
+        try:
+            if self.overflow == 'block':
+                self._queue.put(record, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow != 'drop_oldest':
+                self.dropped += 1
+                return False
+
+            # Descarta o registro mais antigo para abrir espaço ao mais recente
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.dropped += 1
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+                return False
+
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+        return True
+
+    def flush(self):
+        """Grava imediatamente tudo o que estiver na fila"""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self):
+        """Para a thread de gravação e descarrega a fila"""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            self._wakeup.set()
+            self._thread.join(timeout=10)
+        self.flush()
+
+    def stats(self):
+        """Retorna contadores da pipeline"""
+        return {
+            'queued': self._queue.qsize(),
+            'submitted': self.submitted,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'overflow_policy': self.overflow
+        }
+
+    def _ensure_started(self):
+        # A thread é criada sob demanda para sobreviver ao fork dos workers do gunicorn
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop_event.clear()
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with self._flush_lock:
+            try:
+                self.flush_fn(batch)
+                self.written += len(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    self.failed += 1
+                    print(f"Erro ao gravar log: {e}")
+                    return
+                # Regrava registro a registro para perder só as linhas inválidas
+                print(f"Erro ao gravar lote de {len(batch)} logs, gravando um a um: {e}")
+                for record in batch:
+                    try:
+                        self.flush_fn([record])
+                        self.written += 1
+                    except Exception as row_error:
+                        self.failed += 1
+                        print(f"Erro ao gravar log: {row_error}")
@@ -0,0 +1,101 @@
+"""
+Módulo de Senhas
+Hash de senhas com KDF e custo configuráveis, detecção de hashes desatualizados
+e verificação em um pool limitado de threads/processos
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import bcrypt
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+SUPPORTED_METHODS = ('pbkdf2:sha256', 'pbkdf2:sha512', 'scrypt', 'bcrypt')
+DEFAULT_SCRYPT_COST = '32768:8:1'
+DEFAULT_BCRYPT_ROUNDS = 12
+
+
+class PasswordHasherBusy(Exception):
+    """O pool de hashing está saturado e a requisição não pôde ser atendida"""
+
+
+def _hash_password(method, password):
+    if method.startswith('bcrypt:'):
+        rounds = int(method.split(':')[1])
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+    return generate_password_hash(password, method=method, salt_length=16)
+
+
+def _verify_password(password_hash, password):
+    if password_hash.startswith('$2'):
+        return bcrypt.checkpw(password.encode(), password_hash.encode())
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """Gera e verifica hashes de senha conforme o método configurado"""
+
+    def __init__(self, method='pbkdf2:sha256', cost=None, executor='thread',
+                 workers=2, max_pending=16, wait_timeout=2.0):
+        if method not in SUPPORTED_METHODS:
+            raise ValueError(f"Método de hash não suportado: {method}")
+        if executor not in ('thread', 'process', 'inline'):
+            raise ValueError(f"Executor de hash não suportado: {executor}")
+
+        if method == 'bcrypt':
+            self.method = f'bcrypt:{int(cost or DEFAULT_BCRYPT_ROUNDS)}'
+        elif method == 'scrypt':
+            self.method = f'scrypt:{cost or DEFAULT_SCRYPT_COST}'
+        else:
+            self.method = f'{method}:{int(cost or DEFAULT_PBKDF2_ITERATIONS)}'
+
+        self.executor = executor
+        self.workers = workers
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+
+    def hash(self, password):
+        """Gera o hash da senha com o método e custo configurados"""
+        return self._run(_hash_password, self.method, password)
+
+    def verify(self, password_hash, password):
+        """Verifica a senha contra o hash armazenado (qualquer método suportado)"""
+        if not password_hash:
+            return False
+        return self._run(_verify_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Indica se o hash foi gerado com método ou custo diferentes do configurado"""
+        if password_hash.startswith('$2'):
+            # Formato bcrypt: $2b$<rounds>$<salt+hash>
+            rounds = password_hash.split('$')[2]
+            return self.method != f'bcrypt:{int(rounds)}'
+        return password_hash.split('$', 1)[0] != self.method
+
+    def _run(self, fn, *args):
+        if self.executor == 'inline':
+            return fn(*args)
+
+        # Limita quantas operações podem aguardar o pool para que rajadas de login
+        # não ocupem todos os workers da aplicação
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise PasswordHasherBusy()
+        try:
+            return self._get_pool().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def _get_pool(self):
+        # Pool criado por processo para funcionar após o fork dos workers do gunicorn
+        if self._pool is not None and self._pool_pid == os.getpid():
+            return self._pool
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                pool_class = ProcessPoolExecutor if self.executor == 'process' else ThreadPoolExecutor
+                self._pool = pool_class(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+        return self._pool
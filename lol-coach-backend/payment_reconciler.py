@@ -0,0 +1,152 @@
+"""
+Módulo de Reconciliação de Pagamentos
+Consulta em lote, nos provedores, o status de pagamentos e assinaturas pendentes,
+com limite de taxa por provedor e checkpoint para retomar execuções interrompidas
+"""
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Limitador de taxa assíncrono: `rate` requisições por segundo com rajada de `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Aguarda até haver uma ficha disponível"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ProviderStats:
+    """Contadores de consultas de um provedor durante a execução"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'error_rate': round(self.errors / self.requests, 4) if self.requests else 0.0
+        }
+
+
+class PaymentReconciler:
+    """Percorre os itens pendentes em lotes, consultando os provedores concorrentemente
+
+    `load_batch(after_id, limit)` retorna [(id, provedor, tipo, ref)] em ordem de id;
+    `apply_batch(results, last_id)` recebe [(id, provedor, tipo, status ou None)] e deve
+    gravar as alterações junto com o checkpoint `last_id` na mesma transação.
+    `load_items(ids)` retorna os itens de `ids` que ainda estão pendentes, para repetir as
+    consultas que falharam antes do checkpoint (`failed_ids` no resumo).
+    `managers` mapeia provedor -> AsyncPaymentManager.
+    """
+
+    def __init__(self, managers, load_batch, apply_batch, batch_size=200, rate=10.0, burst=None,
+                 report_fn=print, load_items=None):
+        self.managers = managers
+        self.load_batch = load_batch
+        self.apply_batch = apply_batch
+        self.load_items = load_items
+        self.batch_size = batch_size
+        self.report_fn = report_fn
+        self.buckets = {provider: TokenBucket(rate, burst) for provider in managers}
+        self.providers = {provider: ProviderStats() for provider in managers}
+        self.processed = 0
+        self.elapsed = 0.0
+        self.failed_ids = set()
+
+    async def _fetch(self, item):
+        row_id, provider, kind, ref = item
+        manager = self.managers.get(provider)
+        if manager is None:
+            return row_id, provider, kind, None
+
+        await self.buckets[provider].acquire()
+        stats = self.providers[provider]
+        stats.requests += 1
+        try:
+            if kind == 'subscription':
+                info = await manager.get_subscription_status(ref)
+            else:
+                info = await manager.get_payment_status(ref)
+        except Exception as e:
+            print(f"Erro ao consultar {provider} {ref}: {e}")
+            info = None
+        if info is None:
+            stats.errors += 1
+        return row_id, provider, kind, info
+
+    async def _process(self, batch, last_id, started):
+        results = await asyncio.gather(*(self._fetch(item) for item in batch))
+
+        # Falhas de consulta ficam no resumo gravado com o checkpoint, que avança além delas
+        for row_id, provider, _, info in results:
+            if info is None and provider in self.managers:
+                self.failed_ids.add(row_id)
+            else:
+                self.failed_ids.discard(row_id)
+
+        self.processed += len(batch)
+        self.elapsed = time.monotonic() - started
+        self.apply_batch(results, last_id)
+        self.report_fn(self.summary(last_id))
+
+    async def run(self, after_id=0, retry_ids=()):
+        """Executa a varredura a partir de `after_id`; retorna o resumo final
+
+        `retry_ids` são as consultas que falharam na execução interrompida: são
+        repetidas antes de continuar a partir do checkpoint.
+        """
+        started = time.monotonic()
+        last_id = after_id
+
+        retry_ids = sorted(retry_ids) if self.load_items else []
+        self.failed_ids.update(retry_ids)
+        for i in range(0, len(retry_ids), self.batch_size):
+            chunk = retry_ids[i:i + self.batch_size]
+            batch = self.load_items(chunk)
+            # Itens que já chegaram a um status definitivo não precisam de nova consulta
+            self.failed_ids.difference_update(set(chunk) - {item[0] for item in batch})
+            if batch:
+                await self._process(batch, last_id, started)
+
+        while True:
+            batch = self.load_batch(last_id, self.batch_size)
+            if not batch:
+                break
+
+            last_id = batch[-1][0]
+            await self._process(batch, last_id, started)
+
+            if len(batch) < self.batch_size:
+                break
+
+        self.elapsed = time.monotonic() - started
+        return self.summary(last_id)
+
+    def summary(self, last_id=None):
+        """Throughput e taxa de erro por provedor até o momento"""
+        return {
+            'last_id': last_id,
+            'processed': self.processed,
+            'failed_ids': sorted(self.failed_ids),
+            'elapsed_seconds': round(self.elapsed, 2),
+            'payments_per_second': round(self.processed / self.elapsed, 2) if self.elapsed else 0.0,
+            'providers': {provider: stats.to_dict() for provider, stats in self.providers.items()}
+        }
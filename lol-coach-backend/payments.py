@@ -3,18 +3,187 @@ Módulo de Pagamentos
 Suporta Pix, Cartão de Crédito e Débito via Mercado Pago e Stripe
 """
 
+import json
 import os
 import requests
 import hmac
 import hashlib
-from datetime import datetime, timedelta
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
 from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Configuração HTTP dos provedores
+HTTP_POOL_SIZE = int(os.getenv('PAYMENT_HTTP_POOL_SIZE', 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('PAYMENT_HTTP_CONNECT_TIMEOUT', 3.05))
+HTTP_READ_TIMEOUT = float(os.getenv('PAYMENT_HTTP_READ_TIMEOUT', 15))
+HTTP_RETRIES = int(os.getenv('PAYMENT_HTTP_RETRIES', 3))
+HTTP_BACKOFF = float(os.getenv('PAYMENT_HTTP_BACKOFF', 0.5))
+HTTP_MAX_RETRY_DELAY = float(os.getenv('PAYMENT_HTTP_MAX_RETRY_DELAY', 60))
+HTTP_RETRY_DEADLINE = float(os.getenv('PAYMENT_HTTP_RETRY_DEADLINE', 30))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Diferença máxima entre o timestamp assinado pelo provedor e o relógio local
+STRIPE_WEBHOOK_TOLERANCE = int(os.getenv('STRIPE_WEBHOOK_TOLERANCE', 300))
+MERCADOPAGO_WEBHOOK_TOLERANCE = int(os.getenv('MERCADOPAGO_WEBHOOK_TOLERANCE', 300))
+
+
+class LatencyHistogram:
+    """Histograma de latência com buckets fixos, em segundos"""
+    
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.buckets = [0] * len(self.BUCKETS)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+    
+    def observe(self, seconds, error=False):
+        """Registra a duração de uma chamada"""
+        with self._lock:
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    self.buckets[i] += 1
+                    break
+            self.count += 1
+            self.total += seconds
+            if error:
+                self.errors += 1
+    
+    def snapshot(self):
+        """Retorna contagens por bucket (não acumuladas) e médias"""
+        with self._lock:
+            return {
+                'buckets': {('+Inf' if bound == float('inf') else str(bound)): n
+                            for bound, n in zip(self.BUCKETS, self.buckets)},
+                'count': self.count,
+                'errors': self.errors,
+                'avg_seconds': round(self.total / self.count, 4) if self.count else 0.0
+            }
+
+
+# Histogramas por provedor, compartilhados por todos os processadores do worker
+PROVIDER_LATENCY = {}
+
+
+def get_latency_stats():
+    """Retorna os histogramas de latência de todos os provedores"""
+    return {provider: histogram.snapshot() for provider, histogram in PROVIDER_LATENCY.items()}
+
+
+def parse_provider_datetime(value):
+    """Converte datas ISO 8601 dos provedores (com fuso) para datetime UTC sem fuso"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class BoundedRetry(Retry):
+    """Retry do urllib3 com espera limitada e prazo total para as novas tentativas
+
+    O urllib3 dorme dentro de `session.request`, bloqueando o worker que fez a chamada:
+    cada espera (Retry-After ou backoff) fica limitada a `max_delay` e ao tempo restante
+    até `deadline`, contado a partir da primeira falha. Esgotado o prazo, não há nova tentativa.
+    """
+    
+    def __init__(self, *args, max_delay=HTTP_MAX_RETRY_DELAY, deadline=HTTP_RETRY_DEADLINE,
+                 started=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.started = started
+    
+    def new(self, **kwargs):
+        kwargs.setdefault('max_delay', self.max_delay)
+        kwargs.setdefault('deadline', self.deadline)
+        # `new` é chamado a cada falha: a primeira fixa o início do prazo
+        kwargs.setdefault('started', time.monotonic() if self.started is None else self.started)
+        return super().new(**kwargs)
+    
+    def _remaining(self):
+        if self.started is None:
+            return self.deadline
+        return max(self.deadline - (time.monotonic() - self.started), 0.0)
+    
+    def is_exhausted(self):
+        return self._remaining() <= 0 or super().is_exhausted()
+    
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.max_delay, self._remaining())
+    
+    def get_backoff_time(self):
+        return min(super().get_backoff_time(), self.max_delay, self._remaining())
+
+
+def build_session(pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF):
+    """Cria uma sessão HTTP com keep-alive, pool de conexões e retry com backoff"""
+    retry = BoundedRetry(
+        total=retries,
+        backoff_factor=backoff,
+        backoff_jitter=backoff,
+        status_forcelist=RETRY_STATUSES,
+        # POSTs são enviados com chave de idempotência e podem ser repetidos com segurança
+        allowed_methods=frozenset({'GET', 'PUT', 'DELETE', 'POST'}),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
 
 class PaymentProcessor:
     """Classe base para processadores de pagamento"""
     
-    def __init__(self):
+    # Nome exibido nos logs, parâmetro do corpo e cabeçalho de idempotência do provedor
+    display_name = None
+    body_param = 'json'
+    idempotency_header = None
+    
+    def __init__(self, pool_size=HTTP_POOL_SIZE, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+                 retries=HTTP_RETRIES):
         self.provider = None
+        self.timeout = timeout
+        self.session = build_session(pool_size, retries)
+    
+    def _headers(self):
+        raise NotImplementedError
+    
+    def _make_request(self, method, endpoint, data=None):
+        """Faz requisição à API do provedor usando a sessão com pool de conexões"""
+        headers = self._headers()
+        if method == 'POST' and self.idempotency_header:
+            headers[self.idempotency_header] = str(uuid.uuid4())
+        
+        url = f'{self.base_url}{endpoint}'
+        kwargs = {self.body_param: data} if method in ('POST', 'PUT') else {}
+        histogram = PROVIDER_LATENCY.setdefault(self.provider, LatencyHistogram())
+        
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
+            response.raise_for_status()
+            # Corpo inválido levanta JSONDecodeError (RequestException) antes de contar como sucesso
+            result = response.json()
+            histogram.observe(time.monotonic() - started)
+            return result
+        except requests.exceptions.RequestException as e:
+            histogram.observe(time.monotonic() - started, error=True)
+            print(f"Erro na requisição ao {self.display_name}: {e}")
+            return None
     
     def create_payment(self, amount, description, payment_method, customer_data):
         raise NotImplementedError
@@ -32,40 +201,39 @@ class PaymentProcessor:
 class MercadoPagoProcessor(PaymentProcessor):
     """Processador de pagamentos via Mercado Pago"""
     
-    def __init__(self, access_token):
-        super().__init__()
+    display_name = 'Mercado Pago'
+    body_param = 'json'
+    idempotency_header = 'X-Idempotency-Key'
+    
+    def __init__(self, access_token, base_url='https://api.mercadopago.com', **http_options):
+        super().__init__(**http_options)
         self.provider = 'mercadopago'
         self.access_token = access_token
-        self.base_url = 'https://api.mercadopago.com'
+        self.base_url = base_url
     
-    def _make_request(self, method, endpoint, data=None):
-        """Faz requisição à API do Mercado Pago"""
-        headers = {
+    def _headers(self):
+        return {
             'Authorization': f'Bearer {self.access_token}',
             'Content-Type': 'application/json'
         }
-        
-        url = f'{self.base_url}{endpoint}'
-        
-        try:
-            if method == 'GET':
-                response = requests.get(url, headers=headers)
-            elif method == 'POST':
-                response = requests.post(url, json=data, headers=headers)
-            elif method == 'PUT':
-                response = requests.put(url, json=data, headers=headers)
-            elif method == 'DELETE':
-                response = requests.delete(url, headers=headers)
-            
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Erro na requisição ao Mercado Pago: {e}")
-            return None
     
-    def create_pix_payment(self, amount, description, customer_data):
-        """Cria um pagamento via Pix"""
-        data = {
+    @staticmethod
+    def _payer_identification(customer_data):
+        return {
+            'type': customer_data.get('doc_type', 'CPF'),
+            'number': customer_data.get('doc_number', '')
+        }
+    
+    @staticmethod
+    def _with_reference(data, customer_data):
+        # external_reference liga o pagamento ao usuário local nos webhooks
+        if customer_data.get('external_reference'):
+            data['external_reference'] = customer_data['external_reference']
+        return data
+    
+    @classmethod
+    def _pix_payment_data(cls, amount, description, customer_data):
+        return cls._with_reference({
             'transaction_amount': float(amount),
             'description': description,
             'payment_method_id': 'pix',
@@ -73,29 +241,25 @@ class MercadoPagoProcessor(PaymentProcessor):
                 'email': customer_data.get('email'),
                 'first_name': customer_data.get('first_name', ''),
                 'last_name': customer_data.get('last_name', ''),
-                'identification': {
-                    'type': customer_data.get('doc_type', 'CPF'),
-                    'number': customer_data.get('doc_number', '')
-                }
+                'identification': cls._payer_identification(customer_data)
             }
+        }, customer_data)
+    
+    @staticmethod
+    def _parse_pix_payment(result):
+        transaction_data = result.get('point_of_interaction', {}).get('transaction_data', {})
+        return {
+            'payment_id': result.get('id'),
+            'status': result.get('status'),
+            'qr_code': transaction_data.get('qr_code'),
+            'qr_code_base64': transaction_data.get('qr_code_base64'),
+            'ticket_url': transaction_data.get('ticket_url'),
+            'expires_at': parse_provider_datetime(result.get('date_of_expiration'))
         }
-        
-        result = self._make_request('POST', '/v1/payments', data)
-        
-        if result:
-            return {
-                'payment_id': result.get('id'),
-                'status': result.get('status'),
-                'qr_code': result.get('point_of_interaction', {}).get('transaction_data', {}).get('qr_code'),
-                'qr_code_base64': result.get('point_of_interaction', {}).get('transaction_data', {}).get('qr_code_base64'),
-                'ticket_url': result.get('point_of_interaction', {}).get('transaction_data', {}).get('ticket_url')
-            }
-        
-        return None
     
-    def create_card_payment(self, amount, description, card_token, installments, customer_data):
-        """Cria um pagamento via cartão de crédito/débito"""
-        data = {
+    @classmethod
+    def _card_payment_data(cls, amount, description, card_token, installments, customer_data):
+        return cls._with_reference({
             'transaction_amount': float(amount),
             'token': card_token,
             'description': description,
@@ -103,52 +267,32 @@ class MercadoPagoProcessor(PaymentProcessor):
             'payment_method_id': 'visa',  # Será determinado pelo token
             'payer': {
                 'email': customer_data.get('email'),
-                'identification': {
-                    'type': customer_data.get('doc_type', 'CPF'),
-                    'number': customer_data.get('doc_number', '')
-                }
+                'identification': cls._payer_identification(customer_data)
             }
+        }, customer_data)
+    
+    @staticmethod
+    def _parse_card_payment(result):
+        return {
+            'payment_id': result.get('id'),
+            'status': result.get('status'),
+            'status_detail': result.get('status_detail'),
+            'payment_method': result.get('payment_method_id'),
+            'installments': result.get('installments')
         }
-        
-        result = self._make_request('POST', '/v1/payments', data)
-        
-        if result:
-            return {
-                'payment_id': result.get('id'),
-                'status': result.get('status'),
-                'status_detail': result.get('status_detail'),
-                'payment_method': result.get('payment_method_id'),
-                'installments': result.get('installments')
-            }
-        
-        return None
     
-    def create_subscription(self, plan_id, customer_data, card_token=None):
-        """Cria uma assinatura recorrente"""
-        # Primeiro, criar um cliente
-        customer_result = self._make_request('POST', '/v1/customers', {
+    @classmethod
+    def _customer_data(cls, customer_data):
+        return {
             'email': customer_data.get('email'),
             'first_name': customer_data.get('first_name', ''),
             'last_name': customer_data.get('last_name', ''),
-            'identification': {
-                'type': customer_data.get('doc_type', 'CPF'),
-                'number': customer_data.get('doc_number', '')
-            }
-        })
-        
-        if not customer_result:
-            return None
-        
-        customer_id = customer_result.get('id')
-        
-        # Se houver token de cartão, adicionar como método de pagamento
-        if card_token:
-            self._make_request('POST', f'/v1/customers/{customer_id}/cards', {
-                'token': card_token
-            })
-        
-        # Criar assinatura
-        subscription_data = {
+            'identification': cls._payer_identification(customer_data)
+        }
+    
+    @classmethod
+    def _subscription_data(cls, plan_id, customer_data, card_token):
+        return cls._with_reference({
             'preapproval_plan_id': plan_id,
             'payer_email': customer_data.get('email'),
             'card_token_id': card_token,
@@ -160,18 +304,67 @@ class MercadoPagoProcessor(PaymentProcessor):
             },
             'back_url': customer_data.get('back_url', ''),
             'status': 'authorized'
+        }, customer_data)
+    
+    @staticmethod
+    def _parse_subscription(result):
+        return {
+            'subscription_id': result.get('id'),
+            'status': result.get('status'),
+            'init_point': result.get('init_point')
+        }
+    
+    @staticmethod
+    def _parse_payment_status(result):
+        return {
+            'payment_id': result.get('id'),
+            'status': result.get('status'),
+            'status_detail': result.get('status_detail'),
+            'transaction_amount': result.get('transaction_amount'),
+            'external_reference': result.get('external_reference')
+        }
+    
+    @staticmethod
+    def _parse_subscription_status(result):
+        return {
+            'subscription_id': result.get('id'),
+            'status': result.get('status'),
+            'external_reference': result.get('external_reference'),
+            'period_end': parse_provider_datetime(result.get('next_payment_date'))
         }
+    
+    def create_pix_payment(self, amount, description, customer_data):
+        """Cria um pagamento via Pix"""
+        data = self._pix_payment_data(amount, description, customer_data)
+        result = self._make_request('POST', '/v1/payments', data)
+        return self._parse_pix_payment(result) if result else None
+    
+    def create_card_payment(self, amount, description, card_token, installments, customer_data):
+        """Cria um pagamento via cartão de crédito/débito"""
+        data = self._card_payment_data(amount, description, card_token, installments, customer_data)
+        result = self._make_request('POST', '/v1/payments', data)
+        return self._parse_card_payment(result) if result else None
+    
+    def create_subscription(self, plan_id, customer_data, card_token=None):
+        """Cria uma assinatura recorrente"""
+        # Primeiro, criar um cliente
+        customer_result = self._make_request('POST', '/v1/customers', self._customer_data(customer_data))
         
-        result = self._make_request('POST', '/preapproval', subscription_data)
+        if not customer_result:
+            return None
         
-        if result:
-            return {
-                'subscription_id': result.get('id'),
-                'status': result.get('status'),
-                'init_point': result.get('init_point')
-            }
+        customer_id = customer_result.get('id')
         
-        return None
+        # Se houver token de cartão, adicionar como método de pagamento
+        if card_token:
+            self._make_request('POST', f'/v1/customers/{customer_id}/cards', {
+                'token': card_token
+            })
+        
+        # Criar assinatura
+        subscription_data = self._subscription_data(plan_id, customer_data, card_token)
+        result = self._make_request('POST', '/preapproval', subscription_data)
+        return self._parse_subscription(result) if result else None
     
     def cancel_subscription(self, subscription_id):
         """Cancela uma assinatura"""
@@ -184,58 +377,76 @@ class MercadoPagoProcessor(PaymentProcessor):
     def get_payment_status(self, payment_id):
         """Consulta o status de um pagamento"""
         result = self._make_request('GET', f'/v1/payments/{payment_id}')
-        
-        if result:
-            return {
-                'payment_id': result.get('id'),
-                'status': result.get('status'),
-                'status_detail': result.get('status_detail'),
-                'transaction_amount': result.get('transaction_amount')
-            }
-        
+        return self._parse_payment_status(result) if result else None
+    
+    def get_subscription_status(self, subscription_id):
+        """Consulta o status de uma assinatura (preapproval)"""
+        result = self._make_request('GET', f'/preapproval/{subscription_id}')
+        return self._parse_subscription_status(result) if result else None
+    
+    def resolve_webhook_event(self, event):
+        """Consulta o objeto notificado; o webhook do Mercado Pago traz apenas o id"""
+        object_id = event.get('data', {}).get('id')
+        if event.get('type') == 'payment':
+            return 'payment', self.get_payment_status(object_id)
+        if event.get('type') in ('subscription_preapproval', 'preapproval'):
+            return 'subscription', self.get_subscription_status(object_id)
         return None
     
-    def verify_webhook(self, payload, signature):
+    def verify_webhook(self, payload, signature, secret=None, request_id=None, data_id=None,
+                       tolerance=MERCADOPAGO_WEBHOOK_TOLERANCE):
         """Verifica a autenticidade de um webhook do Mercado Pago"""
-        # Mercado Pago usa x-signature header
-        # Implementar verificação conforme documentação oficial
-        return True  # Placeholder
+        # Cabeçalho x-signature: "ts=<timestamp>,v1=<hmac>", assinado sobre o manifesto
+        # "id:<data.id>;request-id:<x-request-id>;ts:<ts>;" com a chave secreta do webhook;
+        # segmentos sem valor na notificação ficam de fora do manifesto
+        if not secret or not signature:
+            return False
+        
+        try:
+            parts = dict(item.strip().split('=', 1) for item in signature.split(','))
+            if data_id is None:
+                data_id = json.loads(payload).get('data', {}).get('id')
+            
+            # Rejeita reenvios de notificações capturadas (ts pode vir em milissegundos)
+            ts = int(parts['ts'])
+            if abs(time.time() - (ts / 1000 if ts > 10 ** 11 else ts)) > tolerance:
+                return False
+            
+            manifest = ''
+            if data_id is not None:
+                manifest += f"id:{str(data_id).lower()};"
+            if request_id:
+                manifest += f"request-id:{request_id};"
+            manifest += f"ts:{parts['ts']};"
+            expected_signature = hmac.new(secret.encode(), manifest.encode(), hashlib.sha256).hexdigest()
+            
+            return hmac.compare_digest(expected_signature, parts.get('v1', ''))
+        except Exception as e:
+            print(f"Erro ao verificar webhook: {e}")
+            return False
 
 
 class StripeProcessor(PaymentProcessor):
     """Processador de pagamentos via Stripe"""
     
-    def __init__(self, secret_key):
-        super().__init__()
+    display_name = 'Stripe'
+    body_param = 'data'
+    idempotency_header = 'Idempotency-Key'
+    
+    def __init__(self, secret_key, base_url='https://api.stripe.com/v1', **http_options):
+        super().__init__(**http_options)
         self.provider = 'stripe'
         self.secret_key = secret_key
-        self.base_url = 'https://api.stripe.com/v1'
+        self.base_url = base_url
     
-    def _make_request(self, method, endpoint, data=None):
-        """Faz requisição à API do Stripe"""
-        headers = {
+    def _headers(self):
+        return {
             'Authorization': f'Bearer {self.secret_key}',
             'Content-Type': 'application/x-www-form-urlencoded'
         }
-        
-        url = f'{self.base_url}{endpoint}'
-        
-        try:
-            if method == 'GET':
-                response = requests.get(url, headers=headers)
-            elif method == 'POST':
-                response = requests.post(url, data=data, headers=headers)
-            elif method == 'DELETE':
-                response = requests.delete(url, headers=headers)
-            
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Erro na requisição ao Stripe: {e}")
-            return None
     
-    def create_card_payment(self, amount, description, payment_method_id, customer_email):
-        """Cria um pagamento via cartão de crédito"""
+    @staticmethod
+    def _card_payment_data(amount, description, payment_method_id, customer_email, external_reference=None):
         # Converter para centavos
         amount_cents = int(float(amount) * 100)
         
@@ -248,20 +459,21 @@ class StripeProcessor(PaymentProcessor):
             'receipt_email': customer_email
         }
         
-        result = self._make_request('POST', '/payment_intents', data)
+        if external_reference:
+            data['metadata[external_reference]'] = external_reference
         
-        if result:
-            return {
-                'payment_id': result.get('id'),
-                'status': result.get('status'),
-                'client_secret': result.get('client_secret')
-            }
-        
-        return None
+        return data
     
-    def create_subscription(self, price_id, customer_email, payment_method_id=None):
-        """Cria uma assinatura recorrente"""
-        # Primeiro, criar ou buscar cliente
+    @staticmethod
+    def _parse_card_payment(result):
+        return {
+            'payment_id': result.get('id'),
+            'status': result.get('status'),
+            'client_secret': result.get('client_secret')
+        }
+    
+    @staticmethod
+    def _customer_data(customer_email, payment_method_id):
         customer_data = {
             'email': customer_email
         }
@@ -270,39 +482,107 @@ class StripeProcessor(PaymentProcessor):
             customer_data['payment_method'] = payment_method_id
             customer_data['invoice_settings[default_payment_method]'] = payment_method_id
         
-        customer_result = self._make_request('POST', '/customers', customer_data)
-        
-        if not customer_result:
-            return None
-        
-        customer_id = customer_result.get('id')
-        
-        # Criar assinatura
-        subscription_data = {
+        return customer_data
+    
+    @staticmethod
+    def _subscription_data(customer_id, price_id, external_reference=None):
+        data = {
             'customer': customer_id,
             'items[0][price]': price_id,
             'expand[]': 'latest_invoice.payment_intent'
         }
         
-        result = self._make_request('POST', '/subscriptions', subscription_data)
+        if external_reference:
+            data['metadata[external_reference]'] = external_reference
         
-        if result:
-            return {
-                'subscription_id': result.get('id'),
-                'status': result.get('status'),
-                'client_secret': result.get('latest_invoice', {}).get('payment_intent', {}).get('client_secret')
-            }
+        return data
+    
+    @staticmethod
+    def _parse_subscription(result):
+        return {
+            'subscription_id': result.get('id'),
+            'status': result.get('status'),
+            'client_secret': result.get('latest_invoice', {}).get('payment_intent', {}).get('client_secret')
+        }
+    
+    @staticmethod
+    def _parse_payment_status(result):
+        return {
+            'payment_id': result.get('id'),
+            'status': result.get('status'),
+            'status_detail': result.get('last_payment_error', {}).get('code') if result.get('last_payment_error') else None,
+            'transaction_amount': result.get('amount', 0) / 100,
+            'external_reference': (result.get('metadata') or {}).get('external_reference')
+        }
+    
+    @staticmethod
+    def _parse_subscription_status(result):
+        period_end = result.get('current_period_end')
+        return {
+            'subscription_id': result.get('id'),
+            'status': result.get('status'),
+            'external_reference': (result.get('metadata') or {}).get('external_reference'),
+            'period_end': datetime.utcfromtimestamp(period_end) if period_end else None
+        }
+    
+    def create_card_payment(self, amount, description, payment_method_id, customer_email, external_reference=None):
+        """Cria um pagamento via cartão de crédito"""
+        data = self._card_payment_data(amount, description, payment_method_id, customer_email, external_reference)
+        result = self._make_request('POST', '/payment_intents', data)
+        return self._parse_card_payment(result) if result else None
+    
+    def create_subscription(self, price_id, customer_email, payment_method_id=None, external_reference=None):
+        """Cria uma assinatura recorrente"""
+        # Primeiro, criar ou buscar cliente
+        customer_result = self._make_request('POST', '/customers', self._customer_data(customer_email, payment_method_id))
         
-        return None
+        if not customer_result:
+            return None
+        
+        # Criar assinatura
+        subscription_data = self._subscription_data(customer_result.get('id'), price_id, external_reference)
+        result = self._make_request('POST', '/subscriptions', subscription_data)
+        return self._parse_subscription(result) if result else None
     
     def cancel_subscription(self, subscription_id):
         """Cancela uma assinatura"""
         result = self._make_request('DELETE', f'/subscriptions/{subscription_id}')
         return result is not None
     
-    def verify_webhook(self, payload, signature, webhook_secret):
+    def get_payment_status(self, payment_id):
+        """Consulta o status de um pagamento (PaymentIntent)"""
+        result = self._make_request('GET', f'/payment_intents/{payment_id}')
+        return self._parse_payment_status(result) if result else None
+    
+    def get_subscription_status(self, subscription_id):
+        """Consulta o status de uma assinatura"""
+        result = self._make_request('GET', f'/subscriptions/{subscription_id}')
+        return self._parse_subscription_status(result) if result else None
+    
+    def resolve_webhook_event(self, event):
+        """Extrai o objeto notificado; o evento do Stripe já traz o estado atual"""
+        event_type = event.get('type', '')
+        obj = event.get('data', {}).get('object', {})
+        if event_type.startswith('payment_intent.'):
+            return 'payment', self._parse_payment_status(obj)
+        if event_type.startswith('customer.subscription.'):
+            return 'subscription', self._parse_subscription_status(obj)
+        return None
+    
+    def verify_webhook(self, payload, signature, webhook_secret, tolerance=STRIPE_WEBHOOK_TOLERANCE):
         """Verifica a autenticidade de um webhook do Stripe"""
         try:
+            # Cabeçalho Stripe-Signature: "t=<timestamp>,v1=<hmac>[,v1=<hmac>...]", assinado
+            # sobre "<t>.<payload>"; durante a rotação do segredo chegam vários v1
+            candidates = [signature]
+            if signature and signature.startswith('t='):
+                items = [item.strip().split('=', 1) for item in signature.split(',')]
+                timestamp = next(value for key, value in items if key == 't')
+                if abs(time.time() - int(timestamp)) > tolerance:
+                    return False
+                payload = f"{timestamp}.{payload}"
+                candidates = [value for key, value in items if key == 'v1']
+            
             # Stripe usa HMAC SHA256
             expected_signature = hmac.new(
                 webhook_secret.encode(),
@@ -310,7 +590,7 @@ class StripeProcessor(PaymentProcessor):
                 hashlib.sha256
             ).hexdigest()
             
-            return hmac.compare_digest(expected_signature, signature)
+            return any(hmac.compare_digest(expected_signature, candidate) for candidate in candidates)
         except Exception as e:
             print(f"Erro ao verificar webhook: {e}")
             return False
@@ -320,10 +600,11 @@ class PaymentManager:
     """Gerenciador de pagamentos que abstrai os diferentes processadores"""
     
     def __init__(self, provider='mercadopago', **credentials):
+        http_options = credentials.get('http_options', {})
         if provider == 'mercadopago':
-            self.processor = MercadoPagoProcessor(credentials.get('access_token'))
+            self.processor = MercadoPagoProcessor(credentials.get('access_token'), **http_options)
         elif provider == 'stripe':
-            self.processor = StripeProcessor(credentials.get('secret_key'))
+            self.processor = StripeProcessor(credentials.get('secret_key'), **http_options)
         else:
             raise ValueError(f"Provedor de pagamento não suportado: {provider}")
     
@@ -347,7 +628,8 @@ class PaymentManager:
             return self.processor.create_card_payment(
                 amount, description,
                 payment_data.get('payment_method_id'),
-                customer_data.get('email')
+                customer_data.get('email'),
+                customer_data.get('external_reference')
             )
     
     def create_subscription(self, plan_data, customer_data, payment_data=None):
@@ -362,22 +644,35 @@ class PaymentManager:
             return self.processor.create_subscription(
                 plan_data.get('price_id'),
                 customer_data.get('email'),
-                payment_data.get('payment_method_id') if payment_data else None
+                payment_data.get('payment_method_id') if payment_data else None,
+                customer_data.get('external_reference')
             )
     
     def cancel_subscription(self, subscription_id):
         """Cancela assinatura"""
         return self.processor.cancel_subscription(subscription_id)
     
-    def verify_webhook(self, payload, signature, secret=None):
+    def get_payment_status(self, payment_id):
+        """Consulta status de pagamento"""
+        return self.processor.get_payment_status(payment_id)
+    
+    def get_subscription_status(self, subscription_id):
+        """Consulta status de assinatura"""
+        return self.processor.get_subscription_status(subscription_id)
+    
+    def resolve_webhook_event(self, event):
+        """Converte um evento de webhook em (tipo, status do objeto); None se não for relevante"""
+        return self.processor.resolve_webhook_event(event)
+    
+    def verify_webhook(self, payload, signature, secret=None, request_id=None):
         """Verifica webhook"""
         if isinstance(self.processor, StripeProcessor):
             return self.processor.verify_webhook(payload, signature, secret)
         else:
-            return self.processor.verify_webhook(payload, signature)
+            return self.processor.verify_webhook(payload, signature, secret, request_id)
 
 
-# Planos de Assinatura
+# Planos de Assinatura (valores iniciais do catálogo; edições são feitas em /api/admin/plans)
 SUBSCRIPTION_PLANS = {
     'monthly': {
         'name': 'Plano Mensal',
@@ -0,0 +1,322 @@
+"""
+Módulo de Pagamentos Assíncrono
+Variante asyncio dos processadores de pagamento, com concorrência limitada por provedor
+"""
+
+import asyncio
+import random
+import time
+import uuid
+
+import httpx
+
+from payments import (
+    HTTP_BACKOFF,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_MAX_RETRY_DELAY,
+    HTTP_POOL_SIZE,
+    HTTP_READ_TIMEOUT,
+    HTTP_RETRIES,
+    PROVIDER_LATENCY,
+    RETRY_STATUSES,
+    LatencyHistogram,
+    MercadoPagoProcessor,
+    StripeProcessor,
+)
+
+
+class AsyncPaymentProcessor:
+    """Classe base para processadores de pagamento assíncronos"""
+
+    display_name = None
+    body_param = 'json'
+    idempotency_header = None
+
+    def __init__(self, base_url, max_concurrency=HTTP_POOL_SIZE,
+                 timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), retries=HTTP_RETRIES,
+                 backoff=HTTP_BACKOFF, max_retry_delay=HTTP_MAX_RETRY_DELAY):
+        self.provider = None
+        self.base_url = base_url
+        self.retries = retries
+        self.backoff = backoff
+        self.max_retry_delay = max_retry_delay
+        self.max_concurrency = max_concurrency
+        self._timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+
+    def _headers(self):
+        raise NotImplementedError
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self._timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                )
+            )
+        return self._client
+
+    async def aclose(self):
+        """Fecha o pool de conexões"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _retry_delay(self, attempt, response=None):
+        # Limitado: a espera acontece segurando uma vaga do semáforo
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(max(float(retry_after), 0.0), self.max_retry_delay)
+            except ValueError:
+                pass
+        return min(self.backoff * (2 ** attempt) + random.uniform(0, self.backoff), self.max_retry_delay)
+
+    async def _make_request(self, method, endpoint, data=None):
+        """Faz requisição à API do provedor, com retry e limite de concorrência"""
+        headers = self._headers()
+        if method == 'POST' and self.idempotency_header:
+            headers[self.idempotency_header] = str(uuid.uuid4())
+
+        kwargs = {self.body_param: data} if method in ('POST', 'PUT') else {}
+        histogram = PROVIDER_LATENCY.setdefault(self.provider, LatencyHistogram())
+        client = self._get_client()
+
+        async with self._semaphore:
+            started = time.monotonic()
+            for attempt in range(self.retries + 1):
+                response = None
+                try:
+                    response = await client.request(method, endpoint, headers=headers, **kwargs)
+                    if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                        await asyncio.sleep(self._retry_delay(attempt, response))
+                        continue
+                    response.raise_for_status()
+                    histogram.observe(time.monotonic() - started)
+                    return response.json()
+                except httpx.TransportError as e:
+                    if attempt < self.retries:
+                        await asyncio.sleep(self._retry_delay(attempt))
+                        continue
+                    error = e
+                except (httpx.HTTPError, ValueError) as e:
+                    # ValueError: resposta 2xx com corpo que não é JSON
+                    error = e
+
+                histogram.observe(time.monotonic() - started, error=True)
+                print(f"Erro na requisição ao {self.display_name}: {error}")
+                return None
+
+
+class AsyncMercadoPagoProcessor(AsyncPaymentProcessor):
+    """Processador assíncrono de pagamentos via Mercado Pago"""
+
+    display_name = MercadoPagoProcessor.display_name
+    body_param = MercadoPagoProcessor.body_param
+    idempotency_header = MercadoPagoProcessor.idempotency_header
+
+    def __init__(self, access_token, base_url='https://api.mercadopago.com', **http_options):
+        super().__init__(base_url, **http_options)
+        self.provider = 'mercadopago'
+        self.access_token = access_token
+
+    def _headers(self):
+        return {
+            'Authorization': f'Bearer {self.access_token}',
+            'Content-Type': 'application/json'
+        }
+
+    async def create_pix_payment(self, amount, description, customer_data):
+        """Cria um pagamento via Pix"""
+        data = MercadoPagoProcessor._pix_payment_data(amount, description, customer_data)
+        result = await self._make_request('POST', '/v1/payments', data)
+        return MercadoPagoProcessor._parse_pix_payment(result) if result else None
+
+    async def create_card_payment(self, amount, description, card_token, installments, customer_data):
+        """Cria um pagamento via cartão de crédito/débito"""
+        data = MercadoPagoProcessor._card_payment_data(amount, description, card_token, installments, customer_data)
+        result = await self._make_request('POST', '/v1/payments', data)
+        return MercadoPagoProcessor._parse_card_payment(result) if result else None
+
+    async def create_subscription(self, plan_id, customer_data, card_token=None):
+        """Cria uma assinatura recorrente"""
+        customer_result = await self._make_request(
+            'POST', '/v1/customers', MercadoPagoProcessor._customer_data(customer_data)
+        )
+
+        if not customer_result:
+            return None
+
+        customer_id = customer_result.get('id')
+        subscription_data = MercadoPagoProcessor._subscription_data(plan_id, customer_data, card_token)
+
+        # O cartão do cliente e a assinatura não dependem um do outro: envia em paralelo
+        calls = [self._make_request('POST', '/preapproval', subscription_data)]
+        if card_token:
+            calls.append(self._make_request('POST', f'/v1/customers/{customer_id}/cards', {
+                'token': card_token
+            }))
+
+        result = (await asyncio.gather(*calls))[0]
+        return MercadoPagoProcessor._parse_subscription(result) if result else None
+
+    async def cancel_subscription(self, subscription_id):
+        """Cancela uma assinatura"""
+        result = await self._make_request('PUT', f'/preapproval/{subscription_id}', {
+            'status': 'cancelled'
+        })
+        return result is not None
+
+    async def get_payment_status(self, payment_id):
+        """Consulta o status de um pagamento"""
+        result = await self._make_request('GET', f'/v1/payments/{payment_id}')
+        return MercadoPagoProcessor._parse_payment_status(result) if result else None
+
+    async def get_subscription_status(self, subscription_id):
+        """Consulta o status de uma assinatura (preapproval)"""
+        result = await self._make_request('GET', f'/preapproval/{subscription_id}')
+        return MercadoPagoProcessor._parse_subscription_status(result) if result else None
+
+
+class AsyncStripeProcessor(AsyncPaymentProcessor):
+    """Processador assíncrono de pagamentos via Stripe"""
+
+    display_name = StripeProcessor.display_name
+    body_param = StripeProcessor.body_param
+    idempotency_header = StripeProcessor.idempotency_header
+
+    def __init__(self, secret_key, base_url='https://api.stripe.com/v1', **http_options):
+        super().__init__(base_url, **http_options)
+        self.provider = 'stripe'
+        self.secret_key = secret_key
+
+    def _headers(self):
+        return {
+            'Authorization': f'Bearer {self.secret_key}',
+            'Content-Type': 'application/x-www-form-urlencoded'
+        }
+
+    async def create_card_payment(self, amount, description, payment_method_id, customer_email,
+                                  external_reference=None):
+        """Cria um pagamento via cartão de crédito"""
+        data = StripeProcessor._card_payment_data(
+            amount, description, payment_method_id, customer_email, external_reference
+        )
+        result = await self._make_request('POST', '/payment_intents', data)
+        return StripeProcessor._parse_card_payment(result) if result else None
+
+    async def create_subscription(self, price_id, customer_email, payment_method_id=None,
+                                  external_reference=None):
+        """Cria uma assinatura recorrente"""
+        customer_result = await self._make_request(
+            'POST', '/customers', StripeProcessor._customer_data(customer_email, payment_method_id)
+        )
+
+        if not customer_result:
+            return None
+
+        subscription_data = StripeProcessor._subscription_data(
+            customer_result.get('id'), price_id, external_reference
+        )
+        result = await self._make_request('POST', '/subscriptions', subscription_data)
+        return StripeProcessor._parse_subscription(result) if result else None
+
+    async def cancel_subscription(self, subscription_id):
+        """Cancela uma assinatura"""
+        result = await self._make_request('DELETE', f'/subscriptions/{subscription_id}')
+        return result is not None
+
+    async def get_payment_status(self, payment_id):
+        """Consulta o status de um pagamento (PaymentIntent)"""
+        result = await self._make_request('GET', f'/payment_intents/{payment_id}')
+        return StripeProcessor._parse_payment_status(result) if result else None
+
+    async def get_subscription_status(self, subscription_id):
+        """Consulta o status de uma assinatura"""
+        result = await self._make_request('GET', f'/subscriptions/{subscription_id}')
+        return StripeProcessor._parse_subscription_status(result) if result else None
+
+
+class AsyncPaymentManager:
+    """Gerenciador assíncrono que espelha a API do PaymentManager"""
+
+    def __init__(self, provider='mercadopago', **credentials):
+        http_options = credentials.get('http_options', {})
+        if provider == 'mercadopago':
+            self.processor = AsyncMercadoPagoProcessor(credentials.get('access_token'), **http_options)
+        elif provider == 'stripe':
+            self.processor = AsyncStripeProcessor(credentials.get('secret_key'), **http_options)
+        else:
+            raise ValueError(f"Provedor de pagamento não suportado: {provider}")
+
+    async def aclose(self):
+        """Fecha o pool de conexões do processador"""
+        await self.processor.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def create_pix_payment(self, amount, description, customer_data):
+        """Cria pagamento via Pix (apenas Mercado Pago)"""
+        if isinstance(self.processor, AsyncMercadoPagoProcessor):
+            return await self.processor.create_pix_payment(amount, description, customer_data)
+        else:
+            raise NotImplementedError("Pix não é suportado por este provedor")
+
+    async def create_card_payment(self, amount, description, payment_data, customer_data):
+        """Cria pagamento via cartão"""
+        if isinstance(self.processor, AsyncMercadoPagoProcessor):
+            return await self.processor.create_card_payment(
+                amount, description,
+                payment_data.get('card_token'),
+                payment_data.get('installments', 1),
+                customer_data
+            )
+        elif isinstance(self.processor, AsyncStripeProcessor):
+            return await self.processor.create_card_payment(
+                amount, description,
+                payment_data.get('payment_method_id'),
+                customer_data.get('email'),
+                customer_data.get('external_reference')
+            )
+
+    async def create_subscription(self, plan_data, customer_data, payment_data=None):
+        """Cria assinatura recorrente"""
+        if isinstance(self.processor, AsyncMercadoPagoProcessor):
+            return await self.processor.create_subscription(
+                plan_data.get('plan_id'),
+                customer_data,
+                payment_data.get('card_token') if payment_data else None
+            )
+        elif isinstance(self.processor, AsyncStripeProcessor):
+            return await self.processor.create_subscription(
+                plan_data.get('price_id'),
+                customer_data.get('email'),
+                payment_data.get('payment_method_id') if payment_data else None,
+                customer_data.get('external_reference')
+            )
+
+    async def cancel_subscription(self, subscription_id):
+        """Cancela assinatura"""
+        return await self.processor.cancel_subscription(subscription_id)
+
+    async def get_payment_status(self, payment_id):
+        """Consulta status de pagamento"""
+        return await self.processor.get_payment_status(payment_id)
+
+    async def get_subscription_status(self, subscription_id):
+        """Consulta status de assinatura"""
+        return await self.processor.get_subscription_status(subscription_id)
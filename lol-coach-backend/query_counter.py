@@ -0,0 +1,83 @@
+"""
+Módulo de Contagem de Consultas
+Conta os comandos SQL executados por requisição ou dentro de um bloco de código
+"""
+
+import threading
+from contextlib import contextmanager
+
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+
+
+class QueryCounter:
+    """Acumula os comandos SQL executados enquanto estiver ativo"""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def record(self, statement):
+        self.count += 1
+        self.statements.append(statement)
+
+    def assert_at_most(self, expected):
+        """Falha se mais comandos que o esperado foram executados"""
+        if self.count > expected:
+            executed = '\n'.join(self.statements)
+            raise AssertionError(f"Esperado no máximo {expected} consultas, executadas {self.count}:\n{executed}")
+
+
+def _active_counters():
+    if not hasattr(_local, 'counters'):
+        _local.counters = []
+    return _local.counters
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    for counter in _active_counters():
+        counter.record(statement)
+
+
+@contextmanager
+def count_queries():
+    """Conta os comandos SQL executados nesta thread dentro do bloco
+
+    Uso em testes:
+        with count_queries() as counter:
+            client.get('/api/admin/audit-logs')
+        counter.assert_at_most(2)
+    """
+    counter = QueryCounter()
+    counters = _active_counters()
+    counters.append(counter)
+    try:
+        yield counter
+    finally:
+        counters.remove(counter)
+
+
+def init_app(app, header='X-Query-Count'):
+    """Registra a contagem por requisição e a expõe em um cabeçalho de resposta"""
+
+    @app.before_request
+    def _start_query_count():
+        g.query_counter = QueryCounter()
+        _active_counters().append(g.query_counter)
+
+    @app.after_request
+    def _add_query_count_header(response):
+        counter = g.get('query_counter')
+        if counter is not None:
+            response.headers[header] = str(counter.count)
+        return response
+
+    @app.teardown_request
+    def _stop_query_count(exc):
+        counter = g.pop('query_counter', None)
+        if counter is not None and counter in _active_counters():
+            _active_counters().remove(counter)
@@ -0,0 +1,116 @@
+"""
+Módulo de Processamento de Webhooks
+Pool de threads que consome eventos pendentes gravados no banco, em lotes
+"""
+
+import atexit
+import os
+import threading
+
+
+class WorkerPool:
+    """Threads que chamam `process_batch(limit)` até a fila pendente esvaziar
+
+    `process_batch` deve reivindicar até `limit` eventos, aplicá-los e retornar
+    quantos foram processados. As threads acordam com `notify()` ou a cada
+    `poll_interval` segundos, para retomar eventos deixados por outros workers.
+    """
+
+    def __init__(self, process_batch, workers=2, batch_size=100, poll_interval=5.0,
+                 name='webhook-worker'):
+        self.process_batch = process_batch
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.name = name
+
+        self._start_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Condition()
+        self._pending_signals = 0
+        self._threads = []
+        self._pid = None
+
+        self.batches = 0
+        self.processed = 0
+        self.failed_batches = 0
+
+        atexit.register(self.stop)
+
+    def start(self):
+        """Garante as threads vivas neste processo; barato quando já estão rodando"""
+        self._ensure_started()
+
+    def notify(self):
+        """Acorda uma thread para processar novos eventos"""
+        self._ensure_started()
+        with self._wakeup:
+            self._pending_signals += 1
+            self._wakeup.notify()
+
+    def drain(self):
+        """Processa na thread atual todos os eventos pendentes (CLI/testes)"""
+        total = 0
+        while True:
+            processed = self._run_batch()
+            total += processed
+            if processed < self.batch_size:
+                return total
+
+    def stop(self):
+        """Para as threads do pool"""
+        self._stop_event.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        if self._pid == os.getpid():
+            for thread in self._threads:
+                thread.join(timeout=10)
+
+    def stats(self):
+        """Retorna contadores do pool"""
+        return {
+            'workers': self.workers,
+            'alive': sum(1 for t in self._threads if t.is_alive()) if self._pid == os.getpid() else 0,
+            'batches': self.batches,
+            'processed': self.processed,
+            'failed_batches': self.failed_batches
+        }
+
+    def _ensure_started(self):
+        # Threads recriadas por pid para sobreviver ao fork dos workers do gunicorn
+        if self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+                return
+            self._pid = os.getpid()
+            self._stop_event.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'{self.name}-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self._wakeup:
+                if not self._pending_signals:
+                    self._wakeup.wait(self.poll_interval)
+                self._pending_signals = 0
+
+            # Continua enquanto houver lotes cheios para não esperar o próximo sinal
+            while not self._stop_event.is_set() and self._run_batch() >= self.batch_size:
+                pass
+
+    def _run_batch(self):
+        try:
+            processed = self.process_batch(self.batch_size)
+        except Exception as e:
+            self.failed_batches += 1
+            print(f"Erro ao processar lote de webhooks: {e}")
+            return 0
+        if processed:
+            self.batches += 1
+            self.processed += processed
+        return processed
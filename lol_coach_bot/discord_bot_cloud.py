@@ -13,12 +13,8 @@ from discord.ext import commands, tasks
 import asyncio
 import os
 from pathlib import Path
-from openai import OpenAI
-from gtts import gTTS
-import io
 import sys
-import requests
-from typing import Dict
+from typing import Dict, Optional
 
 # Importar o servidor WebSocket
 from websocket_server import WebSocketServer
@@ -26,6 +22,15 @@ from websocket_server import WebSocketServer
 # Importar módulos do treinador
 sys.path.insert(0, os.path.dirname(__file__))
 from analysis_and_tips_module_cloud import GameAnalyzer
+from cache import TTLCache
+from llm_gateway import LLMGateway
+from match_store import MatchStore
+from playback import PRIORITY_NORMAL, PRIORITY_TIP, PlaybackWorker, SpeechQueue
+from postgame_stats import TIP_TEXT, build_batch_report, participant_row, performance_tips
+from riot_client import RiotAPIError, RiotClient
+from static_data import StaticDataRegistry
+from tts import BACKENDS, LoopLagMonitor, TTSExecutor
+from tts_cache import TTSCache
 
 # Configuração do bot
 intents = discord.Intents.default()
@@ -34,11 +39,75 @@ intents.voice_states = True
 intents.guilds = True
 intents.members = True
 
-bot = commands.Bot(command_prefix=\'!coach \', intents=intents)
+bot = commands.Bot(command_prefix='!coach ', intents=intents)
 
 # Chave da Riot API
 RIOT_API_KEY = os.getenv("RIOT_API_KEY")
 
+# Cliente único da Riot API: conexões reaproveitadas e limites de taxa compartilhados
+riot_client = RiotClient(
+    RIOT_API_KEY,
+    max_connections=int(os.getenv("RIOT_MAX_CONNECTIONS", 20)),
+    max_retry_after=float(os.getenv("RIOT_MAX_RETRY_AFTER", 30)),
+    base_url=os.getenv("RIOT_API_BASE_URL") or None
+)
+
+# Partidas encerradas não mudam: ficam no disco; PUUIDs e listas de partidas têm TTL
+match_store = MatchStore(
+    os.getenv("MATCH_STORE_PATH", os.path.join(os.path.dirname(__file__), "match_store.sqlite3")),
+    max_matches=int(os.getenv("MATCH_STORE_MAX_MATCHES", 20000))
+)
+puuid_cache = TTLCache(maxsize=5000, ttl=int(os.getenv("PUUID_CACHE_TTL", 24 * 3600)))
+match_ids_cache = TTLCache(maxsize=5000, ttl=int(os.getenv("MATCH_IDS_CACHE_TTL", 120)))
+
+# Itens, campeões e feitiços do Data Dragon, compartilhados pela análise ao vivo e pós-partida
+static_data = StaticDataRegistry(
+    os.getenv("STATIC_DATA_DIR", os.path.join(os.path.dirname(__file__), "static_data")),
+    locale=os.getenv("DDRAGON_LOCALE", "pt_BR"),
+    legacy_item_file=os.path.join(os.path.dirname(__file__), "item.json")
+)
+bot.static_data = static_data
+
+# Gateway único do LLM (ask e pós-partida): conexões reaproveitadas, cache e limites
+llm_gateway = LLMGateway(
+    os.getenv("OPENAI_API_KEY"),
+    base_url=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+    model=os.getenv("LLM_MODEL", "gemini-2.5-flash"),
+    per_guild=int(os.getenv("LLM_PER_GUILD", 2)),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 8)),
+    cache_ttl=int(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+)
+# Respostas do `ask` dependem do momento da partida: ficam pouco tempo em cache
+ASK_CACHE_TTL = int(os.getenv("ASK_CACHE_TTL", 60))
+POSTGAME_EDIT_INTERVAL = float(os.getenv("POSTGAME_EDIT_INTERVAL", 1.0))
+DISCORD_MESSAGE_LIMIT = 2000
+
+# Voz do treinador e cache das falas já sintetizadas (compartilhado entre servidores)
+TTS_LANG = os.getenv("TTS_LANG", "pt")
+TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts")  # gtts | openai
+TTS_VOICE = os.getenv("TTS_VOICE", "com")  # gTTS: domínio (tld), define o sotaque; OpenAI: nome da voz
+tts_cache = TTSCache(
+    os.getenv("TTS_CACHE_DIR", os.path.join(os.path.dirname(__file__), "tts_cache")),
+    memory_bytes=int(os.getenv("TTS_CACHE_MEMORY_MB", 16)) * 1024 * 1024,
+    disk_bytes=int(os.getenv("TTS_CACHE_DISK_MB", 256)) * 1024 * 1024
+)
+
+# Síntese em pool de threads, fora do event loop (limites global e por servidor)
+tts_executor = TTSExecutor(
+    BACKENDS[TTS_BACKEND](),
+    tts_cache,
+    lang=TTS_LANG,
+    voice=TTS_VOICE,
+    max_workers=int(os.getenv("TTS_MAX_WORKERS", 4)),
+    per_guild=int(os.getenv("TTS_PER_GUILD", 1))
+)
+
+# Atraso do event loop, exibido em `!coach perf`
+loop_lag = LoopLagMonitor()
+
+# Dicas que esperam mais que isso na fila são descartadas em vez de tocar atrasadas
+TTS_TIP_MAX_AGE = float(os.getenv("TTS_TIP_MAX_AGE", 15))
+
 # Estado por servidor (guild)
 class GuildState:
     def __init__(self, guild_id: int):
@@ -48,7 +117,13 @@ class GuildState:
         self.game_analyzer = GameAnalyzer()
         self.monitored_players = []
         self.last_tips = []
-        self.audio_queue = asyncio.Queue()
+        self.audio_queue = SpeechQueue()
+        self.player = PlaybackWorker(
+            self.audio_queue,
+            lambda text: tts_executor.synthesize(guild_id, text),
+            lambda: self.voice_client,
+            max_age={PRIORITY_TIP: TTS_TIP_MAX_AGE}
+        )
         self.bot_name = "Treinador Virtual"
         self.text_channel = None  # Canal onde o bot foi ativado
         self.user_tokens = {}  # user_id -> token
@@ -65,6 +140,11 @@ def get_guild_state(guild_id: int) -> GuildState:
         bot.guild_states[guild_id] = GuildState(guild_id)
     return bot.guild_states[guild_id]
 
+@tasks.loop(hours=float(os.getenv("STATIC_DATA_CHECK_HOURS", 6)))
+async def refresh_static_data():
+    """Carrega os dados estáticos e troca o snapshot quando sai um patch novo"""
+    await static_data.refresh()
+
 # Eventos do bot
 @bot.event
 async def on_ready():
@@ -77,6 +157,10 @@ async def on_ready():
     for guild in bot.guilds:
         get_guild_state(guild.id)
     
+    loop_lag.start()
+    if not refresh_static_data.is_running():
+        refresh_static_data.start()
+    
     # Iniciar o servidor WebSocket
     global ws_server
     ws_server = WebSocketServer(bot)
@@ -107,11 +191,13 @@ async def on_guild_remove(guild):
     """Evento chamado quando o bot sai de um servidor"""
     print(f"❌ Bot removido do servidor: {guild.name} (ID: {guild.id})")
     if guild.id in bot.guild_states:
-        del bot.guild_states[guild.id]
+        bot.guild_states.pop(guild.id).player.stop()
+    tts_executor.forget_guild(guild.id)
+    llm_gateway.forget_guild(guild.id)
 
 # Comandos do bot
 
-@bot.command(name=\'gettoken\', help=\'Obtém seu token de autenticação para o cliente local\')
+@bot.command(name='gettoken', help='Obtém seu token de autenticação para o cliente local')
 async def get_token(ctx):
     """Gera e envia um token de autenticação para o usuário"""
     guild_state = get_guild_state(ctx.guild.id)
@@ -141,7 +227,7 @@ async def get_token(ctx):
             f"Por favor, habilite mensagens privadas de membros do servidor."
         )
 
-@bot.command(name=\'join\', help=\'O bot entra no seu canal de voz\')
+@bot.command(name='join', help='O bot entra no seu canal de voz')
 async def join(ctx):
     """Faz o bot entrar no canal de voz do usuário"""
     guild_state = get_guild_state(ctx.guild.id)
@@ -159,19 +245,20 @@ async def join(ctx):
     
     await ctx.send(f"✅ Conectado ao canal **{channel.name}**!")
 
-@bot.command(name=\'leave\', help=\'O bot sai do canal de voz\')
+@bot.command(name='leave', help='O bot sai do canal de voz')
 async def leave(ctx):
     """Faz o bot sair do canal de voz"""
     guild_state = get_guild_state(ctx.guild.id)
     
     if guild_state.voice_client and guild_state.voice_client.is_connected():
+        guild_state.player.clear()
         await guild_state.voice_client.disconnect()
         guild_state.voice_client = None
         await ctx.send("👋 Desconectado do canal de voz!")
     else:
         await ctx.send("❌ Não estou em nenhum canal de voz!")
 
-@bot.command(name=\'start\', help=\'Inicia o monitoramento da partida\')
+@bot.command(name='start', help='Inicia o monitoramento da partida')
 async def start_monitoring(ctx):
     """Inicia o monitoramento da partida"""
     guild_state = get_guild_state(ctx.guild.id)
@@ -192,7 +279,7 @@ async def start_monitoring(ctx):
         f"💡 Vou fornecer dicas em tempo real via voz e texto!"
     )
 
-@bot.command(name=\'stop\', help=\'Para o monitoramento da partida\')
+@bot.command(name='stop', help='Para o monitoramento da partida')
 async def stop_monitoring(ctx):
     """Para o monitoramento da partida"""
     guild_state = get_guild_state(ctx.guild.id)
@@ -206,14 +293,14 @@ async def stop_monitoring(ctx):
     
     await ctx.send("⏹️ Monitoramento parado!")
 
-@bot.command(name=\'setname\', help=\'Define um nome personalizado para o treinador\')
+@bot.command(name='setname', help='Define um nome personalizado para o treinador')
 async def set_bot_name(ctx, *, new_name: str):
     """Define um nome personalizado para o treinador"""
     guild_state = get_guild_state(ctx.guild.id)
     guild_state.bot_name = new_name
     await ctx.send(f"✅ Meu nome agora é **{new_name}**! Prazer em conhecê-lo, {ctx.author.display_name}.")
 
-@bot.command(name=\'ask\', help=\'Faz uma pergunta ao treinador\')
+@bot.command(name='ask', help='Faz uma pergunta ao treinador')
 async def ask(ctx, *, question: str):
     """Responde a uma pergunta do usuário"""
     guild_state = get_guild_state(ctx.guild.id)
@@ -231,15 +318,14 @@ async def ask(ctx, *, question: str):
             game_stats = game_data.get("gameData", {})
             
             if active_player:
-                context += f"O jogador ativo é {active_player.get(\'summonerName\')} jogando com {active_player.get(\'championName\')}. "
-                context += f"Ele está no nível {active_player.get(\'level\')} e tem {active_player.get(\'currentGold\')} de ouro. "
+                context += f"O jogador ativo é {active_player.get('summonerName')} jogando com {active_player.get('championName')}. "
+                context += f"Ele está no nível {active_player.get('level')} e tem {active_player.get('currentGold')} de ouro. "
             if game_stats:
-                context += f"O tempo de jogo atual é de {game_stats.get(\'gameTime\')} segundos. "
+                context += f"O tempo de jogo atual é de {game_stats.get('gameTime')} segundos. "
             if player_list:
-                context += f"Os campeões no jogo são: {\', \'.join([p.get(\'championName\') for p in player_list])}. "
+                context += f"Os campeões no jogo são: {', '.join([p.get('championName') for p in player_list])}. "
         
         # Preparar mensagem para o LLM
-        openai_client = OpenAI()
         messages = [
             {"role": "system", "content": f"Você é um treinador virtual de League of Legends chamado {guild_state.bot_name}. Forneça dicas e responda a perguntas de forma útil e concisa, baseando-se no contexto do jogo fornecido. Use português do Brasil. Mantenha um tom de coach profissional e encorajador. Ao se dirigir ao usuário, use o nome dele: {ctx.author.display_name}."},
         ]
@@ -247,52 +333,82 @@ async def ask(ctx, *, question: str):
             messages.append({"role": "system", "content": f"Contexto atual do jogo: {context}"})
         messages.append({"role": "user", "content": question})
         
-        response = openai_client.chat.completions.create(
-            model="gemini-2.5-flash",
-            messages=messages,
-            max_tokens=150
+        # Mesma pergunta do mesmo jogador com os mesmos campeões reaproveita a resposta;
+        # ouro, nível e tempo de jogo ficam fora da chave
+        champions = sorted(p.get("championName") or "" for p in game_data.get("allPlayers", [])) if game_data else []
+        active_champion = game_data.get("activePlayer", {}).get("championName", "") if game_data else ""
+        answer = await llm_gateway.complete(
+            messages,
+            guild_id=ctx.guild.id,
+            max_tokens=150,
+            cache_key=LLMGateway.semantic_key(ctx.guild.id, guild_state.bot_name, ctx.author.display_name, question, active_champion, *champions),
+            cache_ttl=ASK_CACHE_TTL
         )
         
-        answer = response.choices[0].message.content
-        
         # Enviar resposta no chat
         await ctx.send(f"💡 **{guild_state.bot_name} diz:**\n{answer}")
         
         # Se estiver em um canal de voz, também falar a resposta
         if guild_state.voice_client and guild_state.voice_client.is_connected():
-            await speak_text(guild_state, answer)
+            await speak_text(guild_state, answer, PRIORITY_NORMAL)
     
     except Exception as e:
         await ctx.send(f"❌ Erro ao processar pergunta: {str(e)}")
 
-@bot.command(name=\'status\', help=\'Mostra o status do monitoramento\')
+@bot.command(name='status', help='Mostra o status do monitoramento')
 async def status(ctx):
     """Mostra o status do monitoramento"""
     guild_state = get_guild_state(ctx.guild.id)
     
     status_msg = f"📊 **Status do {guild_state.bot_name}**\n\n"
-    status_msg += f"🎤 Canal de voz: {\'Conectado\' if guild_state.voice_client and guild_state.voice_client.is_connected() else \'Desconectado\'}\n"
-    status_msg += f"👁️ Monitoramento: {\'Ativo ✅\' if guild_state.monitoring else \'Inativo ⏸️\'}\n"
+    status_msg += f"🎤 Canal de voz: {'Conectado' if guild_state.voice_client and guild_state.voice_client.is_connected() else 'Desconectado'}\n"
+    status_msg += f"👁️ Monitoramento: {'Ativo ✅' if guild_state.monitoring else 'Inativo ⏸️'}\n"
     
     connected_clients_count = len([t for t, info in ws_server.user_tokens.items() if info["guild_id"] == ctx.guild.id and t in ws_server.clients])
     status_msg += f"🔗 Clientes locais conectados: {connected_clients_count}\n"
     
     await ctx.send(status_msg)
 
+@bot.command(name='perf', help='Mostra o atraso do event loop e as métricas de voz')
+async def perf(ctx):
+    """Mostra o atraso do event loop e as métricas da síntese de voz"""
+    lag = loop_lag.stats()
+    tts_stats = tts_executor.stats()
+    cache = tts_stats["cache"]
+    
+    perf_msg = "⏱️ **Desempenho do bot**\n\n"
+    perf_msg += f"🔁 Atraso do event loop: média {lag['avg_ms']} ms, p99 {lag['p99_ms']} ms, pico recente {lag['window_max_ms']} ms, pico total {lag['max_ms']} ms\n"
+    perf_msg += f"🗣️ Síntese ({tts_stats['backend']}): {tts_stats['syntheses']} falas, média {tts_stats['avg_synthesis_ms']} ms, {tts_stats['coalesced']} agrupadas, {tts_stats['failures']} falhas\n"
+    playback = get_guild_state(ctx.guild.id).player.stats()
+    perf_msg += f"🔊 Fila de voz: {playback['pending']} pendentes, {playback['played']} tocadas, {playback['expired']} expiradas, {playback['deduplicated']} duplicadas, {playback['preempted']} interrompidas\n"
+    perf_msg += f"💾 Cache de voz: {cache['hit_rate'] * 100:.1f}% de acertos, {cache['disk_entries']} falas em disco\n"
+    riot = riot_client.stats()
+    store = match_store.stats()
+    perf_msg += f"🗄️ Partidas locais: {store['matches']} salvas, {store['hit_rate'] * 100:.1f}% de acertos; PUUID {puuid_cache.stats()['hit_rate'] * 100:.1f}%, listas {match_ids_cache.stats()['hit_rate'] * 100:.1f}%\n"
+    llm = llm_gateway.stats()
+    perf_msg += f"🧠 LLM ({llm['model']}): {llm['requests']} requisições, {llm['cache']['hit_rate'] * 100:.1f}% em cache, {llm['coalesced']} agrupadas, {llm['errors']} erros, {llm['prompt_tokens'] + llm['completion_tokens']} tokens, latência média {llm['avg_latency_ms']} ms (primeiro token {llm['avg_first_token_ms']} ms)\n"
+    perf_msg += f"🌐 Riot API: {riot['requests']} requisições, {riot['coalesced']} agrupadas, {riot['rate_limited']} limitadas (429), {riot['errors']} erros\n"
+    
+    await ctx.send(perf_msg)
+
 # Função para obter PUUID de um nome de invocador
 async def get_puuid_by_summoner_name(summoner_name: str, region: str = "br1"):
     if not RIOT_API_KEY:
         print("RIOT_API_KEY não configurada.")
         return None
     
-    # Primeiro, obter o summonerId
-    summoner_url = f"https://{region}.api.riotgames.com/lol/summoner/v4/summoners/by-name/{summoner_name}?api_key={RIOT_API_KEY}"
+    cache_key = (region, " ".join(summoner_name.lower().split()))
+    puuid = puuid_cache.get(cache_key)
+    if puuid:
+        return puuid
+    
     try:
-        response = requests.get(summoner_url)
-        response.raise_for_status() # Levanta exceção para erros HTTP
-        summoner_data = response.json()
-        return summoner_data.get("puuid")
-    except requests.exceptions.RequestException as e:
+        summoner_data = await riot_client.get_summoner_by_name(summoner_name, region)
+        puuid = summoner_data.get("puuid")
+        if puuid:
+            puuid_cache.set(cache_key, puuid)
+        return puuid
+    except RiotAPIError as e:
         print(f"Erro ao obter PUUID para {summoner_name}: {e}")
         return None
 
@@ -302,12 +418,16 @@ async def get_match_ids_by_puuid(puuid: str, count: int = 1, region_routing: str
         print("RIOT_API_KEY não configurada.")
         return []
     
-    match_list_url = f"https://{region_routing}.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids?count={count}&api_key={RIOT_API_KEY}"
+    # Uma lista maior já em cache também atende pedidos menores
+    cached = match_ids_cache.get((region_routing, puuid))
+    if cached is not None and cached[0] >= count:
+        return cached[1][:count]
+    
     try:
-        response = requests.get(match_list_url)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        match_ids = await riot_client.get_match_ids(puuid, count, region_routing)
+        match_ids_cache.set((region_routing, puuid), (count, match_ids))
+        return match_ids
+    except RiotAPIError as e:
         print(f"Erro ao obter match IDs para PUUID {puuid}: {e}")
         return []
 
@@ -317,31 +437,28 @@ async def get_match_details(match_id: str, region_routing: str = "americas"):
         print("RIOT_API_KEY não configurada.")
         return None
     
-    match_details_url = f"https://{region_routing}.api.riotgames.com/lol/match/v5/matches/{match_id}?api_key={RIOT_API_KEY}"
+    match_details = await asyncio.to_thread(match_store.get, match_id)
+    if match_details is not None:
+        return match_details
+    
     try:
-        response = requests.get(match_details_url)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        match_details = await riot_client.get_match(match_id, region_routing)
+        await asyncio.to_thread(match_store.put, match_id, match_details)
+        return match_details
+    except RiotAPIError as e:
         print(f"Erro ao obter detalhes da partida {match_id}: {e}")
         return None
 
 # Função para gerar relatório pós-partida (agora no bot_cloud)
-def generate_postgame_report(match_details: dict, player_puuid: str, bot_name: str) -> str:
-    """Gera um relatório de análise pós-partida a partir dos detalhes da partida."""
+def generate_postgame_report(match_details: dict, player_puuid: str):
+    """Gera a parte determinística do relatório pós-partida (sem E/S)
+
+    Retorna (relatório, prompt para o LLM); o prompt é None se o jogador não estiver na partida.
+    """
     report = []
 
-    # Carregar dados de itens para nomes
-    item_data = {}
-    try:
-        item_file = os.path.join(os.path.dirname(__file__), "item.json")
-        with open(item_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            item_data = {item_id: item_info["name"] for item_id, item_info in data["data"].items()}
-    except FileNotFoundError:
-        print("Erro: item.json não encontrado para análise pós-partida.")
-    except Exception as e:
-        print(f"Erro ao carregar dados de itens para análise pós-partida: {e}")
+    # Nomes de itens e feitiços do snapshot já carregado (sem E/S)
+    game_data = static_data.current
 
     # Encontrar o participante do jogador
     player_participant = None
@@ -351,7 +468,7 @@ def generate_postgame_report(match_details: dict, player_puuid: str, bot_name: s
             break
 
     if not player_participant:
-        return "Não foi possível encontrar os dados do jogador nesta partida."
+        return "Não foi possível encontrar os dados do jogador nesta partida.", None
 
     # Resumo da partida
     game_duration_seconds = match_details["info"]["gameDuration"]
@@ -360,54 +477,93 @@ def generate_postgame_report(match_details: dict, player_puuid: str, bot_name: s
     win = "Vitória" if player_participant["win"] else "Derrota"
 
     report.append(f"**Resultado:** {win} em {game_mode} ({game_duration_minutes} minutos)")
-    report.append(f"**Campeão:** {player_participant["championName"]} ({player_participant["champLevel"]}) - KDA: {player_participant["kills"]}/{player_participant["deaths"]}/{player_participant["assists"]}")
-    report.append(f"**Farm (CS):** {player_participant["totalMinionsKilled"]} + {player_participant["neutralMinionsKilled"]} (selva)")
-    report.append(f"**Ouro:** {round(player_participant["goldEarned"] / 1000, 1)}k")
-    report.append(f"**Dano Causado:** {player_participant["totalDamageDealtToChampions"]:,}")
-    report.append(f"**Visão:** {player_participant["visionScore"]}")
+    report.append(f"**Campeão:** {player_participant['championName']} ({player_participant['champLevel']}) - KDA: {player_participant['kills']}/{player_participant['deaths']}/{player_participant['assists']}")
+    report.append(f"**Farm (CS):** {player_participant['totalMinionsKilled']} + {player_participant['neutralMinionsKilled']} (selva)")
+    report.append(f"**Ouro:** {round(player_participant['goldEarned'] / 1000, 1)}k")
+    report.append(f"**Dano Causado:** {player_participant['totalDamageDealtToChampions']:,}")
+    report.append(f"**Visão:** {player_participant['visionScore']}")
 
     # Análise de itens
     items_names = []
     for i in range(0, 7): # Itens de 0 a 6
         item_id = player_participant.get(f"item{i}")
         if item_id and item_id != 0:
-            item_name = item_data.get(str(item_id), f"Item ID: {item_id}")
-            items_names.append(item_name)
+            items_names.append(game_data.item_name(item_id))
     if items_names:
-        report.append(f"**Itens Finais:** {\", \".join(items_names)}")
+        report.append(f"**Itens Finais:** {', '.join(items_names)}")
+
+    spells = [player_participant.get(f"summoner{i}Id") for i in (1, 2)]
+    if all(spells):
+        report.append(f"**Feitiços:** {', '.join(game_data.summoner_spell_name(spell) for spell in spells)}")
+
+    # Dicas baseadas em performance (mesmas heurísticas da análise em lote)
+    for tip in performance_tips(
+        player_participant["kills"], player_participant["deaths"], player_participant["assists"],
+        player_participant["totalMinionsKilled"], player_participant["visionScore"], game_duration_minutes
+    ):
+        report.append(f"💡 **Dica:** {TIP_TEXT[tip]}")
+
+    # Prompt da análise avançada, gerada em streaming pelo LLM
+    llm_prompt = f"Analise o seguinte desempenho de um jogador em uma partida de League of Legends e forneça dicas construtivas e personalizadas. O jogador jogou de {player_participant['championName']}. KDA: {player_participant['kills']}/{player_participant['deaths']}/{player_participant['assists']}. Farm: {player_participant['totalMinionsKilled']} + {player_participant['neutralMinionsKilled']}. Ouro: {round(player_participant['goldEarned'] / 1000, 1)}k. Dano: {player_participant['totalDamageDealtToChampions']:,}. Visão: {player_participant['visionScore']}. Itens: {', '.join(items_names)}. A partida durou {game_duration_minutes} minutos e o resultado foi {win}. O que o jogador poderia ter feito melhor e quais são 2-3 dicas acionáveis para a próxima partida?"
+
+    return "\n".join(report), llm_prompt
+
+def stream_postgame_analysis(llm_prompt: str, bot_name: str, guild_id: int):
+    """Gera a análise avançada do LLM em pedaços, conforme o modelo responde"""
+    return llm_gateway.stream(
+        [
+            {"role": "system", "content": f"Você é um treinador de League of Legends chamado {bot_name}. Forneça análises pós-partida detalhadas e dicas construtivas. Use português do Brasil."},
+            {"role": "user", "content": llm_prompt}
+        ],
+        guild_id=guild_id,
+        max_tokens=300
+    )
 
-    # Dicas baseadas em performance
-    if player_participant["deaths"] > player_participant["kills"] + player_participant["assists"]:
-        report.append("💡 **Dica:** Você teve muitas mortes em relação aos abates e assistências. Tente jogar de forma mais segura e evitar lutas desfavoráveis.")
-    elif player_participant["totalMinionsKilled"] < (game_duration_minutes * 5): # Exemplo: menos de 5 CS por minuto
-        report.append("💡 **Dica:** Seu farm (CS) foi um pouco baixo. Focar em farmar mais pode te dar uma vantagem de ouro significativa.")
+async def send_streamed_message(channel, header: str, chunks,
+                                failure_text: str = "⚠️ Não foi possível gerar uma análise avançada no momento.") -> str:
+    """Envia `header` e vai editando a mensagem conforme `chunks` chegam
+
+    As edições são espaçadas por POSTGAME_EDIT_INTERVAL para respeitar o limite de
+    taxa do Discord; texto além de 2000 caracteres continua em uma nova mensagem.
+    Se o gerador falhar, a mensagem recebe `failure_text` e a exceção é propagada.
+    """
+    loop = asyncio.get_running_loop()
+    progress = " ⏳"
+    # Reserva espaço para o indicador de progresso das edições intermediárias
+    limit = DISCORD_MESSAGE_LIMIT - len(progress)
+    message = await channel.send(f"{header}\n⏳")
+    content = header + "\n"
+    text = ""
+    last_edit = loop.time()
     
-    if player_participant["visionScore"] < (game_duration_minutes * 1.5): # Exemplo: menos de 1.5 de visão por minuto
-        report.append("💡 **Dica:** Sua pontuação de visão foi um pouco baixa. Wards são cruciais para controle de mapa e segurança.")
-
-    # Dicas do LLM para análise mais aprofundada
     try:
-        openai_client = OpenAI()
-        llm_prompt = f"Analise o seguinte desempenho de um jogador em uma partida de League of Legends e forneça dicas construtivas e personalizadas. O jogador jogou de {player_participant["championName"]}. KDA: {player_participant["kills"]}/{player_participant["deaths"]}/{player_participant["assists"]}. Farm: {player_participant["totalMinionsKilled"]} + {player_participant["neutralMinionsKilled"]}. Ouro: {round(player_participant["goldEarned"] / 1000, 1)}k. Dano: {player_participant["totalDamageDealtToChampions"]:,}. Visão: {player_participant["visionScore"]}. Itens: {\", \".join(items_names)}. A partida durou {game_duration_minutes} minutos e o resultado foi {win}. O que o jogador poderia ter feito melhor e quais são 2-3 dicas acionáveis para a próxima partida?" 
-        
-        llm_response = openai_client.chat.completions.create(
-            model="gemini-2.5-flash",
-            messages=[
-                {"role": "system", "content": f"Você é um treinador de League of Legends chamado {bot_name}. Forneça análises pós-partida detalhadas e dicas construtivas. Use português do Brasil."},
-                {"role": "user", "content": llm_prompt}
-            ],
-            max_tokens=300
-        )
-        llm_tip = llm_response.choices[0].message.content
-        report.append(f"\n🧠 **Análise Avançada do {bot_name}:**\n{llm_tip}")
-
-    except Exception as e:
-        print(f"Erro ao gerar análise pós-partida com LLM: {e}")
-        report.append("\n⚠️ Não foi possível gerar uma análise avançada no momento.")
-
-    return "\n".join(report)
+        async for chunk in chunks:
+            text += chunk
+            while len(content) + len(text) > limit:
+                # Fecha a mensagem atual no último espaço antes do limite e abre outra
+                room = limit - len(content)
+                cut = text.rfind(" ", 0, room)
+                cut = cut if cut > 0 else room
+                await message.edit(content=content + text[:cut])
+                text = text[cut:].lstrip()
+                content = ""
+                message = await channel.send("⏳")
+                last_edit = loop.time()
+            if loop.time() - last_edit >= POSTGAME_EDIT_INTERVAL:
+                await message.edit(content=content + text + progress)
+                last_edit = loop.time()
+    except Exception:
+        await message.edit(content=(content + text + "\n" + failure_text)[-DISCORD_MESSAGE_LIMIT:])
+        raise
+    
+    if (content + text).strip():
+        await message.edit(content=content + text)
+    else:
+        # Só sobrou espaço em branco após a última divisão: o Discord recusa mensagem vazia
+        await message.delete()
+    return text
 
-@bot.command(name=\'postgame\', help=\'Analisa a última partida de um jogador (uso: !coach postgame NomeInvocador)\')
+@bot.command(name='postgame', help='Analisa a última partida de um jogador (uso: !coach postgame NomeInvocador)')
 async def postgame_analysis(ctx, *, summoner_name: str):
     """Realiza a análise pós-partida para um jogador"""
     guild_state = get_guild_state(ctx.guild.id)
@@ -421,7 +577,7 @@ async def postgame_analysis(ctx, *, summoner_name: str):
             return
 
         # 2. Obter IDs das últimas partidas
-        # Assumindo que a região de roteamento para BR é \'americas\'
+        # Assumindo que a região de roteamento para BR é 'americas'
         match_ids = await get_match_ids_by_puuid(puuid, count=1, region_routing="americas")
         if not match_ids:
             await ctx.send(f"❌ {guild_state.bot_name} não encontrou nenhuma partida recente para **{summoner_name}**.")
@@ -435,57 +591,125 @@ async def postgame_analysis(ctx, *, summoner_name: str):
             await ctx.send(f"❌ {guild_state.bot_name} não conseguiu obter os detalhes da partida {latest_match_id}.")
             return
 
-        # 4. Processar e gerar análise
-        analysis_report = generate_postgame_report(match_details, puuid, guild_state.bot_name)
+        # 4. Estatísticas saem na hora; a análise do LLM chega em streaming
+        await static_data.ensure_loaded()
+        analysis_report, llm_prompt = generate_postgame_report(match_details, puuid)
 
         await ctx.send(f"✅ **Análise Pós-Partida de {guild_state.bot_name} para {summoner_name} (Partida ID: {latest_match_id}):**\n\n{analysis_report}")
+        if not llm_prompt:
+            return
+
+        try:
+            await send_streamed_message(
+                ctx.channel,
+                f"🧠 **Análise Avançada do {guild_state.bot_name}:**",
+                stream_postgame_analysis(llm_prompt, guild_state.bot_name, ctx.guild.id)
+            )
+        except Exception as e:
+            print(f"Erro ao gerar análise pós-partida com LLM: {e}")
 
         if guild_state.voice_client and guild_state.voice_client.is_connected():
-            await speak_text(guild_state, f"Análise pós-partida para {summoner_name} concluída. Verifique o chat para o relatório completo.")
+            await speak_text(guild_state, f"Análise pós-partida para {summoner_name} concluída. Verifique o chat para o relatório completo.", PRIORITY_NORMAL)
 
     except Exception as e:
         await ctx.send(f"❌ Ocorreu um erro durante a análise pós-partida: {str(e)}")
 
-async def speak_text(guild_state: GuildState, text: str):
-    """Converte texto em fala e reproduz no canal de voz do Discord"""
-    if not guild_state.voice_client or not guild_state.voice_client.is_connected():
+# Limites da análise em lote
+BATCH_MAX_PLAYERS = 5
+BATCH_MAX_MATCHES = 20
+
+async def send_long_message(channel, text: str):
+    """Envia texto longo em várias mensagens, quebrando entre linhas"""
+    message = ""
+    for line in text.split("\n"):
+        if message and len(message) + len(line) + 1 > DISCORD_MESSAGE_LIMIT:
+            await channel.send(message)
+            message = ""
+        message = f"{message}\n{line}" if message else line
+    if message:
+        await channel.send(message)
+
+async def fetch_player_rows(summoner_name: str, count: int):
+    """Linhas de métricas das últimas `count` partidas de um jogador (None se não encontrado)"""
+    puuid = await get_puuid_by_summoner_name(summoner_name)
+    if not puuid:
+        return None
+    match_ids = await get_match_ids_by_puuid(puuid, count=count, region_routing="americas")
+    # Partidas em comum (5-stack) chegam uma vez só: store local + agrupamento no cliente Riot
+    matches = await asyncio.gather(*(get_match_details(match_id) for match_id in match_ids))
+    rows = [participant_row(match, puuid) for match in matches if match]
+    return [row for row in rows if row]
+
+@bot.command(name='batch', help='Analisa várias partidas de uma vez (uso: !coach batch [N] Nome1, Nome2, ...)')
+async def postgame_batch(ctx, count: Optional[int] = 1, *, summoner_names: str):
+    """Análise pós-partida do time inteiro ou das últimas N partidas de cada jogador"""
+    guild_state = get_guild_state(ctx.guild.id)
+    names = [name.strip() for name in summoner_names.split(",") if name.strip()]
+    if not names or len(names) > BATCH_MAX_PLAYERS or not 1 <= count <= BATCH_MAX_MATCHES:
+        await ctx.send(f"❌ Informe de 1 a {BATCH_MAX_PLAYERS} jogadores separados por vírgula e N entre 1 e {BATCH_MAX_MATCHES}.")
         return
-    
+
+    await ctx.send(f"🔎 {guild_state.bot_name} está analisando {count} partida(s) de {len(names)} jogador(es)...")
+
     try:
-        # Gerar áudio usando gTTS
-        tts = gTTS(text=text, lang='pt', slow=False)
-        fp = io.BytesIO()
-        tts.write_to_fp(fp)
-        fp.seek(0)
-        
-        # Aguardar se já estiver falando
-        while guild_state.voice_client.is_playing():
-            await asyncio.sleep(0.1)
-        
-        # Reproduzir áudio
-        audio_source = discord.FFmpegPCMAudio(fp)
-        guild_state.voice_client.play(audio_source)
-        
-        # Aguardar término da reprodução
-        while guild_state.voice_client.is_playing():
-            await asyncio.sleep(0.1)
-        
-        fp.close()
-    
+        # Todos os jogadores em paralelo; o limitador do cliente Riot segura a taxa
+        results = await asyncio.gather(*(fetch_player_rows(name, count) for name in names))
+        missing = [name for name, rows in zip(names, results) if rows is None]
+        rows_by_player = {name: rows for name, rows in zip(names, results) if rows is not None}
+        if not rows_by_player:
+            await ctx.send(f"❌ {guild_state.bot_name} não encontrou nenhum dos jogadores informados.")
+            return
+
+        report, summaries, aggregate = build_batch_report(rows_by_player)
+        header = f"✅ **Análise em Lote de {guild_state.bot_name}** ({count} partida(s) por jogador)"
+        if missing:
+            header += f"\n⚠️ Não encontrados: {', '.join(missing)}"
+        await send_long_message(ctx.channel, f"{header}\n\n{report}")
+        if not aggregate["games"]:
+            return
+
+        # Análise do LLM sobre os números consolidados
+        llm_prompt = (
+            "Analise o desempenho consolidado destes jogadores de League of Legends e forneça 2-3 dicas acionáveis "
+            "para o grupo e uma observação por jogador, considerando médias e tendências (valores por partida, da mais antiga para a mais recente).\n"
+            + report
+        )
+        try:
+            await send_streamed_message(
+                ctx.channel,
+                f"🧠 **Análise Avançada do {guild_state.bot_name}:**",
+                stream_postgame_analysis(llm_prompt, guild_state.bot_name, ctx.guild.id)
+            )
+        except Exception as e:
+            print(f"Erro ao gerar análise em lote com LLM: {e}")
+
     except Exception as e:
-        print(f"Erro ao falar texto: {e}")
+        await ctx.send(f"❌ Ocorreu um erro durante a análise em lote: {str(e)}")
+
+async def speak_text(guild_state: GuildState, text: str, priority: int = PRIORITY_TIP) -> bool:
+    """Enfileira uma fala para o canal de voz do Discord
+
+    Retorna sem esperar a reprodução; o worker do servidor toca as falas em ordem de
+    prioridade. Alertas de objetivos devem usar playback.PRIORITY_URGENT para interromper dicas.
+    """
+    if not guild_state.voice_client or not guild_state.voice_client.is_connected():
+        return False
+    
+    return guild_state.player.say(text, priority)
 
 # Adicionar speak_text como método do bot para acesso do WebSocket server
 bot.speak_text = speak_text
 
 # Comandos de encerramento
-@bot.command(name=\'shutdown\', help=\'Desliga o bot (apenas para usuários autorizados)\'
+@bot.command(name='shutdown', help='Desliga o bot (apenas para usuários autorizados)'
 )
 async def shutdown(ctx):
     """Desliga o bot"""
     # Apenas o dono do bot pode desligá-lo
     if ctx.author.id == bot.owner_id:
         await ctx.send("👋 Desligando o treinador virtual. Até a próxima!")
+        await riot_client.close()
+        await llm_gateway.close()
         await bot.close()
     else:
         await ctx.send("❌ Você não tem permissão para desligar o bot.")
@@ -0,0 +1,169 @@
+"""
+Servidor de LLM Falso
+
+Servidor HTTP local que imita o endpoint /v1/chat/completions compatível com a OpenAI
+(com e sem streaming), para testes do gateway de LLM sem acesso à rede
+
+Uso:
+    python fake_llm_server.py --port 8090 --latency 0.5 --chunk-delay 0.05
+
+    LLMGateway(api_key="teste", base_url="http://127.0.0.1:8090/v1")
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class FakeLLMServer:
+    """Modelo falso com latência, atraso entre pedaços e falhas configuráveis"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, chunk_delay=0.0, failure_rate=0.0,
+                 reply=None):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.failure_rate = failure_rate
+        self.reply = reply
+        self.requests = []
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Inicia o servidor em uma thread de fundo"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Para o servidor"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _answer(self, messages):
+        if self.reply is not None:
+            return self.reply
+        question = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        return f"Resposta simulada do treinador para: {question[:200]}"
+
+    @staticmethod
+    def _usage(messages, answer):
+        # Aproximação: uma palavra = um token
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+        completion_tokens = len(answer.split())
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                server.requests.append(body)
+
+                if self.path.split("?")[0] != "/v1/chat/completions":
+                    return self._send_json(404, {"error": {"message": "route not found"}})
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if server.failure_rate and random.random() < server.failure_rate:
+                    return self._send_json(503, {"error": {"message": "unavailable"}})
+
+                messages = body.get("messages", [])
+                answer = server._answer(messages)
+                usage = server._usage(messages, answer)
+                model = body.get("model", "fake")
+
+                if not body.get("stream"):
+                    return self._send_json(200, {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion",
+                        "model": model,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": answer}}],
+                        "usage": usage,
+                    })
+
+                # Streaming SSE; a conexão é fechada ao final para delimitar o corpo
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                words = answer.split(" ")
+                for i, word in enumerate(words):
+                    chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "model": model,
+                             "choices": [{"index": 0, "delta": {"content": word if i == 0 else f" {word}"}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    if server.chunk_delay:
+                        time.sleep(server.chunk_delay)
+
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    final = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "model": model,
+                             "choices": [], "usage": usage}
+                    self.wfile.write(f"data: {json.dumps(final)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de LLM falso para testes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latência até o primeiro byte, em segundos")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Atraso entre pedaços no streaming")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fração de respostas 503")
+    parser.add_argument("--reply", default=None, help="Resposta fixa (padrão: ecoa a pergunta)")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.latency, args.chunk_delay, args.failure_rate, args.reply)
+    print(f"LLM falso em {server.url}/v1 (use como OPENAI_BASE_URL)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
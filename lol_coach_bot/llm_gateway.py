@@ -0,0 +1,232 @@
+"""
+Gateway de LLM
+
+Cliente único, assíncrono e com conexões reaproveitadas para a API de chat compatível
+com a OpenAI. Oferece:
+- cache de respostas com TTL, por chave semântica (texto normalizado)
+- agrupamento de requisições idênticas em andamento
+- limite de concorrência global e por servidor
+- contabilidade de tokens e latência
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import re
+import time
+import unicodedata
+
+import httpx
+
+from cache import TTLCache
+
+
+class LLMError(Exception):
+    """Resposta de erro da API do LLM"""
+
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+def normalize_prompt(text: str) -> str:
+    """Minúsculas, sem acentos, pontuação ou espaços repetidos"""
+    text = unicodedata.normalize("NFKD", str(text).casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+class LLMGateway:
+    """Ponto único de acesso ao LLM, compartilhado por todos os servidores"""
+
+    def __init__(self, api_key, base_url="https://api.openai.com/v1", model="gemini-2.5-flash",
+                 per_guild=2, max_concurrency=8, cache_size=1000, cache_ttl=3600, timeout=60.0):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.per_guild = per_guild
+        self.timeout = timeout
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._client = None
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._guilds = {}  # guild_id -> Semaphore
+        self._inflight = {}  # chave -> Task/Future com o texto da resposta
+
+        self.requests = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tokens_by_guild = {}
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.first_token_total = 0.0
+        self.streams = 0
+
+    @staticmethod
+    def semantic_key(*parts) -> str:
+        """Chave que ignora diferenças triviais (caixa, acentos, pontuação, espaços)"""
+        return "\x00".join(normalize_prompt(part) for part in parts)
+
+    def _cache_key(self, messages, max_tokens, cache_key):
+        if cache_key is None:
+            cache_key = self.semantic_key(*(f"{m['role']}: {m['content']}" for m in messages))
+        raw = f"{self.model}\x00{max_tokens}\x00{cache_key}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=20, keepalive_expiry=60),
+                headers={"Authorization": f"Bearer {self.api_key or ''}"},
+            )
+        return self._client
+
+    async def close(self):
+        if self._client and not self._client.is_closed:
+            await self._client.aclose()
+
+    @contextlib.asynccontextmanager
+    async def _slots(self, guild_id):
+        if guild_id is None:
+            async with self._global:
+                yield
+            return
+        guild_slots = self._guilds.setdefault(guild_id, asyncio.Semaphore(self.per_guild))
+        async with guild_slots, self._global:
+            yield
+
+    def _account(self, guild_id, usage, started):
+        latency = time.perf_counter() - started
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        if usage:
+            prompt = usage.get("prompt_tokens", 0)
+            completion = usage.get("completion_tokens", 0)
+            self.prompt_tokens += prompt
+            self.completion_tokens += completion
+            if guild_id is not None:
+                self.tokens_by_guild[guild_id] = self.tokens_by_guild.get(guild_id, 0) + prompt + completion
+
+    async def complete(self, messages, guild_id=None, max_tokens=300, cache_key=None, cache_ttl=None) -> str:
+        """Retorna a resposta completa; `cache_key` substitui a chave derivada das mensagens"""
+        key = self._cache_key(messages, max_tokens, cache_key)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        pending = self._inflight.get(key)
+        if pending is None:
+            pending = asyncio.create_task(self._complete(key, messages, guild_id, max_tokens, cache_ttl))
+            self._inflight[key] = pending
+            pending.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: o cancelamento de um chamador não interrompe os demais
+        return await asyncio.shield(pending)
+
+    async def _complete(self, key, messages, guild_id, max_tokens, cache_ttl):
+        async with self._slots(guild_id):
+            started = time.perf_counter()
+            self.requests += 1
+            response = await self._get_client().post("/chat/completions", json={
+                "model": self.model, "messages": messages, "max_tokens": max_tokens,
+            })
+            if response.status_code >= 400:
+                self.errors += 1
+                raise LLMError(response.status_code, response.text)
+            data = response.json()
+            self._account(guild_id, data.get("usage"), started)
+
+        text = data["choices"][0]["message"]["content"] or ""
+        self.cache.set(key, text, cache_ttl)
+        return text
+
+    async def stream(self, messages, guild_id=None, max_tokens=300, cache_key=None, cache_ttl=None):
+        """Gera a resposta em pedaços; cache e requisições idênticas devolvem o texto inteiro de uma vez"""
+        key = self._cache_key(messages, max_tokens, cache_key)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            yield await asyncio.shield(pending)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            text = ""
+            async for chunk in self._stream(messages, guild_id, max_tokens):
+                text += chunk
+                yield chunk
+            self.cache.set(key, text, cache_ttl)
+            future.set_result(text)
+        except Exception as e:
+            self.errors += 1
+            future.set_exception(e)
+            # Evita aviso de exceção não recuperada quando ninguém mais aguardava
+            future.exception()
+            raise
+        except BaseException:
+            # Consumidor desistiu (cancelamento ou gerador fechado): libera quem aguardava
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _stream(self, messages, guild_id, max_tokens):
+        async with self._slots(guild_id):
+            started = time.perf_counter()
+            first_token = None
+            usage = None
+            self.requests += 1
+            self.streams += 1
+            async with self._get_client().stream("POST", "/chat/completions", json={
+                "model": self.model, "messages": messages, "max_tokens": max_tokens,
+                "stream": True, "stream_options": {"include_usage": True},
+            }) as response:
+                if response.status_code >= 400:
+                    raise LLMError(response.status_code, (await response.aread()).decode(errors="ignore"))
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        break
+                    event = json.loads(payload)
+                    usage = event.get("usage") or usage
+                    for choice in event.get("choices") or []:
+                        content = (choice.get("delta") or {}).get("content")
+                        if content:
+                            if first_token is None:
+                                first_token = time.perf_counter() - started
+                                self.first_token_total += first_token
+                            yield content
+            self._account(guild_id, usage, started)
+
+    def forget_guild(self, guild_id):
+        """Remove o limitador e os contadores de um servidor que saiu"""
+        self._guilds.pop(guild_id, None)
+        self.tokens_by_guild.pop(guild_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_latency_ms": round(self.latency_total / self.requests * 1000, 1) if self.requests else 0.0,
+            "max_latency_ms": round(self.latency_max * 1000, 1),
+            "avg_first_token_ms": round(self.first_token_total / self.streams * 1000, 1) if self.streams else 0.0,
+            "cache": self.cache.stats(),
+        }
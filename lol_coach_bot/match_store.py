@@ -0,0 +1,90 @@
+"""
+Armazenamento Local de Partidas
+
+Detalhes de partidas da Riot (match-v5) gravados em SQLite, comprimidos com zlib e
+indexados por match_id. Uma partida encerrada não muda, então a entrada nunca expira;
+o arquivo é limitado por número de partidas, removendo as menos acessadas.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class MatchStore:
+    """Repositório persistente de partidas; métodos bloqueantes (use asyncio.to_thread)"""
+
+    def __init__(self, path: str, max_matches: int = 20000, compress_level: int = 6):
+        self.path = path
+        self.max_matches = max_matches
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS matches ("
+            " match_id TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_matches_accessed ON matches (accessed_at)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, match_id: str):
+        """Retorna os detalhes da partida ou None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM matches WHERE match_id = ?", (match_id,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE matches SET accessed_at = ? WHERE match_id = ?", (time.time(), match_id)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, match_id: str, match: dict):
+        """Grava os detalhes da partida, removendo as menos acessadas acima do limite"""
+        data = zlib.compress(json.dumps(match, separators=(",", ":")).encode("utf-8"), self.compress_level)
+        with self._lock:
+            existed = self._conn.execute(
+                "SELECT 1 FROM matches WHERE match_id = ?", (match_id,)
+            ).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO matches (match_id, data, accessed_at) VALUES (?, ?, ?)",
+                (match_id, data, time.time())
+            )
+            if not existed:
+                self._count += 1
+            if self._count > self.max_matches:
+                self._conn.execute(
+                    "DELETE FROM matches WHERE match_id IN ("
+                    " SELECT match_id FROM matches ORDER BY accessed_at LIMIT ?)",
+                    (self._count - self.max_matches,)
+                )
+                self._count = self.max_matches
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "matches": self._count,
+                "max_matches": self.max_matches,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,229 @@
+"""
+Fila de Reprodução de Voz
+
+Fila por servidor com prioridades, descarte de mensagens duplicadas e de mensagens
+velhas demais, consumida por um worker que usa o callback `after` do discord.py em
+vez de consultar `is_playing()` periodicamente.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+
+from tts_cache import OpusAudio, normalize_text
+
+# Menor valor = maior prioridade
+PRIORITY_URGENT = 0  # alertas de objetivos (dragão, barão, torres)
+PRIORITY_NORMAL = 1  # respostas a comandos (ask, postgame)
+PRIORITY_TIP = 2  # dicas genéricas durante a partida
+
+# Idade máxima (segundos) de uma fala na fila antes de ser descartada
+DEFAULT_MAX_AGE = {
+    PRIORITY_URGENT: 20.0,
+    PRIORITY_NORMAL: 60.0,
+    PRIORITY_TIP: 15.0,
+}
+
+
+class SpeechItem:
+    """Fala pendente; o áudio começa a ser sintetizado ao entrar na fila"""
+
+    def __init__(self, text, priority, audio_task):
+        self.text = text
+        self.priority = priority
+        self.audio_task = audio_task
+        self.created = time.monotonic()
+        self.cancelled = False
+
+    def age(self):
+        return time.monotonic() - self.created
+
+
+class SpeechQueue:
+    """Fila de prioridade com deduplicação por texto pendente"""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._pending = {}  # texto normalizado -> SpeechItem
+        self._available = asyncio.Event()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def find(self, text):
+        return self._pending.get(normalize_text(text))
+
+    def put(self, item):
+        key = normalize_text(item.text)
+        previous = self._pending.get(key)
+        if previous is not None:
+            previous.cancelled = True
+        self._pending[key] = item
+        heapq.heappush(self._heap, (item.priority, next(self._seq), item))
+        self._available.set()
+
+    async def get(self):
+        """Retorna a fala mais prioritária (FIFO dentro da mesma prioridade)"""
+        while True:
+            while self._heap:
+                _, _, item = heapq.heappop(self._heap)
+                if item.cancelled:
+                    continue
+                self._pending.pop(normalize_text(item.text), None)
+                return item
+            self._available.clear()
+            await self._available.wait()
+
+    def clear(self):
+        """Descarta todas as falas pendentes; retorna quantas eram"""
+        count = len(self._pending)
+        for item in self._pending.values():
+            item.cancelled = True
+        self._pending.clear()
+        self._heap.clear()
+        return count
+
+
+class PlaybackWorker:
+    """Consome a fila de um servidor e reproduz as falas no canal de voz
+
+    `synthesize(text)` deve retornar o áudio Ogg Opus e `get_voice_client()` o
+    voice client atual do servidor (ou None).
+    """
+
+    def __init__(self, queue, synthesize, get_voice_client, max_age=None):
+        self.queue = queue
+        self.synthesize = synthesize
+        self.get_voice_client = get_voice_client
+        self.max_age = {**DEFAULT_MAX_AGE, **(max_age or {})}
+        self.current = None
+        self._task = None
+
+        self.played = 0
+        self.deduplicated = 0
+        self.expired = 0
+        self.preempted = 0
+        self.failures = 0
+
+    def say(self, text, priority=PRIORITY_TIP):
+        """Enfileira uma fala; retorna False se uma fala idêntica já estava pendente"""
+        pending = self.queue.find(text)
+        if pending is not None and pending.priority <= priority:
+            self.deduplicated += 1
+            return False
+
+        if pending is not None:
+            # Mesma fala, agora mais urgente: reaproveita a síntese em andamento
+            self.deduplicated += 1
+            audio_task = pending.audio_task
+        else:
+            audio_task = asyncio.create_task(self.synthesize(text))
+            audio_task.add_done_callback(self._consume_error)
+
+        self.queue.put(SpeechItem(text, priority, audio_task))
+        self._ensure_started()
+
+        # Alertas urgentes interrompem uma dica menos importante em reprodução
+        current = self.current
+        voice_client = self.get_voice_client()
+        if current and current.priority == PRIORITY_TIP and priority == PRIORITY_URGENT and voice_client:
+            self.preempted += 1
+            voice_client.stop()
+        return True
+
+    def clear(self):
+        """Descarta as falas pendentes e interrompe a atual"""
+        self.queue.clear()
+        voice_client = self.get_voice_client()
+        if voice_client and voice_client.is_playing():
+            voice_client.stop()
+
+    def stop(self):
+        """Encerra o worker"""
+        self.queue.clear()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        return {
+            "pending": len(self.queue),
+            "played": self.played,
+            "deduplicated": self.deduplicated,
+            "expired": self.expired,
+            "preempted": self.preempted,
+            "failures": self.failures,
+        }
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    @staticmethod
+    def _consume_error(task):
+        # Falhas de síntese são tratadas no worker; evita aviso de exceção não recuperada
+        if not task.cancelled():
+            task.exception()
+
+    def _is_stale(self, item):
+        if item.age() > self.max_age[item.priority]:
+            self.expired += 1
+            return True
+        return False
+
+    async def _run(self):
+        while True:
+            item = await self.queue.get()
+            if self._is_stale(item):
+                continue
+
+            try:
+                audio = await item.audio_task
+            except Exception as e:
+                self.failures += 1
+                print(f"Erro ao sintetizar fala: {e}")
+                continue
+
+            # A síntese pode ter demorado: confere a idade de novo antes de tocar
+            if item.cancelled or self._is_stale(item):
+                continue
+
+            voice_client = self.get_voice_client()
+            if not voice_client or not voice_client.is_connected():
+                continue
+
+            try:
+                await self._play(voice_client, audio, item)
+            except Exception as e:
+                self.failures += 1
+                print(f"Erro ao reproduzir fala: {e}")
+
+    async def _play(self, voice_client, audio, item):
+        loop = asyncio.get_running_loop()
+        finished = loop.create_future()
+
+        def after(error):
+            # Chamado na thread de áudio do discord.py
+            loop.call_soon_threadsafe(_finish, error)
+
+        def _finish(error):
+            if finished.done():
+                return
+            if error:
+                finished.set_exception(error)
+            else:
+                finished.set_result(None)
+
+        # Outra fonte (fora da fila) pode estar tocando; interrompe em vez de esperar
+        if voice_client.is_playing():
+            voice_client.stop()
+
+        self.current = item
+        try:
+            voice_client.play(OpusAudio(audio), after=after)
+            await finished
+            self.played += 1
+        finally:
+            self.current = None
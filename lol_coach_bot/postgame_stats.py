@@ -0,0 +1,153 @@
+"""
+Estatísticas Pós-Partida
+
+Heurísticas de desempenho compartilhadas pela análise de uma partida e pela análise
+em lote (time inteiro ou últimas N partidas). No lote, as métricas ficam em colunas
+(uma lista por métrica), e médias e tendências são calculadas por coluna.
+"""
+
+import statistics
+
+# Heurísticas (por minuto de partida)
+MIN_CS_PER_MINUTE = 5  # tropas da rota, sem a selva
+MIN_VISION_PER_MINUTE = 1.5
+
+TIP_DEATHS = "deaths"
+TIP_FARM = "farm"
+TIP_VISION = "vision"
+
+TIP_TEXT = {
+    TIP_DEATHS: "Você teve muitas mortes em relação aos abates e assistências. Tente jogar de forma mais segura e evitar lutas desfavoráveis.",
+    TIP_FARM: "Seu farm (CS) foi um pouco baixo. Focar em farmar mais pode te dar uma vantagem de ouro significativa.",
+    TIP_VISION: "Sua pontuação de visão foi um pouco baixa. Wards são cruciais para controle de mapa e segurança.",
+}
+
+TIP_SUMMARY = {
+    TIP_DEATHS: "mortes acima de abates + assistências",
+    TIP_FARM: "farm abaixo de 5 CS/min",
+    TIP_VISION: "visão abaixo de 1,5/min",
+}
+
+# Métricas com média e tendência no relatório em lote
+TREND_METRICS = ("cs_per_min", "vision_per_min", "kda")
+
+
+def performance_tips(kills, deaths, assists, minions, vision, minutes):
+    """Dicas (chaves de TIP_TEXT) para o desempenho de um jogador em uma partida"""
+    tips = []
+    if deaths > kills + assists:
+        tips.append(TIP_DEATHS)
+    elif minions < minutes * MIN_CS_PER_MINUTE:
+        tips.append(TIP_FARM)
+
+    if vision < minutes * MIN_VISION_PER_MINUTE:
+        tips.append(TIP_VISION)
+    return tips
+
+
+def participant_row(match_details: dict, player_puuid: str):
+    """Linha de métricas do jogador na partida, ou None se ele não participou"""
+    info = match_details["info"]
+    participant = next((p for p in info["participants"] if p["puuid"] == player_puuid), None)
+    if participant is None:
+        return None
+
+    minutes = info["gameDuration"] / 60
+    cs = participant["totalMinionsKilled"] + participant["neutralMinionsKilled"]
+    return {
+        "match_id": match_details["metadata"]["matchId"],
+        "started_at": info.get("gameStartTimestamp") or info.get("gameCreation", 0),
+        "champion": participant["championName"],
+        "win": participant["win"],
+        "minutes": minutes,
+        "kills": participant["kills"],
+        "deaths": participant["deaths"],
+        "assists": participant["assists"],
+        "cs_per_min": cs / minutes if minutes else 0.0,
+        "vision_per_min": participant["visionScore"] / minutes if minutes else 0.0,
+        "kda": (participant["kills"] + participant["assists"]) / max(1, participant["deaths"]),
+        "tips": performance_tips(
+            participant["kills"], participant["deaths"], participant["assists"],
+            participant["totalMinionsKilled"], participant["visionScore"], round(minutes)
+        ),
+    }
+
+
+def to_columns(rows):
+    """Converte linhas em colunas (métrica -> lista), em ordem cronológica"""
+    rows = sorted(rows, key=lambda row: row["started_at"])
+    return {key: [row[key] for row in rows] for key in (rows[0] if rows else {})}
+
+
+def trend(values):
+    """Inclinação por partida (mínimos quadrados); None com menos de 3 partidas"""
+    if len(values) < 3:
+        return None
+    return statistics.linear_regression(range(len(values)), values).slope
+
+
+def summarize(columns, with_trends=True):
+    """Médias, tendências, taxa de vitória e frequência das dicas de uma coluna de partidas
+
+    No agregado de vários jogadores as linhas não formam uma série, então sem tendências.
+    """
+    games = len(columns.get("match_id", []))
+    if not games:
+        return {"games": 0}
+
+    tip_counts = {}
+    for tips in columns["tips"]:
+        for tip in tips:
+            tip_counts[tip] = tip_counts.get(tip, 0) + 1
+
+    summary = {
+        "games": games,
+        "win_rate": sum(columns["win"]) / games,
+        "tips": tip_counts,
+        "champions": sorted(set(columns["champion"]), key=columns["champion"].count, reverse=True),
+    }
+    for metric in TREND_METRICS:
+        summary[metric] = statistics.fmean(columns[metric])
+        summary[f"{metric}_trend"] = trend(columns[metric]) if with_trends else None
+    # KDA agregado (soma das colunas), menos sensível a uma partida sem mortes
+    summary["kda_total"] = (sum(columns["kills"]) + sum(columns["assists"])) / max(1, sum(columns["deaths"]))
+    return summary
+
+
+def _format_trend(value):
+    if value is None:
+        return ""
+    arrow = "📈" if value > 0.01 else "📉" if value < -0.01 else "➡️"
+    return f" {arrow} {value:+.2f}/partida"
+
+
+def format_summary(title, summary):
+    """Bloco de texto do relatório para um jogador ou para o agregado"""
+    if not summary["games"]:
+        return f"**{title}:** nenhuma partida encontrada."
+
+    lines = [
+        f"**{title}** — {summary['games']} partida(s), {summary['win_rate'] * 100:.0f}% de vitórias"
+        f" ({', '.join(summary['champions'][:3])})",
+        f"CS/min: {summary['cs_per_min']:.1f}{_format_trend(summary['cs_per_min_trend'])}"
+        f" | Visão/min: {summary['vision_per_min']:.2f}{_format_trend(summary['vision_per_min_trend'])}"
+        f" | KDA: {summary['kda_total']:.2f}{_format_trend(summary['kda_trend'])}",
+    ]
+    for tip, count in sorted(summary["tips"].items(), key=lambda item: -item[1]):
+        lines.append(f"💡 {TIP_SUMMARY[tip]} em {count} de {summary['games']} partida(s)")
+    return "\n".join(lines)
+
+
+def build_batch_report(rows_by_player):
+    """Relatório consolidado: um bloco por jogador e um bloco agregado
+
+    Retorna (relatório, resumos por jogador, resumo agregado).
+    """
+    summaries = {name: summarize(to_columns(rows)) for name, rows in rows_by_player.items()}
+    aggregate = summarize(to_columns([row for rows in rows_by_player.values() for row in rows]),
+                          with_trends=len(rows_by_player) == 1)
+
+    blocks = [format_summary(name, summary) for name, summary in summaries.items()]
+    if len(rows_by_player) > 1:
+        blocks.append(format_summary("Agregado", aggregate))
+    return "\n\n".join(blocks), summaries, aggregate
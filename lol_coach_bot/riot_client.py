@@ -0,0 +1,233 @@
+"""
+Cliente Assíncrono da Riot API
+
+Cliente httpx compartilhado (conexões keep-alive), limites de taxa da aplicação e
+de cada método lidos dos cabeçalhos de resposta, tratamento de 429 com Retry-After
+e agrupamento de requisições idênticas em andamento.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote
+
+import httpx
+
+# Limites de uma chave de desenvolvimento, usados até a primeira resposta informar os reais
+DEFAULT_APP_LIMITS = "20:1,100:120"
+
+
+class RiotAPIError(Exception):
+    """Resposta de erro da Riot API"""
+
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+def parse_rate_limits(header):
+    """Converte "20:1,100:120" em [(20, 1), (100, 120)] (requisições, segundos)"""
+    limits = []
+    for part in (header or "").split(","):
+        if ":" in part:
+            count, seconds = part.split(":", 1)
+            limits.append((int(count), int(seconds)))
+    return limits
+
+
+def parse_retry_after(value, default=1.0, max_delay=30.0):
+    """Segundos de espera do cabeçalho Retry-After (número ou data HTTP), limitados a `max_delay`"""
+    if not value:
+        return default
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return default
+    return min(max(delay, 0.0), max_delay)
+
+
+class RateLimitBucket:
+    """Janelas fixas de um limite da Riot (ex.: 20 req/1s e 100 req/120s)"""
+
+    def __init__(self, limits=None):
+        self.windows = {}  # segundos -> [limite, contagem, início da janela]
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self.set_limits(limits or [])
+
+    def set_limits(self, limits):
+        windows = {}
+        for limit, seconds in limits:
+            _, count, started = self.windows.get(seconds, (limit, 0, 0.0))
+            windows[seconds] = [limit, count, started]
+        self.windows = windows
+
+    def sync(self, limits_header, counts_header):
+        """Ajusta limites e contagens com os cabeçalhos X-*-Rate-Limit(-Count)"""
+        limits = parse_rate_limits(limits_header)
+        if limits:
+            self.set_limits(limits)
+        now = time.monotonic()
+        for count, seconds in parse_rate_limits(counts_header):
+            window = self.windows.get(seconds)
+            if window is None:
+                continue
+            if window[2] + seconds <= now:
+                window[2] = now
+            # O servidor pode ter visto requisições de outras instâncias com a mesma chave
+            window[1] = max(window[1], count)
+
+    def block(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """Aguarda até que todas as janelas tenham espaço e conta a requisição"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                wait = self.blocked_until - now
+                for seconds, window in self.windows.items():
+                    limit, count, started = window
+                    if started + seconds <= now:
+                        window[1], window[2] = 0, now
+                    elif count >= limit:
+                        wait = max(wait, started + seconds - now)
+                if wait <= 0:
+                    for window in self.windows.values():
+                        if window[1] == 0:
+                            window[2] = now
+                        window[1] += 1
+                    return
+                await asyncio.sleep(wait)
+
+
+class RiotClient:
+    """Cliente compartilhado da Riot API; uma instância por processo"""
+
+    def __init__(self, api_key, max_connections=20, timeout=10.0, max_retries=3,
+                 base_url=None, max_retry_after=30.0):
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        # Teto para o Retry-After: a espera bloqueia todos os chamadores coalescidos
+        self.max_retry_after = max_retry_after
+        # Para testes: http://127.0.0.1:porta substitui https://<região>.api.riotgames.com
+        self.base_url = base_url
+        self._client = None
+        self._buckets = {}  # (região, método ou "app") -> RateLimitBucket
+        self._inflight = {}  # URL -> Task
+
+        self.requests = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.errors = 0
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections,
+                                    keepalive_expiry=60),
+                headers={"X-Riot-Token": self.api_key or ""},
+            )
+        return self._client
+
+    async def close(self):
+        if self._client and not self._client.is_closed:
+            await self._client.aclose()
+
+    def _bucket(self, region, method):
+        key = (region, method)
+        if key not in self._buckets:
+            self._buckets[key] = RateLimitBucket(
+                parse_rate_limits(DEFAULT_APP_LIMITS) if method == "app" else None
+            )
+        return self._buckets[key]
+
+    async def get(self, region, method, path):
+        """GET em `path` no roteamento `region`; `method` identifica o limite do endpoint
+
+        Requisições idênticas já em andamento compartilham a mesma resposta.
+        """
+        url = f"{self.base_url or f'https://{region}.api.riotgames.com'}{path}"
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.create_task(self._request(region, method, url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        else:
+            self.coalesced += 1
+        # shield: o cancelamento de um chamador não interrompe os demais
+        return await asyncio.shield(task)
+
+    async def _request(self, region, method, url):
+        app_bucket = self._bucket(region, "app")
+        method_bucket = self._bucket(region, method)
+        client = self._get_client()
+
+        for attempt in range(self.max_retries + 1):
+            await app_bucket.acquire()
+            await method_bucket.acquire()
+            self.requests += 1
+            try:
+                response = await client.get(url)
+            except httpx.HTTPError as e:
+                if attempt >= self.max_retries:
+                    self.errors += 1
+                    raise RiotAPIError(0, str(e)) from e
+                await asyncio.sleep(0.5 * 2 ** attempt)
+                continue
+
+            headers = response.headers
+            app_bucket.sync(headers.get("X-App-Rate-Limit"), headers.get("X-App-Rate-Limit-Count"))
+            method_bucket.sync(headers.get("X-Method-Rate-Limit"), headers.get("X-Method-Rate-Limit-Count"))
+
+            if response.status_code == 429:
+                self.rate_limited += 1
+                retry_after = parse_retry_after(headers.get("Retry-After"), max_delay=self.max_retry_after)
+                # Sem X-Rate-Limit-Type o limite é do serviço: só esta requisição espera
+                limit_type = headers.get("X-Rate-Limit-Type")
+                if limit_type == "application":
+                    app_bucket.block(retry_after)
+                elif limit_type == "method":
+                    method_bucket.block(retry_after)
+                else:
+                    await asyncio.sleep(retry_after)
+                continue
+
+            if response.status_code >= 500 and attempt < self.max_retries:
+                await asyncio.sleep(0.5 * 2 ** attempt)
+                continue
+
+            if response.status_code >= 400:
+                self.errors += 1
+                raise RiotAPIError(response.status_code, response.text)
+            return response.json()
+
+        self.errors += 1
+        raise RiotAPIError(429, "limite de taxa excedido após novas tentativas")
+
+    async def get_summoner_by_name(self, summoner_name, region="br1"):
+        return await self.get(region, "summoner-v4.by-name",
+                              f"/lol/summoner/v4/summoners/by-name/{quote(summoner_name)}")
+
+    async def get_match_ids(self, puuid, count=1, region_routing="americas"):
+        return await self.get(region_routing, "match-v5.ids",
+                              f"/lol/match/v5/matches/by-puuid/{puuid}/ids?count={count}")
+
+    async def get_match(self, match_id, region_routing="americas"):
+        return await self.get(region_routing, "match-v5.match", f"/lol/match/v5/matches/{match_id}")
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "rate_limited": self.rate_limited,
+            "errors": self.errors,
+        }
@@ -0,0 +1,156 @@
+"""
+Dados Estáticos do Jogo
+
+Registro compartilhado de itens, campeões e feitiços de invocador do Data Dragon.
+Carregado uma vez, no primeiro uso, e mantido só como dicionários id -> nome.
+Quando o Data Dragon publica uma nova versão, o registro troca o snapshot inteiro
+de uma vez, sem bloquear quem está lendo.
+"""
+
+import asyncio
+import glob
+import json
+import os
+
+import httpx
+
+DDRAGON_URL = "https://ddragon.leagueoflegends.com"
+
+
+class StaticData:
+    """Snapshot imutável de uma versão do Data Dragon"""
+
+    def __init__(self, version, items=None, champions=None, summoner_spells=None):
+        self.version = version
+        self.items = items or {}  # id do item -> nome
+        self.champions = champions or {}  # id numérico do campeão -> nome
+        self.summoner_spells = summoner_spells or {}  # id do feitiço -> nome
+
+    def item_name(self, item_id):
+        return self.items.get(int(item_id), f"Item ID: {item_id}")
+
+    def champion_name(self, champion_id):
+        return self.champions.get(int(champion_id), f"Campeão ID: {champion_id}")
+
+    def summoner_spell_name(self, spell_id):
+        return self.summoner_spells.get(int(spell_id), f"Feitiço ID: {spell_id}")
+
+    @classmethod
+    def from_ddragon(cls, version, item_json, champion_json, summoner_json):
+        """Extrai apenas os nomes dos JSONs completos do Data Dragon"""
+        return cls(
+            version,
+            items={int(item_id): info["name"] for item_id, info in item_json.get("data", {}).items()},
+            champions={int(info["key"]): info["name"] for info in champion_json.get("data", {}).values()},
+            summoner_spells={int(info["key"]): info["name"] for info in summoner_json.get("data", {}).values()},
+        )
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "items": self.items,
+            "champions": self.champions,
+            "summoner_spells": self.summoner_spells,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["version"],
+            items={int(k): v for k, v in data["items"].items()},
+            champions={int(k): v for k, v in data["champions"].items()},
+            summoner_spells={int(k): v for k, v in data["summoner_spells"].items()},
+        )
+
+
+class StaticDataRegistry:
+    """Carrega e atualiza o snapshot; `current` nunca faz E/S"""
+
+    def __init__(self, cache_dir, locale="pt_BR", legacy_item_file=None, timeout=15.0):
+        self.cache_dir = cache_dir
+        self.locale = locale
+        self.legacy_item_file = legacy_item_file
+        self.timeout = timeout
+        self.current = StaticData(None)
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self):
+        return self.current.version is not None
+
+    async def ensure_loaded(self):
+        """Carrega o snapshot no primeiro uso; chamadas seguintes retornam na hora"""
+        if not self.loaded:
+            await self.refresh()
+        return self.current
+
+    async def refresh(self):
+        """Troca o snapshot se o Data Dragon tiver versão nova; retorna True se trocou"""
+        async with self._lock:
+            try:
+                async with httpx.AsyncClient(timeout=self.timeout) as client:
+                    response = await client.get(f"{DDRAGON_URL}/api/versions.json")
+                    response.raise_for_status()
+                    version = response.json()[0]
+                    if version == self.current.version:
+                        return False
+
+                    data = await asyncio.to_thread(self._read_cache, version)
+                    if data is None:
+                        data = await self._download(client, version)
+                        await asyncio.to_thread(self._write_cache, data)
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                print(f"Erro ao atualizar dados do Data Dragon: {e}")
+                if self.loaded:
+                    return False
+                # Sem rede no primeiro carregamento: usa o que houver em disco
+                data = await asyncio.to_thread(self._read_fallback)
+                if data is None:
+                    return False
+
+            self.current = data
+            print(f"📦 Dados estáticos do jogo carregados (versão {data.version})")
+            return True
+
+    async def _download(self, client, version):
+        base = f"{DDRAGON_URL}/cdn/{version}/data/{self.locale}"
+        responses = await asyncio.gather(*(
+            client.get(f"{base}/{name}.json") for name in ("item", "champion", "summoner")
+        ))
+        for response in responses:
+            response.raise_for_status()
+        return StaticData.from_ddragon(version, *(response.json() for response in responses))
+
+    def _cache_path(self, version):
+        return os.path.join(self.cache_dir, f"{version}-{self.locale}.json")
+
+    def _read_cache(self, version):
+        try:
+            with open(self._cache_path(version), "r", encoding="utf-8") as f:
+                return StaticData.from_dict(json.load(f))
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _write_cache(self, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(data.version)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(data.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(f"{path}.tmp", path)
+        # Só a versão atual interessa; remove patches anteriores
+        for old_path in glob.glob(os.path.join(self.cache_dir, f"*-{self.locale}.json")):
+            if old_path != path:
+                os.remove(old_path)
+
+    def _read_fallback(self):
+        cached = sorted(glob.glob(os.path.join(self.cache_dir, f"*-{self.locale}.json")), key=os.path.getmtime)
+        if cached:
+            with open(cached[-1], "r", encoding="utf-8") as f:
+                return StaticData.from_dict(json.load(f))
+
+        # item.json avulso ao lado do bot, como na versão anterior
+        if self.legacy_item_file and os.path.exists(self.legacy_item_file):
+            with open(self.legacy_item_file, "r", encoding="utf-8") as f:
+                item_json = json.load(f)
+            return StaticData.from_ddragon(item_json.get("version", "local"), item_json, {}, {})
+        return None
@@ -0,0 +1,189 @@
+"""
+Síntese de Voz (TTS)
+
+Backends plugáveis executados em um pool de threads, com limite de concorrência
+global e por servidor, para que a síntese nunca bloqueie o event loop do bot.
+Inclui um monitor de atraso (lag) do event loop.
+"""
+
+import asyncio
+import io
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from tts_cache import TTSCache, encode_opus
+
+
+class TTSBackend:
+    """Interface de backend de síntese; `synthesize` é bloqueante e roda no pool"""
+
+    name = None
+    output_format = "mp3"  # "mp3" é convertido para Opus; "opus" já vem pronto (Ogg Opus)
+
+    def synthesize(self, text: str, lang: str, voice: str) -> bytes:
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    """Google Translate TTS via gTTS; `voice` é o domínio (tld), que define o sotaque"""
+
+    name = "gtts"
+
+    def synthesize(self, text, lang, voice):
+        from gtts import gTTS
+
+        fp = io.BytesIO()
+        gTTS(text=text, lang=lang, tld=voice, slow=False).write_to_fp(fp)
+        return fp.getvalue()
+
+
+class OpenAITTSBackend(TTSBackend):
+    """OpenAI TTS; devolve Ogg Opus diretamente, sem passar pelo ffmpeg"""
+
+    name = "openai"
+    output_format = "opus"
+
+    def __init__(self, model: str = "tts-1"):
+        from openai import OpenAI
+
+        self.model = model
+        self.client = OpenAI()
+
+    def synthesize(self, text, lang, voice):
+        response = self.client.audio.speech.create(
+            model=self.model, voice=voice, input=text, response_format="opus"
+        )
+        return response.content
+
+
+BACKENDS = {
+    GTTSBackend.name: GTTSBackend,
+    OpenAITTSBackend.name: OpenAITTSBackend,
+}
+
+
+class TTSExecutor:
+    """Sintetiza falas fora do event loop, consultando o cache antes do backend"""
+
+    def __init__(self, backend: TTSBackend, cache: TTSCache, lang: str, voice: str,
+                 max_workers: int = 4, per_guild: int = 1):
+        self.backend = backend
+        self.cache = cache
+        self.lang = lang
+        self.voice = voice
+        self.per_guild = per_guild
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+        self._global = asyncio.Semaphore(max_workers)
+        self._guilds = {}  # guild_id -> Semaphore
+        self._inflight = {}  # chave do cache -> Future com o áudio
+
+        self.syntheses = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.synthesis_seconds = 0.0
+
+    def cache_key(self, text: str) -> str:
+        return self.cache.key(text, self.lang, f"{self.backend.name}:{self.voice}")
+
+    async def synthesize(self, guild_id: int, text: str) -> bytes:
+        """Retorna o áudio Ogg Opus da fala, sintetizando apenas em caso de falta no cache"""
+        key = self.cache_key(text)
+
+        # E/S do cache no executor padrão, para não esperar atrás de sínteses lentas
+        audio = await asyncio.to_thread(self.cache.get, key)
+        if audio is not None:
+            return audio
+
+        # A mesma fala pedida por vários servidores ao mesmo tempo é sintetizada uma vez
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            audio = await self._synthesize(loop, guild_id, key, text)
+            future.set_result(audio)
+            return audio
+        except Exception as e:
+            self.failures += 1
+            future.set_exception(e)
+            # Evita aviso de exceção não recuperada quando ninguém mais aguardava
+            future.exception()
+            raise
+        except asyncio.CancelledError:
+            # Quem aguardava a mesma fala não pode ficar preso para sempre
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _synthesize(self, loop, guild_id, key, text):
+        guild_slots = self._guilds.setdefault(guild_id, asyncio.Semaphore(self.per_guild))
+        async with guild_slots, self._global:
+            started = time.perf_counter()
+            audio = await loop.run_in_executor(
+                self._pool, self.backend.synthesize, text, self.lang, self.voice
+            )
+            if self.backend.output_format != "opus":
+                audio = await encode_opus(audio)
+            self.synthesis_seconds += time.perf_counter() - started
+            self.syntheses += 1
+
+        await asyncio.to_thread(self.cache.put, key, audio)
+        return audio
+
+    def forget_guild(self, guild_id: int):
+        """Remove o limitador de um servidor que saiu"""
+        self._guilds.pop(guild_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "syntheses": self.syntheses,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "avg_synthesis_ms": round(self.synthesis_seconds / self.syntheses * 1000, 1) if self.syntheses else 0.0,
+            "cache": self.cache.stats(),
+        }
+
+
+class LoopLagMonitor:
+    """Mede quanto o event loop atrasa para acordar uma tarefa que dorme `interval` segundos"""
+
+    def __init__(self, interval: float = 0.25, window: int = 240):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - started - self.interval
+            self.samples.append(max(lag, 0.0))
+            self.max_lag = max(self.max_lag, lag)
+
+    def stats(self) -> dict:
+        """Atraso em ms na janela recente (média, p99, máximo) e máximo desde o início"""
+        samples = sorted(self.samples)
+        if not samples:
+            return {"avg_ms": 0.0, "p99_ms": 0.0, "window_max_ms": 0.0, "max_ms": 0.0}
+        return {
+            "avg_ms": round(sum(samples) / len(samples) * 1000, 1),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 1),
+            "window_max_ms": round(samples[-1] * 1000, 1),
+            "max_ms": round(self.max_lag * 1000, 1),
+        }
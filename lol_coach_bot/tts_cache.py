@@ -0,0 +1,200 @@
+"""
+Cache de Áudio TTS
+
+Guarda as falas do treinador já codificadas em Opus (container Ogg), endereçadas
+pelo conteúdo (texto, idioma, voz). Dois níveis:
+- memória: LRU limitado por bytes
+- disco: diretório limitado por bytes, sobrevive a reinícios do bot
+
+Na reprodução, os pacotes Opus são enviados direto ao Discord, sem ffmpeg.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import discord
+from discord.oggparse import OggStream
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza espaços para que variações triviais usem a mesma entrada"""
+    return " ".join(text.split())
+
+
+class TTSCache:
+    """Cache de dois níveis (memória + disco) para áudio Opus"""
+
+    def __init__(self, directory: str, memory_bytes: int = 16 * 1024 * 1024,
+                 disk_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+
+        self._memory = OrderedDict()  # chave -> bytes
+        self._memory_size = 0
+        self._disk = OrderedDict()  # chave -> tamanho, do menos para o mais recente
+        self._disk_size = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def key(text: str, lang: str, voice: str) -> str:
+        """Chave de conteúdo para (texto, idioma, voz)"""
+        raw = f"{lang}\x00{voice}\x00{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def get(self, key: str):
+        """Retorna o áudio Opus em cache ou None"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data
+            on_disk = key in self._disk
+
+        if on_disk:
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+                os.utime(self._path(key))
+            except FileNotFoundError:
+                data = None
+
+            with self._lock:
+                if data is None:
+                    self._forget_disk(key)
+                else:
+                    self._disk.move_to_end(key)
+                    self._remember(key, data)
+                    self.disk_hits += 1
+                    return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes):
+        """Grava o áudio nos dois níveis"""
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._remember(key, data)
+            self._forget_disk(key)
+            self._disk[key] = len(data)
+            self._disk_size += len(data)
+            evicted = self._evict_disk()
+
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        """Contadores e ocupação do cache"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_size,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.opus")
+
+    def _load_index(self):
+        # Reconstrói o índice do disco em ordem de uso (mtime é atualizado a cada acerto)
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                os.remove(path)
+            elif name.endswith(".opus"):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name[:-5], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+
+        for old_key in self._evict_disk():
+            os.remove(self._path(old_key))
+
+    def _remember(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_size -= len(old)
+
+    def _forget_disk(self, key):
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_size -= size
+
+    def _evict_disk(self):
+        evicted = []
+        while self._disk_size > self.disk_bytes and self._disk:
+            old_key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            evicted.append(old_key)
+        return evicted
+
+
+async def encode_opus(audio: bytes, bitrate: str = "64k") -> bytes:
+    """Converte o áudio (ex.: MP3 do gTTS) para Ogg Opus 48 kHz estéreo, o formato do Discord"""
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+        "-map_metadata", "-1", "-c:a", "libopus", "-b:a", bitrate,
+        "-ar", "48000", "-ac", "2", "-f", "opus", "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate(audio)
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg falhou ao codificar Opus: {stderr.decode(errors='ignore').strip()}")
+    return stdout
+
+
+class OpusAudio(discord.AudioSource):
+    """Fonte de áudio que entrega os pacotes Opus em cache sem transcodificar"""
+
+    def __init__(self, data: bytes):
+        self._packets = OggStream(io.BytesIO(data)).iter_packets()
+
+    def read(self) -> bytes:
+        for packet in self._packets:
+            # Cabeçalhos do stream Ogg Opus não são áudio
+            if packet.startswith((b"OpusHead", b"OpusTags")):
+                continue
+            return packet
+        return b""
+
+    def is_opus(self) -> bool:
+        return True